@@ -0,0 +1,50 @@
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+from txwerewolves import (
+    session,
+    users,
+)
+import pytest
+
+
+class RecordingAvatar(object):
+    """
+    Stands in for a connected avatar.  Keeps what it is sent.
+    """
+
+    def __init__(self):
+        self.signals = []
+        self.events = []
+
+    def send_app_signal(self, signal):
+        self.signals.append(signal)
+
+    def send_event_to_client(self, data):
+        self.events.append(data)
+
+
+@pytest.fixture
+def session_entry():
+    """
+    A session with four members whose avatars record what they are sent.
+    """
+    entry = session.create_session()
+    members = []
+    for n in range(4):
+        user_id = "test-{}-{}".format(entry.session_id, n)
+        user_entry = users.register_user(user_id)
+        user_entry.avatar = RecordingAvatar()
+        user_entry.joined_id = entry.session_id
+        members.append(user_id)
+    entry.members = members
+    yield entry
+    game = entry.appstate
+    if game is not None and hasattr(game, 'cancel_timers'):
+        game.cancel_timers()
+    session.destroy_entry(entry.session_id)
+    for user_id in members:
+        users.unregister_user(user_id)
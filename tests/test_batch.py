@@ -0,0 +1,22 @@
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+from txwerewolves.batch import verify_against_scalar
+from txwerewolves.werewolf import (
+    OPTIONAL_ROLES,
+    generate_role_sets,
+)
+import pytest
+
+
+@pytest.mark.parametrize("player_count", [3, 5, 8])
+def test_batch_games_match_scalar_games(player_count):
+    for roles in generate_role_sets():
+        assert verify_against_scalar(player_count, roles, games=20, seed=player_count) == 0
+
+
+def test_batch_games_match_scalar_games_with_one_werewolf():
+    assert verify_against_scalar(6, frozenset(OPTIONAL_ROLES), werewolf_count=1, games=200, seed=1) == 0
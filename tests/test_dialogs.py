@@ -0,0 +1,46 @@
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+from txwerewolves.dialogs import (
+    ChatDialog,
+    wrap_chat_message,
+)
+
+
+def row_text(rows):
+    """
+    Return the text of transcript `rows` without the sender prefixes.
+    """
+    return "".join(line for prefix, line in rows)
+
+
+def test_wrap_chat_message_keeps_text_after_prefix():
+    msg = "the seer is lying about the table cards"
+    rows = wrap_chat_message(("alice", msg), 20)
+    assert row_text(rows) == msg
+    assert rows[0][0] is not None
+    assert all(prefix is None for prefix, line in rows[1:])
+    assert all(len(line) <= 20 for prefix, line in rows)
+
+
+def test_wrap_chat_message_with_prefix_wider_than_dialog():
+    user_id = "a-very-long-user-name"
+    msg = "vote for bob"
+    rows = wrap_chat_message((user_id, msg), 12)
+    assert row_text(rows) == msg
+    prefix_rows = [prefix for prefix, line in rows if prefix is not None]
+    assert len(prefix_rows) > 1
+
+
+def test_transcript_grows_with_dialog_height():
+    output_buf = [("bob", "message {}".format(n)) for n in range(10)]
+    dialog = ChatDialog.make_instance([], output_buf)
+    rows = dialog._update_transcript(40, 3)
+    assert [line for prefix, line in rows] == [
+        "message 9", "message 8", "message 7"]
+    rows = dialog._update_transcript(40, 6)
+    assert len(rows) == 6
+    assert rows[-1][1] == "message 4"
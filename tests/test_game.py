@@ -0,0 +1,145 @@
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+import collections
+import json
+from txwerewolves import (
+    session,
+    users,
+)
+from txwerewolves.game import (
+    HandledWerewolfGame,
+    SSHGameProtocol,
+    WebGameProtocol,
+    initialize_game,
+)
+from txwerewolves.webauth import WebAvatar
+from txwerewolves.werewolf import (
+    ReplayLog,
+    WerewolfGame,
+)
+import pytest
+from twisted.internet import task
+
+
+def start_seer_phase(entry):
+    """
+    Deal a game with a seer for `entry` and advance it to the seer phase.
+    """
+    game = HandledWerewolfGame()
+    game.session_id = entry.session_id
+    game.seed = 3
+    entry.appstate = game
+    game.add_players(entry.members)
+    game.deal_cards(1, frozenset([game.CARD_SEER]))
+    while game.query_phase_tag() != "seer":
+        game.advance_to_next_phase()
+    return game
+
+
+@pytest.mark.parametrize("protocol_class, method", [
+    (SSHGameProtocol, "_seer_examine_table_cards"),
+    (WebGameProtocol, "_seer_view_table_cards"),
+])
+def test_seer_views_table_cards(session_entry, protocol_class, method):
+    game = start_seer_phase(session_entry)
+    protocol = protocol_class()
+    protocol.game = game
+    protocol.user_id = session_entry.members[0]
+    getattr(protocol, method)()
+    assert game.power_activated
+    assert len(game.seer_viewed_table_cards) == 2
+    opcodes = [entry[0] for entry in game.replay_log.entries]
+    assert opcodes[-1] == ReplayLog.SEER_VIEW_TABLE_CARDS
+
+
+class EventSource(object):
+    """
+    Stands in for a client's event stream.  Keeps the kind of each event.
+    """
+
+    def __init__(self):
+        self.kinds = []
+
+    def write(self, data):
+        if data.startswith(b"data: "):
+            event = json.loads(data[len(b"data: "):].decode('utf-8'))
+            self.kinds.extend(event.keys())
+
+
+@pytest.fixture
+def web_player(session_entry):
+    """
+    A web game protocol for the first member of a game in the werewolf
+    phase, with its client connected and caught up.
+    """
+    clock = task.Clock()
+    initialize_game(
+        session_entry,
+        reactor=clock,
+        roles=frozenset([WerewolfGame.CARD_SEER]),
+        werewolves=1)
+    clock.advance(0)
+    game = session_entry.appstate
+    user_id = session_entry.members[0]
+    avatar = WebAvatar()
+    avatar.user_id = user_id
+    avatar._event_buffer = collections.deque([], avatar.event_buffer_size)
+    users.get_user_entry(user_id).avatar = avatar
+    app = WebGameProtocol()
+    app.game = game
+    app.user_id = user_id
+    avatar._event_source = EventSource()
+    app._init_phase_elements()
+    app._update_client()
+    return app
+
+
+def reconnect(app):
+    """
+    Connect a new client for `app` and catch it up.  Returns the kinds of
+    the events it was sent.
+    """
+    event_source = EventSource()
+    app.avatar._event_source = event_source
+    app._catch_up()
+    return event_source.kinds
+
+
+def test_catch_up_sends_only_missed_chat(web_player):
+    app = web_player
+    session_id = app.game.session_id
+    sender = session.get_entry(session_id).members[1]
+    app.avatar._event_source = None
+    session.post_chat_message(session_id, sender, "hello")
+    app._send_chat(sender, "hello")
+    assert reconnect(app) == ['chat']
+    journal = session.get_entry(session_id).journal
+    assert journal.query_offset(app.user_id) == journal.last_seq
+
+
+def test_catch_up_resends_panels_for_unjournaled_events(web_player):
+    app = web_player
+    app.avatar._event_source = None
+    app._update_client_output()
+    kinds = reconnect(app)
+    assert 'player-info' in kinds
+    assert 'phase-info' in kinds
+
+
+def test_catch_up_resends_panels_when_journal_was_trimmed(web_player):
+    app = web_player
+    session_id = app.game.session_id
+    sender = session.get_entry(session_id).members[1]
+    journal = session.get_entry(session_id).journal
+    journal.limit = 3
+    app.avatar._event_source = None
+    for n in range(5):
+        session.post_chat_message(session_id, sender, "message {}".format(n))
+    assert not journal.has_events_since(journal.query_offset(app.user_id))
+    kinds = reconnect(app)
+    assert 'player-info' in kinds
+    assert kinds.count('chat') == 3
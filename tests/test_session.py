@@ -0,0 +1,41 @@
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+from txwerewolves.session import EventJournal
+
+
+def test_events_since_filters_by_audience():
+    journal = EventJournal.make_instance()
+    journal.append('phase', {'phase': 10})
+    journal.append('reveal', {'power': 'seer'}, audience='alice')
+    journal.append('chat', {'sender': 'bob', 'message': 'hi'})
+    assert [e.seq for e in journal.events_since(1, 'alice')] == [2, 3]
+    assert [e.seq for e in journal.events_since(1, 'bob')] == [3]
+    assert journal.events_since(3, 'alice') == []
+
+
+def test_trimmed_journal_keeps_sequence_numbers():
+    journal = EventJournal.make_instance()
+    journal.limit = 3
+    for n in range(5):
+        journal.append('chat', {'sender': 'bob', 'message': str(n)})
+    assert journal.last_seq == 5
+    assert journal.trimmed == 2
+    assert [e.seq for e in journal.events] == [3, 4, 5]
+    assert journal.has_events_since(2)
+    assert not journal.has_events_since(1)
+    assert [e.seq for e in journal.events_since(3)] == [4, 5]
+    assert [e.seq for e in journal.events_since(0)] == [3, 4, 5]
+
+
+def test_acknowledge_never_moves_back():
+    journal = EventJournal.make_instance()
+    journal.append('phase', {'phase': 10})
+    journal.append('phase', {'phase': 20})
+    journal.acknowledge('alice')
+    journal.acknowledge('alice', 1)
+    assert journal.query_offset('alice') == 2
+    assert journal.query_offset('bob') == 0
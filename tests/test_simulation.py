@@ -0,0 +1,24 @@
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+from txwerewolves.werewolf import (
+    OPTIONAL_ROLES,
+    generate_role_sets,
+)
+import pytest
+
+pytest.importorskip("numpy")
+from txwerewolves import simulation
+
+
+@pytest.mark.parametrize("player_count", [3, 5, 8])
+def test_simulated_games_match_scalar_games(player_count):
+    for roles in generate_role_sets():
+        assert simulation.verify_against_scalar(player_count, roles, games=10, seed=player_count) == 0
+
+
+def test_simulated_games_match_scalar_games_with_one_werewolf():
+    assert simulation.verify_against_scalar(6, frozenset(OPTIONAL_ROLES), werewolves=1, games=500, seed=1) == 0
@@ -0,0 +1,49 @@
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+from txwerewolves import (
+    spectate,
+    users,
+)
+from txwerewolves.game import HandledWerewolfGame
+from txwerewolves.screen import ScreenBuffer
+import pytest
+
+
+@pytest.fixture
+def watched_entry(session_entry):
+    """
+    A session with a game and two SSH spectators drawing on screen buffers.
+    """
+    session_entry.appstate = HandledWerewolfGame()
+    watchers = []
+    for n in range(2):
+        user_id = "watcher-{}-{}".format(session_entry.session_id, n)
+        users.register_user(user_id)
+        spectate.attach_spectator(session_entry.session_id, user_id)
+        terminal = ScreenBuffer.make_instance(None, size=(60, 20))
+        app = spectate.SSHSpectatorProtocol.make_instance(
+            None, terminal, user_id, terminal, session_entry.session_id)
+        app.term_size = (60, 20)
+        watchers.append(app)
+    yield session_entry, watchers
+    for app in watchers:
+        spectate.detach_spectator(app.user_id)
+        users.unregister_user(app.user_id)
+
+
+def test_spectators_share_one_parsed_frame(watched_entry):
+    entry, watchers = watched_entry
+    before = spectate.get_render_stats()
+    for app in watchers:
+        app.update_display()
+    stats = spectate.get_render_stats()
+    assert stats['rendered'] - before['rendered'] == 1
+    assert stats['shared'] - before['shared'] == 1
+    expected = ScreenBuffer.make_instance(None, size=(60, 20))
+    expected.write(spectate.render_terminal_frame(entry, (60, 20)))
+    for app in watchers:
+        assert app.terminal._back == expected._back
@@ -0,0 +1,101 @@
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+from txwerewolves.werewolf import WerewolfGame
+import pytest
+
+
+ROLES = frozenset([
+    WerewolfGame.CARD_WEREWOLF,
+    WerewolfGame.CARD_SEER,
+    WerewolfGame.CARD_ROBBER,
+])
+
+
+def test_pipeline_skips_roles_not_in_play():
+    pipeline = WerewolfGame.compile_phase_pipeline(ROLES)
+    assert pipeline.schedule == ("werewolf", "seer", "robber", "daybreak")
+    assert pipeline.next_tags["seer"] == "robber"
+    assert pipeline.next_tags["robber"] == "daybreak"
+
+
+def test_subclass_phase_table_may_drop_phases():
+
+    class NoSeerGame(WerewolfGame):
+        phase_table = tuple(
+            info for info in WerewolfGame.phase_table if info.tag != "seer")
+
+    pipeline = NoSeerGame.compile_phase_pipeline(ROLES)
+    assert pipeline.schedule == ("werewolf", "robber", "daybreak")
+    assert WerewolfGame.compile_phase_pipeline(ROLES).schedule[1] == "seer"
+
+
+def test_subclass_phase_table_cannot_reorder_phases():
+
+    class ReversedGame(WerewolfGame):
+        phase_table = tuple(reversed(WerewolfGame.phase_table))
+
+    with pytest.raises(Exception, match="phase table"):
+        ReversedGame.compile_phase_pipeline(ROLES)
+
+
+def deal_game(check_card_index=True):
+    """
+    Deal a five player game with a robber and a troublemaker, and return it
+    with a mapping of cards to the players who were dealt them.
+    """
+    game = WerewolfGame()
+    game.seed = 11
+    game.check_card_index = check_card_index
+    game.add_players(["a", "b", "c", "d", "e"])
+    game.deal_cards(1, frozenset([
+        WerewolfGame.CARD_ROBBER, WerewolfGame.CARD_TROUBLEMAKER]))
+    holders = {}
+    for player, card in game.query_player_cards().items():
+        holders.setdefault(card, []).append(player)
+    return game, holders
+
+
+def play_night(game, holders):
+    """
+    Use the robber's and the troublemaker's powers if they were dealt.
+    """
+    players = sorted(game.query_player_cards())
+    for tag in game.phase_pipeline.schedule:
+        game.enter_phase(tag)
+        if tag == "robber":
+            robber = holders[WerewolfGame.CARD_ROBBER][0]
+            game.robber_steal_card([p for p in players if p != robber][0])
+        elif tag == "troublemaker":
+            troublemaker = holders[WerewolfGame.CARD_TROUBLEMAKER][0]
+            player_a, player_b = [p for p in players if p != troublemaker][:2]
+            game.troublemaker_switch_cards(player_a, player_b)
+
+
+def test_card_index_stays_consistent_through_the_night():
+    game, holders = deal_game()
+    assert WerewolfGame.CARD_ROBBER in holders
+    assert WerewolfGame.CARD_TROUBLEMAKER in holders
+    play_night(game, holders)
+    assert game.savestate() == game.TOKEN_DAYBREAK
+    game._verify_card_index()
+
+
+def test_card_index_check_reports_inconsistency():
+    game, holders = deal_game()
+    # A stale holder the card moves won't clear.
+    werewolf = holders[WerewolfGame.CARD_WEREWOLF][0]
+    game._new_card_players[WerewolfGame.CARD_VILLAGER].append(werewolf)
+    with pytest.raises(Exception, match="card index is inconsistent"):
+        play_night(game, holders)
+
+
+def test_card_index_check_is_off_by_default():
+    game, holders = deal_game(check_card_index=False)
+    werewolf = holders[WerewolfGame.CARD_WEREWOLF][0]
+    game._new_card_players[WerewolfGame.CARD_VILLAGER].append(werewolf)
+    play_night(game, holders)
+    assert game.savestate() == game.TOKEN_DAYBREAK
@@ -6,6 +6,12 @@ from __future__ import (
 import argparse
 import os.path
 import sys
+from txwerewolves.bots import LoadGenerator
+from txwerewolves.game import (
+    HandledWerewolfGame,
+    parse_phase_timeouts,
+)
+from txwerewolves.scheduler import FrameScheduler
 from txwerewolves.service import SSHService
 from txwerewolves.webservice import WebService
 from twisted.application.service import (
@@ -24,6 +30,7 @@ class Options(usage.Options):
     optFlags = [
         ('no-ssh', None, 'Disable the SSH service.'),
         ('no-web', None, 'Disable the web service.'),
+        ('compact-games', None, 'Store game state in compact array-backed buffers.'),
     ]
 
     optParameters = [
@@ -50,12 +57,45 @@ class Options(usage.Options):
             'u',
             None,
             "The path to the user database file."
-        )
+        ),
+        (
+            'bot-games',
+            None,
+            None,
+            "Start this many all-bot games alongside the services (load testing).",
+            int
+        ),
+        (
+            'phase-timeout',
+            None,
+            None,
+            "Seconds allowed per phase, e.g. '60' or '60,daybreak=300'."
+        ),
+        (
+            'game-lifetime',
+            None,
+            None,
+            "Tear a game and its session down after this many seconds.",
+            float
+        ),
+        (
+            'max-fps',
+            None,
+            None,
+            "Frames per second each SSH connection may render (default 30, 0 for no limit).",
+            float
+        ),
     ]
 
     def postOptions(self):
         if self['no-ssh'] and self['no-web']:
             raise usage.UsageError("No services enabled.  Quitting.")
+        phase_timeout = self['phase-timeout']
+        if phase_timeout is not None:
+            try:
+                self['phase-timeout'] = parse_phase_timeouts(phase_timeout)
+            except Exception as ex:
+                raise usage.UsageError("Invalid phase timeout: {}".format(ex))
 
 
 @implementer(IServiceMaker, IPlugin)
@@ -74,6 +114,17 @@ class MyServiceMaker(object):
         no_web = options.get('no-web', False)
         reactor = twisted.internet.reactor
         root_service = MultiService()
+        if options.get('compact-games', False):
+            HandledWerewolfGame.compact_state = True
+        phase_timeout = options.get('phase-timeout', None)
+        if phase_timeout is not None:
+            default, timeouts = phase_timeout
+            HandledWerewolfGame.phase_timeout = default
+            HandledWerewolfGame.phase_timeouts = timeouts
+        HandledWerewolfGame.game_lifetime = options.get('game-lifetime', None)
+        max_fps = options.get('max-fps', None)
+        if max_fps is not None:
+            FrameScheduler.max_fps = max_fps
         if not no_ssh:
             ssh_key_dir = options.get('ssh-key-dir', None)
             private_key_path, pubkey_path = self._get_ssh_service_keys(ssh_key_dir)
@@ -90,6 +141,10 @@ class MyServiceMaker(object):
             web_service = WebService.make_instance(reactor)
             web_service.endpoint_str = options.get('web-endpoint', self.web_endpoint_str)
             web_service.setServiceParent(root_service)
+        bot_games = options.get('bot-games', None)
+        if bot_games:
+            generator = LoadGenerator.make_instance(reactor, games=bot_games)
+            reactor.callWhenRunning(generator.start)
         return root_service
 
     def _get_user_db(self):
@@ -41,7 +41,7 @@ class TerminalAppBase(AppBase):
     def install_dialog(self, dialog):
         dialog.parent = weakref.ref(self)
         self.dialog = dialog
-        dialog.draw()
+        dialog.paint()
 
     def terminalSize(self, w, h):
         """
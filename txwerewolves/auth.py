@@ -19,14 +19,58 @@ from zope.interface.declarations import implementer
 class ServerProtocol2(ServerProtocol):
     """
     Like `tx.conch.insults.insults.ServerProtocol`, but with options.
+
+    When `batchWrites` is set and a reactor is available, everything written
+    during a reactor turn is sent to the transport as a single write at the
+    end of the turn.
     """
+    batchWrites = True
     clearOnExit = True
+    reactor = None
+    _flush_call = None
+    _pending = None
+
+    def write(self, data):
+        if not data:
+            return
+        if not self.batchWrites or self.reactor is None:
+            ServerProtocol.write(self, data)
+            return
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8")
+        pending = self._pending
+        if pending is None:
+            pending = self._pending = []
+            self._flush_call = self.reactor.callLater(0, self.flush)
+        pending.append(data)
+
+    def flush(self):
+        """
+        Send the buffered writes to the transport.
+        """
+        flush_call = self._flush_call
+        if flush_call is not None and flush_call.active():
+            flush_call.cancel()
+        self._flush_call = None
+        pending = self._pending
+        self._pending = None
+        if pending:
+            ServerProtocol.write(self, b"".join(pending))
 
     def loseConnection(self):
         if self.clearOnExit:
-            self.terminalProtocol.terminal.reset()
+            self.reset()
+        self.flush()
         self.transport.loseConnection()
 
+    def connectionLost(self, reason):
+        flush_call = self._flush_call
+        if flush_call is not None and flush_call.active():
+            flush_call.cancel()
+        self._flush_call = None
+        self._pending = None
+        ServerProtocol.connectionLost(self, reason)
+
 
 @implementer(ISession)
 class SSHAvatar(ConchUser):
@@ -39,6 +83,10 @@ class SSHAvatar(ConchUser):
     the underlying SSH session protocol.
     """
     reactor = None
+    # Seconds the window size must stay the same before the display is
+    # laid out and drawn again.
+    resize_delay = 0.15
+    _resize_call = None
 
     @classmethod
     def make_instance(klass, user_id, reactor):
@@ -78,6 +126,7 @@ class SSHAvatar(ConchUser):
     def openShell(self, protocol):
         serverProto = ServerProtocol2(
             make_terminal_adapter, self.reactor, self.user_id)
+        serverProto.reactor = self.reactor
         serverProto.makeConnection(protocol)
         protocol.makeConnection(wrapProtocol(serverProto))
         self.ssh_protocol = serverProto
@@ -117,17 +166,45 @@ class SSHAvatar(ConchUser):
         A new avatar will be attached to the application
         at the same state.
         """
+        self._cancel_resize()
         shut_down_avatar(self)
 
     def  windowChanged(self, newWindowSize):
+        """
+        Window changes arrive in bursts while a window is being dragged, so
+        the display is only updated once the size settles.
+        """
         h, w, x, y = newWindowSize
         self.term_size = (w, h)
+        resize_call = self._resize_call
+        if resize_call is not None and resize_call.active():
+            resize_call.reset(self.resize_delay)
+        else:
+            self._resize_call = self.reactor.callLater(
+                self.resize_delay, self._apply_resize)
+
+    def _apply_resize(self):
+        self._resize_call = None
         term_protocol = self.ssh_protocol.terminalProtocol
-        term_protocol.term_size = self.term_size
+        if term_protocol is None:
+            return
         app_protocol = term_protocol.app_protocol
+        if app_protocol.term_size == self.term_size:
+            return
+        term_protocol.term_size = self.term_size
         app_protocol.term_size = self.term_size
+        # The display update lays out any open dialog for the new size.
+        dialog = app_protocol.dialog
+        if dialog is not None:
+            dialog.cancel_redraw()
         app_protocol.update_display()
 
+    def _cancel_resize(self):
+        resize_call = self._resize_call
+        if resize_call is not None and resize_call.active():
+            resize_call.cancel()
+        self._resize_call = None
+
 
 @implementer(IRealm)
 class SSHRealm(object):
@@ -0,0 +1,376 @@
+"""
+Batches of independent Werewolves! games played in lock step.
+
+A :py:class:`BatchWerewolfGame` holds many games with the same number of
+players and the same settings.  Instead of one state machine per game, the
+cards of every game are stored in flat `bytearray` buffers with one row per
+game, and each method acts on the whole batch at once.  Players are
+identified by seat number (0 for the first player, and so on).
+
+The deal, the vote tally, and the winner are decided by the same
+`WerewolfGame` class methods the state machine uses, so a game in a batch
+plays out exactly like a `WerewolfGame` with the same seed, the same seats,
+and the same night actions.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+import random
+from txwerewolves.werewolf import (
+    VoteTally,
+    WerewolfGame,
+)
+
+TABLE_SIZE = 3
+
+
+class BatchWerewolfGame(object):
+    """
+    N games advanced together.  Night actions take a sequence with one
+    entry per game; an entry of `None` means the power is not used in that
+    game.
+    """
+    game_count = 0
+    player_count = 0
+    werewolf_count = 2
+    roles = None
+    seeds = None
+    # Original and current cards, `player_count` bytes per game.
+    player_cards = None
+    new_player_cards = None
+    # Original table cards, 3 bytes per game.
+    table_cards = None
+    # Seat holding each night role in the original deal, or -1.
+    role_seats = None
+    # One flag per seat per game.
+    eliminated = None
+    winners = None
+    phase = None
+
+    @classmethod
+    def make_instance(klass, game_count, player_count, werewolf_count=2, roles=frozenset([
+            WerewolfGame.CARD_SEER, WerewolfGame.CARD_ROBBER, WerewolfGame.CARD_TROUBLEMAKER]),
+            seeds=None):
+        """
+        Create a batch of games.  If `seeds` is not given, a seed is chosen
+        for each game.  Seeds are compatible with `WerewolfGame.seed`.
+        """
+        instance = klass()
+        instance.game_count = game_count
+        instance.player_count = player_count
+        instance.werewolf_count = werewolf_count
+        instance.roles = frozenset(roles)
+        if seeds is None:
+            sysrandom = random.SystemRandom()
+            seeds = [sysrandom.getrandbits(64) for n in range(game_count)]
+        else:
+            seeds = list(seeds)
+            if len(seeds) != game_count:
+                raise Exception("Expected {} seeds, got {}.".format(game_count, len(seeds)))
+        instance.seeds = seeds
+        return instance
+
+    # ------
+    # Layout
+    # ------
+
+    def _row(self, game):
+        start = game * self.player_count
+        return start, start + self.player_count
+
+    def get_player_cards(self, game, new=False):
+        """
+        Return the list of cards held by each seat in `game`, as dealt or,
+        if `new` is set, as they are now.
+        """
+        start, end = self._row(game)
+        if new:
+            return list(self.new_player_cards[start:end])
+        return list(self.player_cards[start:end])
+
+    def get_table_cards(self, game):
+        """
+        Return the list of table cards in `game`.
+        """
+        start = game * TABLE_SIZE
+        return list(self.table_cards[start:start + TABLE_SIZE])
+
+    def _check_phase(self, *phases):
+        if self.phase not in phases:
+            raise Exception("This action isn't allowed in phase {!r}.".format(self.phase))
+
+    # -----
+    # Night
+    # -----
+
+    def deal_cards(self):
+        """
+        Deal the cards for every game in the batch.
+        """
+        self._check_phase(None)
+        game_count = self.game_count
+        player_count = self.player_count
+        player_cards = bytearray(game_count * player_count)
+        table_cards = bytearray(game_count * TABLE_SIZE)
+        role_seats = {}
+        for info in WerewolfGame.phase_table:
+            role_seats[info.card] = [-1] * game_count
+        rng = random.Random()
+        deal_deck = WerewolfGame.deal_deck
+        werewolf_count = self.werewolf_count
+        roles = self.roles
+        for game, seed in enumerate(self.seeds):
+            rng.seed(seed)
+            deck = deal_deck(rng, player_count, werewolf_count, roles)
+            start = game * player_count
+            player_cards[start:start + player_count] = bytearray(deck[:player_count])
+            table_start = game * TABLE_SIZE
+            table_cards[table_start:table_start + TABLE_SIZE] = bytearray(deck[-TABLE_SIZE:])
+            for seat in range(player_count - 1, -1, -1):
+                seats = role_seats.get(deck[seat])
+                if seats is not None:
+                    seats[game] = seat
+        self.player_cards = player_cards
+        self.new_player_cards = bytearray(player_cards)
+        self.table_cards = table_cards
+        self.role_seats = role_seats
+        self.phase = "dealt"
+
+    def advance_phase(self, tag):
+        """
+        Move every game in the batch to the night phase named by `tag`, or
+        to daybreak.  Phases must be entered in order, but any may be
+        skipped.
+        """
+        order = [None, "dealt"] + [info.tag for info in WerewolfGame.phase_table]
+        order.append(WerewolfGame.TAG_DAYBREAK)
+        if order.index(tag) <= order.index(self.phase):
+            raise Exception("Can't go back from phase {!r} to {!r}.".format(self.phase, tag))
+        self.phase = tag
+
+    def role_seat(self, card):
+        """
+        Return the seat dealt `card` in each game, or -1 where the card is
+        on the table.  For werewolves, the first werewolf seat is returned.
+        """
+        return list(self.role_seats[card])
+
+    def identify_werewolves(self):
+        """
+        Return a list of the werewolf seats for each game.
+        """
+        self._check_phase("werewolf", "minion")
+        player_count = self.player_count
+        cards = self.player_cards
+        werewolf = WerewolfGame.CARD_WEREWOLF
+        results = []
+        for game in range(self.game_count):
+            start = game * player_count
+            results.append([
+                seat for seat in range(player_count)
+                if cards[start + seat] == werewolf])
+        return results
+
+    def seer_view_player_cards(self, seats):
+        """
+        The seer in each game looks at the card of the seat given for that
+        game.  Returns the card seen, or None.
+        """
+        self._check_phase("seer")
+        player_count = self.player_count
+        cards = self.player_cards
+        results = []
+        for game, seat in enumerate(seats):
+            if seat is None:
+                results.append(None)
+            else:
+                results.append(cards[game * player_count + seat])
+        return results
+
+    def seer_view_table_cards(self, positions):
+        """
+        The seer in each game looks at the 2 table cards at the positions
+        given for that game.  Returns a pair of cards, or None.
+        """
+        self._check_phase("seer")
+        table_cards = self.table_cards
+        results = []
+        for game, pair in enumerate(positions):
+            if pair is None:
+                results.append(None)
+                continue
+            pos1, pos2 = pair
+            assert pos1 in (0, 1, 2), "Position must be 0, 1, or 2."
+            assert pos2 in (0, 1, 2), "Position must be 0, 1, or 2."
+            start = game * TABLE_SIZE
+            results.append((table_cards[start + pos1], table_cards[start + pos2]))
+        return results
+
+    def robber_steal_cards(self, seats):
+        """
+        The robber in each game exchanges cards with the seat given for that
+        game.  Returns the card each robber stole, or None.
+        """
+        self._check_phase("robber")
+        player_count = self.player_count
+        new_cards = self.new_player_cards
+        robber_seats = self.role_seats[WerewolfGame.CARD_ROBBER]
+        robber = WerewolfGame.CARD_ROBBER
+        results = []
+        for game, seat in enumerate(seats):
+            robber_seat = robber_seats[game]
+            if seat is None or robber_seat < 0:
+                results.append(None)
+                continue
+            start = game * player_count
+            stolen_card = new_cards[start + seat]
+            new_cards[start + seat] = robber
+            new_cards[start + robber_seat] = stolen_card
+            results.append(stolen_card)
+        return results
+
+    def troublemaker_switch_cards(self, pairs):
+        """
+        The troublemaker in each game switches the cards of the 2 seats
+        given for that game.
+        """
+        self._check_phase("troublemaker")
+        player_count = self.player_count
+        new_cards = self.new_player_cards
+        troublemaker_seats = self.role_seats[WerewolfGame.CARD_TROUBLEMAKER]
+        for game, pair in enumerate(pairs):
+            if pair is None or troublemaker_seats[game] < 0:
+                continue
+            start = game * player_count
+            a = start + pair[0]
+            b = start + pair[1]
+            new_cards[a], new_cards[b] = new_cards[b], new_cards[a]
+
+    def insomniac_view_cards(self):
+        """
+        Return the current card of the insomniac in each game, or None.
+        """
+        self._check_phase("insomniac")
+        player_count = self.player_count
+        new_cards = self.new_player_cards
+        results = []
+        for game, seat in enumerate(self.role_seats[WerewolfGame.CARD_INSOMNIAC]):
+            if seat < 0:
+                results.append(None)
+            else:
+                results.append(new_cards[game * player_count + seat])
+        return results
+
+    # ---
+    # Day
+    # ---
+
+    def query_hunters(self):
+        """
+        Return the seat currently holding the hunter card in each game, or
+        None.
+        """
+        player_count = self.player_count
+        new_cards = self.new_player_cards
+        hunter = WerewolfGame.CARD_HUNTER
+        results = []
+        for game in range(self.game_count):
+            start = game * player_count
+            try:
+                index = new_cards.index(hunter, start, start + player_count)
+            except ValueError:
+                results.append(None)
+            else:
+                results.append(index - start)
+        return results
+
+    def count_votes(self, votes):
+        """
+        Eliminate players and end every game.  `votes` has one entry per
+        game: a sequence with the seat each seat voted for (or None).
+        Returns the eliminated seats for each game.
+        """
+        self._check_phase(WerewolfGame.TAG_DAYBREAK)
+        tally_votes = WerewolfGame.tally_votes
+        eliminated = []
+        for hunter, game_votes in zip(self.query_hunters(), votes):
+            vote_map = dict(
+                (voter, seat) for voter, seat in enumerate(game_votes)
+                if seat is not None)
+            eliminated.append(tally_votes(vote_map, hunter))
+        self.eliminate_players(eliminated)
+        return eliminated
+
+    def eliminate_players(self, eliminated):
+        """
+        Eliminate the seats given for each game and decide the winners.
+        """
+        self._check_phase(WerewolfGame.TAG_DAYBREAK)
+        player_count = self.player_count
+        new_cards = self.new_player_cards
+        decide_winner = WerewolfGame.decide_winner
+        flags = bytearray(self.game_count * player_count)
+        winners = bytearray(self.game_count)
+        for game, seats in enumerate(eliminated):
+            start = game * player_count
+            final_cards = new_cards[start:start + player_count]
+            for seat in seats:
+                flags[start + seat] = 1
+            eliminated_cards = [final_cards[seat] for seat in seats]
+            winners[game] = decide_winner(eliminated_cards, final_cards)
+        self.eliminated = flags
+        self.winners = winners
+        self.phase = "endgame"
+
+
+def verify_against_scalar(player_count, roles, werewolf_count=2, games=200, seed=None):
+    """
+    Play `games` random games both as a batch and one at a time with
+    :py:class:`WerewolfGame` and :py:class:`VoteTally`, and return the
+    number of games whose eliminated seats or winners disagree.  Some seats
+    abstain from the vote, the hunter included.
+    """
+    rng = random.Random(seed)
+    seeds = [rng.getrandbits(64) for n in range(games)]
+    seats = list(range(player_count))
+    robber_targets = [rng.choice(seats) for n in range(games)]
+    troublemaker_pairs = [tuple(rng.sample(seats, 2)) for n in range(games)]
+    votes = []
+    for n in range(games):
+        votes.append([
+            None if rng.random() < 0.25 else rng.choice(seats) for seat in seats])
+    batch = BatchWerewolfGame.make_instance(
+        games, player_count, werewolf_count, roles, seeds=seeds)
+    batch.deal_cards()
+    for tag in WerewolfGame.compile_phase_pipeline(roles).schedule:
+        batch.advance_phase(tag)
+        if tag == "robber":
+            batch.robber_steal_cards(robber_targets)
+        elif tag == "troublemaker":
+            batch.troublemaker_switch_cards(troublemaker_pairs)
+    eliminated = batch.count_votes(votes)
+    mismatches = 0
+    for n in range(games):
+        game = WerewolfGame()
+        game.seed = seeds[n]
+        game.add_players(seats)
+        game.deal_cards(werewolf_count, roles)
+        for tag in game.phase_pipeline.schedule:
+            game.enter_phase(tag)
+            if tag == "robber" and batch.role_seats[WerewolfGame.CARD_ROBBER][n] >= 0:
+                game.robber_steal_card(robber_targets[n])
+            elif tag == "troublemaker" and batch.role_seats[WerewolfGame.CARD_TROUBLEMAKER][n] >= 0:
+                game.troublemaker_switch_cards(*troublemaker_pairs[n])
+        tally = VoteTally.make_instance(game.query_hunter())
+        for voter, seat in enumerate(votes[n]):
+            if seat is not None:
+                tally.cast(voter, seat)
+        expected = tally.eliminated()
+        game.eliminate_players(expected)
+        winner = game.query_post_game_results().winner
+        if sorted(eliminated[n]) != expected or batch.winners[n] != winner:
+            mismatches += 1
+    return mismatches
@@ -0,0 +1,336 @@
+"""
+Benchmarks for the game rules engine.
+
+Games are played through :py:class:`txwerewolves.game.HandledWerewolfGame`
+for every player count and every role combination the session admin dialog
+allows.  The deal, each night phase transition, each night power,
+`count_votes()`, and `query_post_game_results()` are timed separately.  The
+cost of dispatching each machine input through the state machine library is
+measured by comparing the input with a direct call of its output.
+
+Results can be saved as a JSON baseline and later runs compared against it::
+
+    $ python -m txwerewolves.benchmark --save baseline.json
+    $ python -m txwerewolves.benchmark --compare baseline.json
+
+The comparison exits with a non-zero status if any operation got slower by
+more than the tolerance.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import timeit
+from txwerewolves.game import HandledWerewolfGame
+from txwerewolves.werewolf import (
+    OPTIONAL_ROLES,
+    WerewolfGame,
+    generate_role_sets,
+)
+from txwerewolves import (
+    session,
+    users,
+)
+
+BASELINE_VERSION = 1
+
+
+class _BenchmarkAvatar(object):
+    """
+    Stands in for a connected avatar.  Signals are counted and dropped.
+    """
+    signals = 0
+
+    def send_app_signal(self, signal):
+        self.signals += 1
+
+
+def role_set_name(roles):
+    """
+    Return a short, stable name for a set of roles.
+    """
+    if len(roles) == 0:
+        return "none"
+    return "+".join(WerewolfGame.get_card_name(card) for card in sorted(roles))
+
+def make_session(player_count):
+    """
+    Create a session with `player_count` members whose avatars drop the
+    signals they receive.
+    """
+    entry = session.create_session()
+    members = []
+    for n in range(player_count):
+        user_id = "bench-{}-{}".format(entry.session_id, n)
+        user_entry = users.register_user(user_id)
+        user_entry.avatar = _BenchmarkAvatar()
+        user_entry.joined_id = entry.session_id
+        members.append(user_id)
+    entry.members = members
+    return entry
+
+def play_game(entry, werewolves, roles, seed, timings):
+    """
+    Play one game for the session `entry`, adding the elapsed time of each
+    operation to `timings`.
+    """
+    timer = timeit.default_timer
+    rng = random.Random(seed)
+    players = list(entry.members)
+
+    def record(key, start):
+        timings[key] = timings.get(key, 0.0) + (timer() - start)
+
+    start = timer()
+    game = HandledWerewolfGame()
+    game.session_id = entry.session_id
+    game.seed = seed
+    entry.appstate = game
+    game.add_players(players)
+    game.deal_cards(werewolves, roles)
+    record("deal", start)
+    # Night powers are only used when the role was dealt to a player
+    # rather than to the table.
+    holders = dict((card, player) for player, card in game.player_cards.items())
+    for tag in game.phase_pipeline.schedule:
+        start = timer()
+        game.advance_to_next_phase()
+        record("phase:{}".format(tag), start)
+        if tag == "seer":
+            start = timer()
+            game.seer_view_table_cards(0, 1)
+            record("power:seer", start)
+        elif tag == "robber" and game.CARD_ROBBER in holders:
+            robber = holders[game.CARD_ROBBER]
+            target = rng.choice([p for p in players if p != robber])
+            start = timer()
+            game.robber_steal_card(target)
+            record("power:robber", start)
+        elif tag == "troublemaker" and game.CARD_TROUBLEMAKER in holders:
+            troublemaker = holders[game.CARD_TROUBLEMAKER]
+            player_a, player_b = rng.sample([p for p in players if p != troublemaker], 2)
+            start = timer()
+            game.troublemaker_switch_cards(player_a, player_b)
+            record("power:troublemaker", start)
+    for player in players:
+        game.cast_vote(player, rng.choice([p for p in players if p != player]))
+    start = timer()
+    game.count_votes()
+    record("count_votes", start)
+    start = timer()
+    game.query_post_game_results()
+    record("query_post_game_results", start)
+
+def run_benchmarks(player_counts=range(3, 21), role_sets=None, werewolves=2, repeat=3, seed=0):
+    """
+    Time the rules engine for each combination of player count and role set.
+    Return a mapping of "operation/players/roles" keys to the best time of
+    `repeat` games, in microseconds.
+    """
+    if role_sets is None:
+        role_sets = list(generate_role_sets())
+    results = {}
+    for player_count in player_counts:
+        entry = make_session(player_count)
+        try:
+            for roles in role_sets:
+                best = {}
+                for n in range(repeat):
+                    timings = {}
+                    play_game(entry, werewolves, roles, seed + n, timings)
+                    for op, elapsed in timings.items():
+                        best[op] = min(best.get(op, elapsed), elapsed)
+                name = role_set_name(roles)
+                for op, elapsed in best.items():
+                    key = "{}/{}/{}".format(op, player_count, name)
+                    results[key] = elapsed * 1e6
+        finally:
+            session.destroy_entry(entry.session_id)
+    return results
+
+def _dispatch_cases(game):
+    """
+    Return (input name, state token) for the query inputs whose dispatch
+    cost is measured, in the order the game reaches their states.
+    """
+    return [
+        ('query_player_cards', game.TOKEN_CARDS_DEALT),
+        ('query_table_cards', game.TOKEN_CARDS_DEALT),
+        ('query_phase', game.TOKEN_WEREWOLF_PHASE),
+        ('is_role_active', game.TOKEN_WEREWOLF_PHASE),
+        ('identify_werewolves', game.TOKEN_WEREWOLF_PHASE),
+        ('query_hunter', game.TOKEN_DAYBREAK),
+        ('query_post_game_results', game.TOKEN_ENDGAME),
+    ]
+
+def measure_dispatch(number=20000, repeat=3):
+    """
+    Measure the cost the state machine library adds to each query input.
+    Return a mapping of input names to nanoseconds per call: the time of
+    the input less the time of calling its output method directly.
+    """
+    roles = frozenset(OPTIONAL_ROLES)
+    game = WerewolfGame()
+    game.seed = 0
+    game.add_players(["p{}".format(n) for n in range(10)])
+    game.deal_cards(2, roles)
+    results = {}
+    schedule = list(game.phase_pipeline.schedule)
+    for name, token in _dispatch_cases(game):
+        while game.savestate() != token:
+            if token == game.TOKEN_ENDGAME:
+                game.eliminate_players([])
+            else:
+                game.enter_phase(schedule.pop(0))
+        machine_input = getattr(game, name)
+        # Output methods can't be called through the class attribute, so
+        # fetch the plain function from the class dictionary.
+        output = vars(WerewolfGame)["_{}".format(name)].method
+
+        def direct():
+            output(game)
+
+        input_time = min(timeit.repeat(machine_input, number=number, repeat=repeat))
+        direct_time = min(timeit.repeat(direct, number=number, repeat=repeat))
+        results[name] = (input_time - direct_time) / number * 1e9
+    return results
+
+def make_baseline(results, dispatch, werewolves, repeat):
+    """
+    Package benchmark results as a baseline document.
+    """
+    try:
+        import automat
+        automat_version = getattr(automat, '__version__', None)
+    except ImportError:
+        automat_version = None
+    return {
+        'version': BASELINE_VERSION,
+        'python': platform.python_version(),
+        'automat': automat_version,
+        'werewolves': werewolves,
+        'repeat': repeat,
+        'results': results,
+        'dispatch': dispatch,
+    }
+
+def summarize(results):
+    """
+    Group per-configuration results by operation.  Return a mapping of
+    operations to (configurations, geometric mean, max) in microseconds.
+    """
+    groups = {}
+    for key, elapsed in results.items():
+        op = key.split("/", 1)[0]
+        groups.setdefault(op, []).append(elapsed)
+    summary = {}
+    for op, values in groups.items():
+        values = [max(value, 1e-3) for value in values]
+        geo_mean = math.exp(sum(math.log(value) for value in values) / len(values))
+        summary[op] = (len(values), geo_mean, max(values))
+    return summary
+
+def compare(results, dispatch, baseline, tolerance=0.25):
+    """
+    Compare results with a baseline.  Each operation is compared by the
+    geometric mean of its ratios to the baseline over the configurations
+    both runs share.  Return a list of (name, ratio) for the operations and
+    inputs that got slower by more than `tolerance`.
+    """
+    ratios = {}
+    for key, elapsed in results.items():
+        base = baseline['results'].get(key)
+        if base is None or base <= 0 or elapsed <= 0:
+            continue
+        op = key.split("/", 1)[0]
+        ratios.setdefault(op, []).append(math.log(elapsed / base))
+    regressions = []
+    for op in sorted(ratios):
+        logs = ratios[op]
+        ratio = math.exp(sum(logs) / len(logs))
+        if ratio > 1.0 + tolerance:
+            regressions.append((op, ratio))
+    # Dispatch overheads are small differences, so compare them against a
+    # floor of 100ns to keep timer noise from failing the gate.
+    base_dispatch = baseline.get('dispatch', {})
+    for name in sorted(dispatch):
+        if name not in base_dispatch:
+            continue
+        ratio = max(dispatch[name], 100.0) / max(base_dispatch[name], 100.0)
+        if ratio > 1.0 + tolerance:
+            regressions.append(("dispatch:{}".format(name), ratio))
+    return regressions
+
+def format_report(results, dispatch):
+    """
+    Format benchmark results as text.
+    """
+    lines = ["operation\tconfigs\tgeomean_us\tmax_us"]
+    summary = summarize(results)
+    for op in sorted(summary):
+        count, geo_mean, max_value = summary[op]
+        lines.append("{}\t{}\t{:.1f}\t{:.1f}".format(op, count, geo_mean, max_value))
+    lines.append("")
+    lines.append("input\tdispatch_ns")
+    for name in sorted(dispatch):
+        lines.append("{}\t{:.0f}".format(name, dispatch[name]))
+    return "\n".join(lines)
+
+def parse_player_counts(text):
+    """
+    Parse a player count range like "3-20" or a single count like "5".
+    """
+    if "-" in text:
+        low, high = text.split("-", 1)
+        return range(int(low), int(high) + 1)
+    return range(int(text), int(text) + 1)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Werewolves! rules engine.")
+    parser.add_argument(
+        "--players", default="3-20", help="Player count or range (default: 3-20).")
+    parser.add_argument(
+        "--werewolves", type=int, default=2, help="Werewolves per game (default: 2).")
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Games per configuration (default: 3).")
+    parser.add_argument(
+        "--save", metavar="PATH", help="Write the results to PATH as a JSON baseline.")
+    parser.add_argument(
+        "--compare", metavar="PATH", help="Compare the results with the baseline at PATH.")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25,
+        help="Allowed slowdown when comparing, as a fraction (default: 0.25).")
+    args = parser.parse_args(argv)
+    player_counts = parse_player_counts(args.players)
+    results = run_benchmarks(
+        player_counts=player_counts,
+        werewolves=args.werewolves,
+        repeat=args.repeat)
+    dispatch = measure_dispatch()
+    print(format_report(results, dispatch))
+    if args.save:
+        baseline = make_baseline(results, dispatch, args.werewolves, args.repeat)
+        with open(args.save, "w") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, dispatch, baseline, tolerance=args.tolerance)
+        if len(regressions) > 0:
+            print("", file=sys.stderr)
+            for name, ratio in regressions:
+                print("REGRESSION {}: {:.2f}x baseline".format(name, ratio), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,535 @@
+"""
+Headless bot players.
+
+A bot is a registered user with a :py:class:`BotAvatar` in place of an SSH
+or web client.  Its application, a :py:class:`BotPlayer`, receives the same
+signals a human player's application does.  When a new phase starts, the
+bot waits for a think time drawn from a configurable distribution, uses its
+night power or casts its vote, and tells the game it is ready to advance.
+
+Bots can fill the empty seats of a session, and a :py:class:`LoadGenerator`
+can run many all-bot games in one process to exercise the game engine and
+the signaling code under realistic traffic::
+
+    $ python -m txwerewolves.bots --games 200 --players 6 --profile load.prof
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+import argparse
+import itertools
+import math
+import random
+import sys
+import weakref
+from txwerewolves.apps import AppBase
+from txwerewolves.game import (
+    HandledWerewolfGame,
+    initialize_game,
+)
+from txwerewolves.interfaces import (
+    IApplication,
+    IAvatar,
+)
+from txwerewolves.werewolf import WerewolfGame
+from txwerewolves import (
+    session,
+    users,
+)
+from twisted.internet import defer
+from twisted.python import log
+from zope.interface.declarations import implementer
+
+_bot_ids = itertools.count(1)
+
+
+def constant_think_time(seconds):
+    """
+    Think for the same time before every move.
+    """
+
+    def think_time(rng):
+        return seconds
+
+    return think_time
+
+def uniform_think_time(low, high):
+    """
+    Think for a time drawn uniformly from [`low`, `high`] seconds.
+    """
+
+    def think_time(rng):
+        return rng.uniform(low, high)
+
+    return think_time
+
+def lognormal_think_time(median, sigma=0.5, limit=None):
+    """
+    Think for a log-normally distributed time with the given median, in
+    seconds.  Most moves are quick, with a long tail of slow ones.  If
+    `limit` is set, think times are capped at `limit` seconds.
+    """
+    mu = 0.0
+    if median > 0:
+        mu = math.log(median)
+
+    def think_time(rng):
+        seconds = rng.lognormvariate(mu, sigma)
+        if limit is not None:
+            seconds = min(seconds, limit)
+        return seconds
+
+    return think_time
+
+# Think times for bots that play alongside people.
+PEOPLE_PACE = lognormal_think_time(2.0, limit=15.0)
+
+
+@implementer(IAvatar)
+class BotAvatar(object):
+    """
+    An avatar with no client attached.  Signals go straight to the bot's
+    application.
+    """
+    user_id = None
+    reactor = None
+    think_time = None
+    signals_received = 0
+
+    @classmethod
+    def make_instance(klass, user_id, reactor, think_time=None):
+        instance = klass()
+        instance.user_id = user_id
+        instance.reactor = reactor
+        if think_time is None:
+            think_time = constant_think_time(0)
+        instance.think_time = think_time
+        instance.init_app_protocol()
+        return instance
+
+    @property
+    def application(self):
+        user_entry = users.get_user_entry(self.user_id)
+        return user_entry.app_protocol
+
+    def install_application(self, app_protocol):
+        if not isinstance(app_protocol, BotPlayer):
+            # Game and lobby applications are made for people.  A bot keeps
+            # playing through its own application.
+            app_protocol = self.application
+        entry = users.get_user_entry(self.user_id)
+        entry.app_protocol = app_protocol
+
+    def init_app_protocol(self):
+        user_entry = users.get_user_entry(self.user_id)
+        user_entry.avatar = self
+        app_protocol = BotPlayer.make_instance(
+            self.reactor, self.user_id, self, self.think_time)
+        user_entry.app_protocol = app_protocol
+
+    def send_app_signal(self, signal):
+        self.signals_received += 1
+        app_protocol = self.application
+        if app_protocol is not None:
+            app_protocol.receive_signal(signal)
+
+    def send_message(self, msg):
+        log.msg("Message for bot {}: {}".format(self.user_id, msg))
+
+    def shut_down(self):
+        """
+        Stop playing and forget the bot's user record, so the bot can't be
+        invited to another session.
+        """
+        app_protocol = self.application
+        if app_protocol is not None:
+            app_protocol.cancel_move()
+        users.unregister_user(self.user_id)
+
+
+@implementer(IApplication)
+class BotPlayer(AppBase):
+    """
+    Plays a game on behalf of a bot.  Decisions are made at random; override
+    the `choose_*` methods for smarter play.
+    """
+    think_time = None
+    rng = None
+    on_game_over = None
+    moves = 0
+    _pending_move = None
+
+    @classmethod
+    def make_instance(klass, reactor, user_id, parent, think_time):
+        instance = klass()
+        instance.reactor = reactor
+        instance.user_id = user_id
+        instance.parent = weakref.ref(parent)
+        instance.think_time = think_time
+        instance.rng = random.Random()
+        return instance
+
+    @property
+    def game(self):
+        """
+        The game for the session the bot has joined, if any.
+        """
+        user_entry = users.get_user_entry(self.user_id)
+        session_entry = session.get_entry(user_entry.joined_id)
+        if session_entry is None:
+            return None
+        return session_entry.appstate
+
+    # A bot needs no lobby UI.  The lobby starts and cancels sessions through
+    # these hooks, and the bot simply follows the session's game.
+    @property
+    def lobby(self):
+        return self
+
+    @property
+    def appstate(self):
+        return self
+
+    def start_session(self):
+        pass
+
+    def cancel(self):
+        # The owner cancelled the session.
+        self._retire()
+
+    def revoke_invitation(self):
+        pass
+
+    def produce_compatible_application(self, iface, parent):
+        if iface.providedBy(self):
+            return self
+        raise Exception("Unable to produce compatible application with interface {}.".format(iface))
+
+    def receive_signal(self, signal):
+        signame, value = signal
+        if signame == 'next-phase':
+            self._schedule_move()
+        elif signame == 'reset':
+            self.cancel_move()
+        elif signame == 'shutdown':
+            self.cancel_move()
+            self._leave_session()
+            self._retire()
+
+    def _retire(self):
+        """
+        A bot only plays in the session it was added to.
+        """
+        parent = self.parent()
+        if parent is not None:
+            parent.shut_down()
+        else:
+            self.cancel_move()
+
+    def cancel_move(self):
+        pending = self._pending_move
+        if pending is not None and pending.active():
+            pending.cancel()
+        self._pending_move = None
+
+    def _schedule_move(self):
+        self.cancel_move()
+        delay = max(0, self.think_time(self.rng))
+        self._pending_move = self.reactor.callLater(delay, self._move)
+
+    def _move(self):
+        self._pending_move = None
+        game = self.game
+        if game is None:
+            return
+        phase = game.phase
+        user_id = self.user_id
+        if phase is None:
+            # The cards haven't been dealt yet.
+            return
+        if phase == game.PHASE_ENDGAME:
+            on_game_over = self.on_game_over
+            if on_game_over is not None:
+                on_game_over(self, game)
+            return
+        if user_id not in game.wait_list:
+            return
+        self.moves += 1
+        if phase == game.PHASE_DAYBREAK:
+            game.cast_vote(user_id, self.choose_vote(game))
+        elif phase != game.PHASE_TWILIGHT and game.is_player_active(user_id):
+            self._use_power(game, phase)
+        game.signal_advance(user_id)
+
+    def _other_players(self, game):
+        players = [player for player in game.player_cards if player != self.user_id]
+        players.sort()
+        return players
+
+    def _use_power(self, game, phase):
+        if game.power_activated:
+            return
+        if phase in (game.PHASE_WEREWOLVES, game.PHASE_MINION):
+            game.identify_werewolves()
+        elif phase == game.PHASE_SEER:
+            player = self.choose_seer_player(game)
+            if player is None:
+                positions = self.rng.sample([0, 1, 2], 2)
+                game.seer_viewed_table_cards = game.seer_view_table_cards(*positions)
+            else:
+                card = game.seer_view_player_card(player)
+                game.seer_viewed_player_card = (player, card)
+            game.power_activated = True
+        elif phase == game.PHASE_ROBBER:
+            player = self.choose_robber_player(game)
+            game.power_activated = True
+            if player is not None:
+                card = game.robber_steal_card(player)
+                game.robber_stolen_card = (player, card)
+        elif phase == game.PHASE_TROUBLEMAKER:
+            players = self.choose_troublemaker_players(game)
+            game.power_activated = True
+            if players is not None:
+                game.troublemaker_switch_cards(*players)
+                game.troublemaker_swapped_players = players
+        elif phase == game.PHASE_INSOMNIAC:
+            game.insomniac_view_card()
+
+    def choose_seer_player(self, game):
+        """
+        Return a player whose card the seer looks at, or None to look at 2
+        table cards instead.
+        """
+        if self.rng.random() < 0.5:
+            return None
+        return self.rng.choice(self._other_players(game))
+
+    def choose_robber_player(self, game):
+        """
+        Return the player the robber steals from, or None.
+        """
+        return self.rng.choice(self._other_players(game))
+
+    def choose_troublemaker_players(self, game):
+        """
+        Return the 2 players whose cards the troublemaker switches, or None.
+        """
+        players = self._other_players(game)
+        if len(players) < 2:
+            return None
+        return tuple(self.rng.sample(players, 2))
+
+    def choose_vote(self, game):
+        """
+        Return the player the bot votes to eliminate.  Werewolves don't vote
+        for each other.
+        """
+        players = self._other_players(game)
+        if game.player_cards[self.user_id] == WerewolfGame.CARD_WEREWOLF:
+            others = [
+                player for player in players
+                if game.player_cards[player] != WerewolfGame.CARD_WEREWOLF]
+            if len(others) > 0:
+                players = others
+        return self.rng.choice(players)
+
+    def _leave_session(self):
+        user_entry = users.get_user_entry(self.user_id)
+        session_id = user_entry.joined_id
+        user_entry.joined_id = None
+        user_entry.invited_id = None
+        session_entry = session.get_entry(session_id)
+        if session_entry is None:
+            return
+        members = session_entry.members
+        members.discard(self.user_id)
+        if len(members) == 0:
+            session.destroy_entry(session_id)
+            log.msg("Destroyed session {}.".format(session_id))
+
+
+def make_bot(reactor, think_time=None, user_id=None):
+    """
+    Register a bot user and return its avatar.
+    """
+    if user_id is None:
+        user_id = "bot-{}".format(next(_bot_ids))
+    if users.get_user_entry(user_id) is not None:
+        raise Exception("User ID '{}' is already registered.".format(user_id))
+    users.register_user(user_id)
+    return BotAvatar.make_instance(user_id, reactor, think_time)
+
+def add_bot_to_session(session_entry, reactor, think_time=None, user_id=None):
+    """
+    Add a new bot to a session that has not started yet.  Returns the bot's
+    avatar.  The bot retires when it leaves the session or the session is
+    cancelled.
+    """
+    avatar = make_bot(reactor, think_time=think_time, user_id=user_id)
+    user_entry = users.get_user_entry(avatar.user_id)
+    user_entry.joined_id = session_entry.session_id
+    session_entry.members.add(avatar.user_id)
+    return avatar
+
+
+class LoadGenerator(object):
+    """
+    Runs many all-bot games at once.  Each session plays `rounds` games
+    back to back.
+    """
+    reactor = None
+    games = 1
+    players = 5
+    rounds = 1
+    roles = None
+    werewolves = 2
+    think_time = None
+    games_completed = 0
+    _sessions = None
+    _rounds_left = None
+    _finished = None
+    _started_at = None
+
+    @classmethod
+    def make_instance(klass, reactor, games=1, players=5, rounds=1, roles=None,
+            werewolves=2, think_time=None):
+        instance = klass()
+        instance.reactor = reactor
+        instance.games = games
+        instance.players = players
+        instance.rounds = rounds
+        if roles is None:
+            roles = set([
+                WerewolfGame.CARD_SEER,
+                WerewolfGame.CARD_ROBBER,
+                WerewolfGame.CARD_TROUBLEMAKER])
+        instance.roles = set(roles)
+        instance.werewolves = werewolves
+        if think_time is None:
+            think_time = lognormal_think_time(0.5, limit=5.0)
+        instance.think_time = think_time
+        instance._sessions = {}
+        instance._rounds_left = {}
+        return instance
+
+    def start(self):
+        """
+        Create the sessions and start the games.  Returns a Deferred that
+        fires with the number of games completed when every session has
+        played all its rounds.
+        """
+        self._finished = defer.Deferred()
+        self._started_at = self.reactor.seconds()
+        for n in range(self.games):
+            session_entry = session.create_session()
+            session_id = session_entry.session_id
+            avatars = []
+            for m in range(self.players):
+                avatar = add_bot_to_session(session_entry, self.reactor, self.think_time)
+                avatar.application.on_game_over = self._handle_game_over
+                avatars.append(avatar)
+            session_entry.owner = avatars[0].user_id
+            self._sessions[session_id] = avatars
+            self._rounds_left[session_id] = self.rounds
+            self._start_game(session_entry)
+        return self._finished
+
+    @property
+    def elapsed(self):
+        return self.reactor.seconds() - self._started_at
+
+    def _start_game(self, session_entry):
+        session_entry.appstate = None
+        initialize_game(
+            session_entry,
+            roles=set(self.roles),
+            werewolves=self.werewolves,
+            reactor=self.reactor)
+
+    def _handle_game_over(self, bot, game):
+        session_id = game.session_id
+        session_entry = session.get_entry(session_id)
+        if session_entry is None or session_entry.appstate is not game:
+            return
+        if bot.user_id != session_entry.owner:
+            return
+        self.games_completed += 1
+        rounds_left = self._rounds_left[session_id] - 1
+        self._rounds_left[session_id] = rounds_left
+        if rounds_left > 0:
+            self._start_game(session_entry)
+            return
+        self._end_session(session_id)
+        if len(self._sessions) == 0:
+            self._finished.callback(self.games_completed)
+
+    def _end_session(self, session_id):
+        avatars = self._sessions.pop(session_id)
+        del self._rounds_left[session_id]
+        for avatar in avatars:
+            avatar.shut_down()
+        session.destroy_entry(session_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play Werewolves! games with bots.")
+    parser.add_argument(
+        "--games", type=int, default=100, help="Concurrent games (default: 100).")
+    parser.add_argument(
+        "--players", type=int, default=5, help="Bots per game (default: 5).")
+    parser.add_argument(
+        "--rounds", type=int, default=1, help="Games played by each session (default: 1).")
+    parser.add_argument(
+        "--think-time", type=float, default=0.5,
+        help="Median think time in seconds (default: 0.5).")
+    parser.add_argument(
+        "--compact-games", action="store_true",
+        help="Store game state in compact array-backed buffers.")
+    parser.add_argument(
+        "--profile", metavar="PATH", help="Write cProfile statistics to PATH.")
+    args = parser.parse_args(argv)
+    from twisted.internet import reactor
+    if args.compact_games:
+        HandledWerewolfGame.compact_state = True
+    if args.think_time > 0:
+        think_time = lognormal_think_time(args.think_time, limit=args.think_time * 10)
+    else:
+        think_time = constant_think_time(0)
+    generator = LoadGenerator.make_instance(
+        reactor,
+        games=args.games,
+        players=args.players,
+        rounds=args.rounds,
+        think_time=think_time)
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+
+    def _report(games_completed):
+        print("{} games completed in {:.2f}s.".format(games_completed, generator.elapsed))
+        stats = session.get_broadcast_stats()
+        print("Broadcasts: {scheduled} scheduled, {merged} merged, {sent} sent, {dropped} dropped.".format(
+            **stats))
+        reactor.stop()
+
+    def _start():
+        if profiler is not None:
+            profiler.enable()
+        d = generator.start()
+        d.addCallback(_report)
+        d.addErrback(log.err)
+
+    reactor.callWhenRunning(_start)
+    reactor.run()
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Compact, array-backed containers for game state.
+
+Players are numbered once when they are added to a game.  Card
+assignments, votes, and readiness flags are then stored in `bytearray` or
+`array` buffers indexed by player number instead of in dicts and sets keyed
+by user ID.  The containers implement the mapping and set protocols, so
+code that reads game state does not need to know which layout is in use.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+import array
+from six.moves import collections_abc
+
+
+class PlayerIndex(object):
+    """
+    Assigns each player a fixed slot number.
+    """
+    __slots__ = ('players', 'slots')
+
+    @classmethod
+    def make_instance(klass, players):
+        instance = klass()
+        instance.players = tuple(players)
+        instance.slots = dict((player, n) for n, player in enumerate(instance.players))
+        return instance
+
+    def __len__(self):
+        return len(self.players)
+
+
+class CardMap(collections_abc.MutableMapping):
+    """
+    Mapping of players to cards, stored as one byte per player.
+    """
+    __slots__ = ('_index', '_cards')
+
+    @classmethod
+    def make_instance(klass, index, cards):
+        instance = klass()
+        instance._index = index
+        instance._cards = bytearray(cards)
+        return instance
+
+    def __getitem__(self, player):
+        return self._cards[self._index.slots[player]]
+
+    def __setitem__(self, player, card):
+        self._cards[self._index.slots[player]] = card
+
+    def __delitem__(self, player):
+        raise TypeError("Players can't be removed from a card map.")
+
+    def __iter__(self):
+        return iter(self._index.players)
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __repr__(self):
+        return "CardMap({!r})".format(dict(self))
+
+    def copy(self):
+        return CardMap.make_instance(self._index, self._cards)
+
+
+class VoteMap(collections_abc.MutableMapping):
+    """
+    Mapping of voters to the players they voted for, stored as one signed
+    byte per player.  Players who have not voted hold -1.
+    """
+    __slots__ = ('_index', '_votes')
+    NO_VOTE = -1
+
+    @classmethod
+    def make_instance(klass, index):
+        instance = klass()
+        instance._index = index
+        instance._votes = array.array('b', [klass.NO_VOTE] * len(index))
+        return instance
+
+    def __getitem__(self, voter):
+        slot = self._votes[self._index.slots[voter]]
+        if slot == self.NO_VOTE:
+            raise KeyError(voter)
+        return self._index.players[slot]
+
+    def __setitem__(self, voter, player):
+        slots = self._index.slots
+        self._votes[slots[voter]] = slots[player]
+
+    def __delitem__(self, voter):
+        slot = self._index.slots[voter]
+        if self._votes[slot] == self.NO_VOTE:
+            raise KeyError(voter)
+        self._votes[slot] = self.NO_VOTE
+
+    def __iter__(self):
+        players = self._index.players
+        for slot, vote in enumerate(self._votes):
+            if vote != self.NO_VOTE:
+                yield players[slot]
+
+    def __len__(self):
+        no_vote = self.NO_VOTE
+        return sum(1 for vote in self._votes if vote != no_vote)
+
+    def __repr__(self):
+        return "VoteMap({!r})".format(dict(self))
+
+
+class PlayerSet(collections_abc.MutableSet):
+    """
+    Set of players, stored as one flag byte per player.
+    """
+    __slots__ = ('_index', '_flags', '_count')
+
+    @classmethod
+    def make_instance(klass, index, players=()):
+        instance = klass()
+        instance._index = index
+        instance._flags = bytearray(len(index))
+        instance._count = 0
+        for player in players:
+            instance.add(player)
+        return instance
+
+    def __contains__(self, player):
+        slot = self._index.slots.get(player)
+        if slot is None:
+            return False
+        return self._flags[slot] == 1
+
+    def __iter__(self):
+        players = self._index.players
+        for slot, flag in enumerate(self._flags):
+            if flag:
+                yield players[slot]
+
+    def __len__(self):
+        return self._count
+
+    def __repr__(self):
+        return "PlayerSet({!r})".format(list(self))
+
+    def add(self, player):
+        slot = self._index.slots[player]
+        if not self._flags[slot]:
+            self._flags[slot] = 1
+            self._count += 1
+
+    def discard(self, player):
+        slot = self._index.slots.get(player)
+        if slot is None:
+            return
+        if self._flags[slot]:
+            self._flags[slot] = 0
+            self._count -= 1
@@ -4,9 +4,12 @@ import string
 import textwrap
 import weakref
 from txwerewolves import (
+    formatting,
+    frames,
     session,
     users,
 )
+from txwerewolves.profiles import PROFILES
 from txwerewolves.utils import (
     wrap_paras,
 )
@@ -20,34 +23,43 @@ from twisted.conch.insults.text import (
 )
 from twisted.python import log
 
+# Maps (sender, message, width) to the wrapped transcript rows of a chat
+# message, so each message is wrapped once for all of the viewers.
+_wrapped_messages = {}
+WRAPPED_MESSAGES_LIMIT = 1000
+
 
 class TermDialog(object):
     parent = None
     left = None
     top = None
-    _redraw_id = None
     
     def draw(self):
         raise NotImplementedError()
 
-    def schedule_redraw(self):
-        reactor = self.parent().reactor
-        if not self._redraw_id is None and self._redraw_id.active():
-            return
-
-        def _redraw():
-            self.draw()
-            self._redraw_id = None
+    def paint(self, draw=None):
+        """
+        Draw the dialog on its own layer of the screen.  If `draw` is given,
+        it is called to update part of the layer instead.
+        """
+        terminal = self.terminal
+        terminal.open_layer(self, clear=(draw is None))
+        try:
+            if draw is None:
+                self.draw()
+            else:
+                draw()
+        finally:
+            terminal.end_layer()
 
-        self._redraw_id = reactor.callLater(0, _redraw)
+    def schedule_redraw(self):
+        """
+        Draw the dialog in the connection's next frame.
+        """
+        self.terminal.scheduler.request((self, 'paint'), self.paint)
 
     def cancel_redraw(self):
-        redraw_id = self._redraw_id
-        if redraw_id is None:
-            return
-        if redraw_id.active():
-            redraw_id.cancel()
-        self.redraw_id = None
+        self.terminal.scheduler.cancel((self, 'paint'))
 
     def handle_input(self, key_id, modifier):
         """
@@ -78,6 +90,7 @@ class TermDialog(object):
 
     def uninstall_dialog(self):
         self.cancel_redraw()
+        self.terminal.close_layer(self)
         parent = self.parent()
         parent.dialog = None
         parent.update_display()
@@ -125,6 +138,9 @@ class HelpDialog(TermDialog):
         msg = "Available Commands"
         emca48 = A.underline[msg, -A.underline[""]]
         heading = assembleFormattedText(emca48)
+        profile = terminal.profile
+        if terminal.profile_override is None:
+            profile = "auto ({})".format(profile)
         text = textwrap.dedent("""\
             h        - This help.
             q or ESC - Quit dialog.
@@ -132,7 +148,8 @@ class HelpDialog(TermDialog):
             CTRL-A   - Session admin mode.  Change game settings / restart.
             CTRL-X   - Quit to lobby.
             CTRL-D   - Disconnect (may reconnect later).
-            """)
+            p        - Change display mode.  Now: {}
+            """).format(profile)
         lines = wrap_paras(text, help_w - 4)
         row_count = len(lines) + 2
         row = help_top + max((help_h - row_count) // 2, 1) 
@@ -159,16 +176,35 @@ class HelpDialog(TermDialog):
         terminal.cursorPosition(0, th - 1)
         
     def handle_input(self, key_id, modifier):
+        if key_id == 'p':
+            self._cycle_profile()
+            return True
         self.uninstall_dialog()
         return True
 
+    def _cycle_profile(self):
+        """
+        Cycle the display mode through automatic and each profile.
+        """
+        choices = (None,) + PROFILES
+        user_entry = users.get_user_entry(self.user_id)
+        profile = choices[(choices.index(user_entry.render_profile) + 1) % len(choices)]
+        user_entry.render_profile = profile
+        self.terminal.set_profile_override(profile)
+        self.paint()
+
 
 class ChatDialog(TermDialog):
     prompt = ">>>"
     input_buf = None
     output_buf = None
     pos = 0
-    _redraw_prompt = None
+    # The transcript rows last drawn, newest first, the width they were
+    # wrapped to, the most rows kept, and the newest message they include.
+    _rows = ()
+    _rows_width = None
+    _rows_max = 0
+    _last_entry = None
 
     @classmethod
     def make_instance(klass, input_buf, output_buf):
@@ -211,50 +247,56 @@ class ChatDialog(TermDialog):
         if line is not None:
             terminal.write(" ")
             terminal.write(line)
-        output_buf = self.output_buf
+        last_row = dlg_top + dlg_h - 2
         row = equator + 2
         pos = dlg_left + 2
-        filled = False
-        for user_id, msg in reversed(output_buf):
-            prefix = "[{}]: ".format(user_id)
-            prefix_len = len(prefix)
-            lines = wrap_paras(prefix + msg, dlg_w - 4)
+        for prefix, line in self._update_transcript(dlg_w - 4, last_row - row + 1):
             terminal.cursorPosition(pos, row)
-            first = False
-            for line in lines:
-                if not first:
-                    line = line[prefix_len:]
-                    emca48 = A.bold[prefix, -A.bold[""]] 
-                    text = assembleFormattedText(emca48)
-                    terminal.write(text)
-                    first = False
-                if row == (dlg_top + dlg_h - 2):
-                    terminal.write("...")
-                    filled = True
-                    break
-                terminal.write(line)
+            if row == last_row:
+                terminal.write("...")
+                break
+            if prefix is not None:
+                terminal.write(prefix)
+            terminal.write(line)
             row += 1
-            if filled:
+
+    def _update_transcript(self, width, max_rows):
+        """
+        Add the messages posted since the transcript was last drawn to the
+        top of the transcript, and return at most `max_rows` of its rows.
+        """
+        if width != self._rows_width or max_rows > self._rows_max:
+            self._rows = []
+            self._rows_width = width
+            self._last_entry = None
+        self._rows_max = max_rows
+        last_entry = self._last_entry
+        new_rows = []
+        for entry in reversed(self.output_buf):
+            if entry is last_entry:
+                rows = new_rows + self._rows
                 break
+            new_rows.extend(wrap_chat_message(entry, width))
+            if len(new_rows) >= max_rows:
+                rows = new_rows
+                break
+        else:
+            rows = new_rows
+        rows = rows[:max_rows]
+        self._rows = rows
+        if len(self.output_buf) > 0:
+            self._last_entry = self.output_buf[-1]
+        return rows
 
     def schedule_redraw_prompt(self):
-        reactor = self.parent().reactor
-        if not self._redraw_prompt is None and self._redraw_prompt.active():
-            return
-
-        def _redraw():
-            self._compute_coords()
-            self._draw_prompt()
-            self._redraw_prompt = None
-
-        self._redraw_prompt = reactor.callLater(0, _redraw)
+        self.terminal.scheduler.request((self, 'prompt'), self._redraw_prompt)
 
     def cancel_redraw_prompt(self):
-        redraw_prompt = self._redraw_prompt
-        if redraw_prompt is None:
-            return
-        redraw_prompt.cancel()
-        self._redraw_prompt = None
+        self.terminal.scheduler.cancel((self, 'prompt'))
+
+    def _redraw_prompt(self):
+        self._compute_coords()
+        self.paint(self._draw_prompt)
 
     def _draw_bg(self):
         terminal = self.terminal
@@ -331,8 +373,14 @@ class ChatDialog(TermDialog):
 
     def _send_msg(self):
         input_buf = self.input_buf
-        output_buf = self.output_buf
-        output_buf.append((self.user_id, ''.join(input_buf)))
+        user_id = self.user_id
+        message = ''.join(input_buf)
+        user_entry = users.get_user_entry(user_id)
+        session_id = user_entry.joined_id or user_entry.invited_id
+        if session_id is None:
+            self.output_buf.append((user_id, message))
+        else:
+            session.post_chat_message(session_id, user_id, message)
         self._reset_input()
         self._signal_dialogs_redraw()
         self.schedule_redraw()
@@ -515,9 +563,8 @@ class SessionAdminDialog(TermDialog):
             for n, (label, flag) in enumerate(rinfo):
                 pos = dlg_left + 2 + n * col_w
                 terminal.cursorPosition(pos, row)
-                emca48 = A.bold[label, -A.bold[""]]
-                text = assembleFormattedText(emca48) 
-                terminal.write(text)                
+                text = formatting.bold(label)
+                terminal.write(text)
                 terminal.cursorPosition(pos + label_len, row)
                 terminal.write(flag)
 
@@ -746,6 +793,8 @@ class ChoosePlayerDialog(TermDialog):
     A dialog for choosing a player.
     """
     title = " Choose Player ... "
+    choose_key = 'i'
+    choose_help = "invite player"
     top = 16
     players = None
     player_pos = 0
@@ -774,8 +823,10 @@ class ChoosePlayerDialog(TermDialog):
         terminal.write(title)
         msg = textwrap.dedent(u"""\
             {} - Scroll up       {}   - Scroll down
-            i - invite player   q - cancel 
-            """).format(gchars.UP_ARROW, gchars.DOWN_ARROW).encode('utf-8').decode('utf-8')
+            {} - {}   q - cancel 
+            """).format(
+                gchars.UP_ARROW, gchars.DOWN_ARROW,
+                self.choose_key, self.choose_help).encode('utf-8').decode('utf-8')
         textlines = msg.split("\n")
         termlines = []
         for textline in textlines:
@@ -807,7 +858,7 @@ class ChoosePlayerDialog(TermDialog):
             pos = (tw - len(player)) // 2
             terminal.cursorPosition(pos, row)
             if n == player_pos:
-                player = assembleFormattedText(A.reverseVideo[term_attrib_str(player)])
+                player = formatting.format_text(('reverseVideo', term_attrib_str(player)))
             terminal.saveCursor()
             terminal.write(player)
             terminal.restoreCursor()
@@ -835,7 +886,7 @@ class ChoosePlayerDialog(TermDialog):
         dialog_commands = {
             '[UP_ARROW]': self._cycle_players_up,
             '[DOWN_ARROW]': self._cycle_players_down,
-            'i': self._send_invite_to_player,
+            self.choose_key: self._choose,
             'q': self.uninstall_dialog,
         }
         func = dialog_commands.get(key_id, None)
@@ -862,6 +913,9 @@ class ChoosePlayerDialog(TermDialog):
         else:
             self.player_pos = pos
         
+    def _choose(self):
+        self._send_invite_to_player()
+
     def _send_invite_to_player(self):
         my_lobby = self.parent()
         user_id = my_lobby.user_id
@@ -878,6 +932,10 @@ class ChoosePlayerDialog(TermDialog):
             my_avatar.send_message("'{}' has already joined a session.".format(player))
             self.uninstall_dialog()
             return
+        if other_entry.spectating_id is not None:
+            my_avatar.send_message("'{}' is watching a game.".format(player))
+            self.uninstall_dialog()
+            return
         if other_entry.app_protocol is None:
             my_avatar.send_message("'{}' has left the lobby.".format(player))
             self.uninstall_dialog()
@@ -890,30 +948,88 @@ class ChoosePlayerDialog(TermDialog):
         self.uninstall_dialog()
 
 
+class ChooseSessionDialog(ChoosePlayerDialog):
+    """
+    A dialog for choosing a running game to watch.
+    """
+    title = " Choose Game ... "
+    choose_key = 'w'
+    choose_help = "watch game   "
+
+    def _choose(self):
+        session_id = self.players[self.player_pos]
+        self.uninstall_dialog()
+        self.parent()._watch_session(session_id)
+
+
 def draw_dialog_frame(dialog):
     """
     Draw a dialog frame.
     """
-    terminal = dialog.terminal
-    dlg_left = dialog.left
-    dlg_top = dialog.top
-    dlg_w = dialog.width
-    dlg_h = dialog.height
+    frame = frames.get_frame(
+        'dialog',
+        dialog.term_size,
+        assemble_dialog_frame,
+        dialog.left,
+        dialog.top,
+        dialog.width,
+        dialog.height)
+    dialog.terminal.blit(frame)
+
+def assemble_dialog_frame(term_size, dlg_left, dlg_top, dlg_w, dlg_h):
+    """
+    Assemble a dialog frame.
+    """
     pos = dlg_left
     row = dlg_top
-    terminal.cursorPosition(pos, row)
-    terminal.write(gchars.DBORDER_UP_LEFT)
-    terminal.write(gchars.DBORDER_HORIZONTAL * (dlg_w - 2))
-    terminal.write(gchars.DBORDER_UP_RIGHT)
+    parts = [
+        frames.move(pos, row),
+        gchars.DBORDER_UP_LEFT,
+        gchars.DBORDER_HORIZONTAL * (dlg_w - 2),
+        gchars.DBORDER_UP_RIGHT]
     for n in range(dlg_h - 2):
         row += 1
-        terminal.cursorPosition(pos, row)
-        terminal.write(gchars.DBORDER_VERTICAL)
-        terminal.write(" " * (dlg_w - 2))
-        terminal.write(gchars.DBORDER_VERTICAL)
+        parts.append(frames.move(pos, row))
+        parts.append(gchars.DBORDER_VERTICAL)
+        parts.append(u" " * (dlg_w - 2))
+        parts.append(gchars.DBORDER_VERTICAL)
     row += 1
-    terminal.cursorPosition(pos, row)
-    terminal.write(gchars.DBORDER_DOWN_LEFT)
-    terminal.write(gchars.DBORDER_HORIZONTAL * (dlg_w - 2))
-    terminal.write(gchars.DBORDER_DOWN_RIGHT)
+    parts.append(frames.move(pos, row))
+    parts.append(gchars.DBORDER_DOWN_LEFT)
+    parts.append(gchars.DBORDER_HORIZONTAL * (dlg_w - 2))
+    parts.append(gchars.DBORDER_DOWN_RIGHT)
+    return u"".join(parts)
 
+def wrap_chat_message(entry, width):
+    """
+    Return the transcript rows, (prefix, text), of the chat message `entry`
+    wrapped to `width`.  The first row carries the formatted sender prefix
+    and the rest have a prefix of None.
+    """
+    global _wrapped_messages
+    user_id, msg = entry
+    key = (user_id, msg, width)
+    rows = _wrapped_messages.get(key)
+    if rows is not None:
+        return rows
+    prefix = "[{}]: ".format(user_id)
+    paras = msg.split("\n")
+    if len(prefix) < width:
+        # Wrap the first paragraph around room for the prefix.
+        indent = " " * len(prefix)
+        lines = textwrap.wrap(
+            paras[0], width, initial_indent=indent, drop_whitespace=False)
+        if len(lines) == 0:
+            lines = [indent]
+        rows = [(formatting.bold(prefix), lines[0][len(prefix):])]
+        rows.extend((None, line) for line in lines[1:])
+    else:
+        # The prefix doesn't fit on a line with the message.
+        rows = [(formatting.bold(line), "") for line in textwrap.wrap(prefix, width)]
+        rows.extend((None, line) for line in wrap_paras(paras[0], width))
+    for para in paras[1:]:
+        rows.extend((None, line) for line in wrap_paras(para, width))
+    if len(_wrapped_messages) >= WRAPPED_MESSAGES_LIMIT:
+        _wrapped_messages.clear()
+    _wrapped_messages[key] = rows
+    return rows
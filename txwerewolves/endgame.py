@@ -0,0 +1,133 @@
+"""
+What-if analysis of the vote at the end of a game.
+
+Once the night is over, the winner of a game depends only on the cards the
+players hold and on which of them are eliminated by the vote.  An
+:py:class:`EndgameEvaluator` works out the winner for every set of players
+`HandledWerewolfGame.count_votes()` could eliminate, including the extra
+player the hunter takes along.
+
+Winners are memoized on the multiset of eliminated cards (and on whether a
+werewolf and a minion are among the players), not on the players
+themselves, so the memo is shared by every seat assignment and every game.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+import collections
+import itertools
+from txwerewolves.werewolf import WerewolfGame
+
+_winner_memo = {}
+
+
+def clear_memo():
+    """
+    Forget all memoized winners.
+    """
+    global _winner_memo
+    _winner_memo.clear()
+
+def winner_for_cards(eliminated_cards, player_cards):
+    """
+    Return the `WINNER_*` constant when players holding `eliminated_cards`
+    are eliminated and the players hold `player_cards` at the end of the
+    night.
+    """
+    global _winner_memo
+    werewolf_player = WerewolfGame.CARD_WEREWOLF in player_cards
+    minion_player = WerewolfGame.CARD_MINION in player_cards
+    key = (werewolf_player, minion_player, tuple(sorted(eliminated_cards)))
+    winner = _winner_memo.get(key)
+    if winner is None:
+        winner = WerewolfGame.decide_winner(eliminated_cards, player_cards)
+        _winner_memo[key] = winner
+    return winner
+
+def elimination_sets(players, hunter=None):
+    """
+    Generate every set of players (as a frozenset) that the vote could
+    eliminate.  The players with the most votes are eliminated if they have
+    at least 2 votes each, so at most half the players can be voted out.
+    If the hunter is voted out, the player the hunter voted for goes, too.
+    Players may vote for themselves.
+    """
+    players = list(players)
+    limit = len(players) // 2
+    for k in range(limit + 1):
+        for combo in itertools.combinations(players, k):
+            yield frozenset(combo)
+    # Smaller sets that include the hunter's victim are generated above.
+    # The victim can only make the set larger than `limit` when the hunter
+    # votes outside the tied group and that group still has 2 votes per
+    # member from the other players.
+    if hunter is not None and 2 * limit <= len(players) - 1:
+        others = [player for player in players if player != hunter]
+        for combo in itertools.combinations(others, limit):
+            yield frozenset(combo).union([hunter])
+
+
+class EndgameEvaluator(object):
+    """
+    Winners for every possible vote outcome of one game.
+    """
+    player_cards = None
+    hunter = None
+
+    @classmethod
+    def make_instance(klass, player_cards):
+        """
+        `player_cards` maps players to the cards they hold at the end of the
+        night.
+        """
+        instance = klass()
+        instance.player_cards = dict(player_cards)
+        hunters = [
+            player for player, card in instance.player_cards.items()
+            if card == WerewolfGame.CARD_HUNTER]
+        if len(hunters) > 0:
+            instance.hunter = hunters[0]
+        return instance
+
+    @classmethod
+    def from_game(klass, game):
+        """
+        Create an evaluator for a `WerewolfGame` whose night is over.
+        """
+        # The current cards are deliberately not exposed by a machine input
+        # before the endgame; analysis reads them directly.
+        return klass.make_instance(game._new_player_cards)
+
+    def winner(self, eliminated):
+        """
+        Return the winner if the players in `eliminated` are voted out.
+        """
+        player_cards = self.player_cards
+        eliminated_cards = [player_cards[player] for player in eliminated]
+        return winner_for_cards(eliminated_cards, frozenset(player_cards.values()))
+
+    def outcomes(self):
+        """
+        Generate (eliminated players, winner) for every possible vote.
+        """
+        player_cards = self.player_cards
+        final_cards = frozenset(player_cards.values())
+        for eliminated in elimination_sets(player_cards.keys(), self.hunter):
+            eliminated_cards = [player_cards[player] for player in eliminated]
+            yield eliminated, winner_for_cards(eliminated_cards, final_cards)
+
+    def evaluate(self):
+        """
+        Return a mapping of each possible set of eliminated players to the
+        winner.
+        """
+        return dict(self.outcomes())
+
+    def winner_counts(self):
+        """
+        Return a `Counter` of the number of possible votes each side wins.
+        """
+        return collections.Counter(winner for eliminated, winner in self.outcomes())
@@ -0,0 +1,86 @@
+"""
+Cached formatted text.
+
+Building an `insults` attribute tree and flattening it with
+`assembleFormattedText()` is relatively costly, and the terminal views
+format the same labels on every redraw.  Here formatted text is described
+by a *spec*, a nested tuple that mirrors the attribute tree::
+
+    ('bold', "Player: ", ('-bold', name))
+
+is `A.bold["Player: ", -A.bold[name]]`.  The first item of a spec names an
+attribute (a leading '-' turns it off, and colors are written like
+'fg.blue'); the rest are strings or nested specs.  Assembled text is kept in
+a bounded LRU cache keyed by the spec.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+import collections
+from twisted.conch.insults.text import (
+    attributes as A,
+    assembleFormattedText,
+)
+
+FORMATTED_TEXT_LIMIT = 1024
+_formatted = collections.OrderedDict()
+hits = 0
+misses = 0
+
+
+def format_text(spec):
+    """
+    Return the assembled text for `spec`.
+    """
+    global hits
+    global misses
+    try:
+        text = _formatted.pop(spec)
+    except KeyError:
+        misses += 1
+        text = assembleFormattedText(_build_tree(spec))
+        if len(_formatted) >= FORMATTED_TEXT_LIMIT:
+            _formatted.popitem(last=False)
+    else:
+        hits += 1
+    _formatted[spec] = text
+    return text
+
+def bold(text):
+    """
+    Return `text` in bold, followed by plain text.
+    """
+    return format_text(('bold', text, ('-bold', "")))
+
+def underline(text):
+    """
+    Return `text` underlined, followed by plain text.
+    """
+    return format_text(('underline', text, ('-underline', "")))
+
+def bold_label(label, value):
+    """
+    Return a bold `label` followed by a plain `value`.
+    """
+    return format_text(('bold', label, ('-bold', value)))
+
+def query_stats():
+    """
+    Return (cached entries, hits, misses).
+    """
+    return len(_formatted), hits, misses
+
+def _build_tree(spec):
+    if not isinstance(spec, tuple):
+        return spec
+    name = spec[0]
+    negate = name.startswith('-')
+    attr = A
+    for part in name.lstrip('-').split('.'):
+        attr = getattr(attr, part)
+    if negate:
+        attr = -attr
+    return attr[tuple(_build_tree(child) for child in spec[1:])]
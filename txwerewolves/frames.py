@@ -0,0 +1,73 @@
+"""
+Pre-assembled terminal frames.
+
+The borders and dialog boxes drawn on every redraw depend only on the
+terminal size and the layout, so each one is assembled once, cursor moves
+included, and parsed into the cells of a
+:py:class:`txwerewolves.screen.Frame`.  Screen buffers copy those cells
+with `blit()` rather than parsing the text again.  Frames are cached by
+terminal size, and the frames for a size are evicted when no connected
+terminal has that size any longer.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+from txwerewolves.screen import parse_frame
+
+# Maps (layout, term_size, params) to a parsed frame.
+_frames = {}
+# Maps a terminal size to the number of connections using it.
+_size_refs = {}
+
+
+def move(column, line):
+    """
+    Return the escape sequence that moves the cursor to `column` and
+    `line` (0-based).
+    """
+    return u"\x1b[{};{}H".format(line + 1, column + 1)
+
+def get_frame(layout, term_size, assemble, *params):
+    """
+    Return the frame for `layout` and `term_size`, calling
+    `assemble(term_size, *params)` to assemble its text if it is not
+    cached.
+    """
+    global _frames
+    key = (layout, term_size, params)
+    frame = _frames.get(key)
+    if frame is None:
+        frame = parse_frame(assemble(term_size, *params), term_size)
+        _frames[key] = frame
+    return frame
+
+def acquire_size(term_size):
+    """
+    Record that a connected terminal has size `term_size`.
+    """
+    global _size_refs
+    _size_refs[term_size] = _size_refs.get(term_size, 0) + 1
+
+def release_size(term_size):
+    """
+    Record that a terminal no longer has size `term_size`.  When no
+    terminal has that size, its frames are evicted.
+    """
+    global _frames
+    global _size_refs
+    count = _size_refs.get(term_size, 0) - 1
+    if count > 0:
+        _size_refs[term_size] = count
+        return
+    _size_refs.pop(term_size, None)
+    for key in [key for key in _frames if key[1] == term_size]:
+        del _frames[key]
+
+def query_cached_sizes():
+    """
+    Return the set of terminal sizes that have cached frames.
+    """
+    return set(key[1] for key in _frames)
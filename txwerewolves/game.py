@@ -7,6 +7,7 @@ from __future__ import (
 import collections
 import itertools
 import json
+import math
 import random
 import sys
 import textwrap
@@ -23,12 +24,19 @@ from txwerewolves.dialogs import (
     SystemMessageDialog,
 )
 from txwerewolves.compat import term_attrib_str
+from txwerewolves.compact import (
+    PlayerSet,
+    VoteMap,
+)
 from txwerewolves import graphics_chars as gchars
 from txwerewolves.interfaces import (
     ITerminalApplication,
     IWebApplication,
 )
 from txwerewolves import (
+    formatting,
+    frames,
+    replay,
     session,
     users,
 )
@@ -38,6 +46,8 @@ from txwerewolves.utils import (
 )
 from txwerewolves.werewolf import (
     GameSettings,
+    ReplayLog,
+    VoteTally,
     WerewolfGame,
 )
 import six
@@ -69,14 +79,44 @@ def get_game_settings(session_id):
         session_entry.settings = settings
     return settings
 
+def parse_phase_timeouts(text):
+    """
+    Parse phase deadlines like "60" or "60,daybreak=300,seer=30".  A bare
+    number applies to every phase; `tag=seconds` applies to one phase.
+    Returns (default timeout, mapping of phase tags to timeouts).
+    """
+    tags = set(info.tag for info in WerewolfGame.phase_table)
+    tags.add(HandledWerewolfGame.TAG_TWILIGHT)
+    tags.add(WerewolfGame.TAG_DAYBREAK)
+    default = None
+    timeouts = {}
+    for item in text.split(","):
+        item = item.strip()
+        if item == "":
+            continue
+        if "=" in item:
+            tag, seconds = item.split("=", 1)
+            tag = tag.strip()
+            if tag not in tags:
+                raise Exception("Unknown phase {!r}.".format(tag))
+            timeouts[tag] = float(seconds)
+        else:
+            default = float(item)
+    return default, timeouts
+
 def initialize_game(session_entry, **kwds):
     """
     Initialize a game for a session.
     """
     players = session_entry.members
+    old_game = session_entry.appstate
+    if old_game is not None:
+        old_game.cancel_timers()
     game = HandledWerewolfGame()
     session_entry.appstate = game
     game.session_id = session_entry.session_id
+    game.seed = kwds.get('seed', None)
+    game.reactor = kwds['reactor']
     game.add_players(players)
     game_settings = get_game_settings(session_entry.session_id)
     other_roles = kwds.get('roles', set(game_settings.roles))
@@ -84,8 +124,31 @@ def initialize_game(session_entry, **kwds):
     game_settings.roles = other_roles
     game_settings.werewolves = werewolf_count
     reactor = kwds['reactor']
+    game.start_lifetime()
     reactor.callLater(0, game.deal_cards, werewolf_count, other_roles)
 
+def restore_game(session_entry, replay_log, reactor=None):
+    """
+    Rebuild a session's game from a replay log and notify the members.
+    Replay logs aren't saved anywhere yet, so the caller must keep one
+    (e.g. with `replay.dumps()`) to use this after a restart.
+    """
+    game = replay.replay_game(replay_log, factory=HandledWerewolfGame)
+    session_entry.appstate = game
+    game.session_id = session_entry.session_id
+    game.reactor = reactor
+    game.start_lifetime()
+    tag = game.query_phase_tag()
+    if tag is not None:
+        # The card queries are only available before the night begins, so
+        # rebuild what `handle_cards_dealt()` would have cached.
+        game.player_cards = dict(game._player_cards)
+        game.used_roles = game._active_roles
+        game.card_list = sorted(
+            list(game.player_cards.values()) + list(game._table_cards))
+    game.fire_state_handler()
+    return game
+
 
 class HandledWerewolfGame(WerewolfGame):
     PHASE_TWILIGHT = 0
@@ -97,8 +160,19 @@ class HandledWerewolfGame(WerewolfGame):
     PHASE_INSOMNIAC = 60
     PHASE_DAYBREAK = 70
     PHASE_ENDGAME = 80
+    TAG_TWILIGHT = "twilight"
+
+    # Seconds allowed for each phase before the players who haven't
+    # signaled are advanced anyway.  `phase_timeouts` maps phase tags (and
+    # TAG_TWILIGHT) to seconds; other phases use `phase_timeout`.  None means
+    # no deadline.
+    phase_timeout = None
+    phase_timeouts = {}
+    # Seconds after which the game and its session are torn down, or None.
+    game_lifetime = None
 
     phase = None
+    reactor = None
     session_id = None
     wait_list = None
     player_cards = None
@@ -110,8 +184,19 @@ class HandledWerewolfGame(WerewolfGame):
     robber_stolen_card = None
     troublemaker_swapped_players = None
     votes = None
+    vote_tally = None
     post_game_results = None
     eliminated = None
+    deadline = None
+    # Incremented whenever the players are notified of a change in game
+    # state.  Shared phase panels are rendered again after it changes.
+    state_version = 0
+    panel_cache = None
+    panel_renders = 0
+    panel_shared = 0
+    _deadline_call = None
+    _lifetime_call = None
+    _panel_version = None
 
     # --------------
     # Event handlers
@@ -120,79 +205,112 @@ class HandledWerewolfGame(WerewolfGame):
     def handle_cards_dealt(self):
         log.msg("Cards have been dealt.")
         self.phase = self.PHASE_TWILIGHT
-        self.player_cards = self.query_player_cards()
+        if self.compact_state:
+            # The dealt cards never change, so share the buffer rather
+            # than copying it.
+            self.player_cards = self._player_cards
+        else:
+            self.player_cards = self.query_player_cards()
         table_cards = self.query_table_cards()
         self.used_roles = frozenset(table_cards + list(self.player_cards.values()))
         self.card_list = self.query_cards()
+        if self.compact_state:
+            self.card_list = bytearray(self.card_list)
         self.set_wait_list()
         self.notify_players()
 
     def handle_werewolf_phase(self):
         log.msg("Entered the werewolf phase.")
-        if not self.CARD_WEREWOLF in self.used_roles:
-            self.advance_phase()
-            return
         self.phase = self.PHASE_WEREWOLVES
         self.set_wait_list()
         self.notify_players()
 
     def handle_minion_phase(self):
         log.msg("Entered the minion phase.")
-        if not self.CARD_MINION in self.used_roles:
-            self.advance_phase()
-            return
         self.phase = self.PHASE_MINION
         self.set_wait_list()
         self.notify_players()
     
     def handle_seer_phase(self):
         log.msg("Entered the seer phase.")
-        if not self.CARD_SEER in self.used_roles:
-            self.advance_phase()
-            return
         self.phase = self.PHASE_SEER
-        self.power_activated = False
+        self.load_power_state()
         self.set_wait_list()
         self.notify_players()
     
     def handle_robber_phase(self):
         log.msg("Entered the robber phase.")
-        if not self.CARD_ROBBER in self.used_roles:
-            self.advance_phase()
-            return
         self.phase = self.PHASE_ROBBER
-        self.power_activated = False
+        self.load_power_state()
         self.set_wait_list()
         self.notify_players()
     
     def handle_troublemaker_phase(self):
         log.msg("Entered the troublemaker phase.")
-        if not self.CARD_TROUBLEMAKER in self.used_roles:
-            self.advance_phase()
-            return
         self.phase = self.PHASE_TROUBLEMAKER
-        self.power_activated = False
+        self.load_power_state()
         self.set_wait_list()
         self.notify_players()
     
+    def load_power_state(self):
+        """
+        Set the revealed state of the current night power from the inputs
+        recorded since the phase began.  Nothing has been recorded when a
+        phase is first entered; after a restore this brings back what the
+        power revealed.
+        """
+        self.power_activated = False
+        self.seer_viewed_table_cards = None
+        self.seer_viewed_player_card = None
+        self.robber_stolen_card = None
+        self.troublemaker_swapped_players = None
+        entries = []
+        for entry in reversed(self.replay_log.entries):
+            if entry[0] == ReplayLog.ENTER_PHASE:
+                break
+            entries.append(entry)
+        for entry in reversed(entries):
+            opcode = entry[0]
+            if opcode == ReplayLog.SEER_VIEW_PLAYER_CARD:
+                player = entry[1]
+                self.seer_viewed_player_card = (player, self._player_cards[player])
+            elif opcode == ReplayLog.SEER_VIEW_TABLE_CARDS:
+                table_cards = self._table_cards
+                self.seer_viewed_table_cards = (table_cards[entry[1]], table_cards[entry[2]])
+            elif opcode == ReplayLog.ROBBER_STEAL_CARD:
+                # The robber acts before any other card changes hands.
+                player = entry[1]
+                self.robber_stolen_card = (player, self._player_cards[player])
+            elif opcode == ReplayLog.TROUBLEMAKER_SWITCH_CARDS:
+                self.troublemaker_swapped_players = (entry[1], entry[2])
+            else:
+                continue
+            self.power_activated = True
+
     def handle_insomniac_phase(self):
         log.msg("Entered the insomniac phase.")
-        if not self.CARD_INSOMNIAC in self.used_roles:
-            self.advance_phase()
-            return
         self.phase = self.PHASE_INSOMNIAC
         self.set_wait_list()
         self.notify_players()
     
     def handle_daybreak(self):
         log.msg("Entered daybreak phase.")
-        self.votes = {}
+        if self.compact_state:
+            self.votes = VoteMap.make_instance(self._player_index)
+        else:
+            self.votes = {}
+        self.vote_tally = VoteTally.make_instance(self.query_hunter())
         self.phase = self.PHASE_DAYBREAK
         self.set_wait_list()
         self.notify_players()
     
     def handle_endgame(self):
         log.msg("Entered the endgame phase.")
+        if self.eliminated is None:
+            # Restored from a replay log.
+            self.eliminated = list(self._eliminated_players)
+        if self.votes is None:
+            self.votes = {}
         self.phase = self.PHASE_ENDGAME
         self.set_wait_list()
         self.post_game_results = self.query_post_game_results()
@@ -205,18 +323,30 @@ class HandledWerewolfGame(WerewolfGame):
     def notify_players(self):
         """
         Notify all connected players that a change in game state has occured
-        and they should update their UIs.
+        and they should update their UIs.  Notifications are coalesced, so
+        members are notified once per reactor iteration at most.
         """
+        self.state_version += 1
+        session.record_event(self.session_id, 'phase', {'phase': self.phase})
         signal = ('next-phase', None)
-        session.send_signal_to_members(self.session_id, signal)
+        reactor = self.reactor
+        if reactor is None:
+            session.send_signal_to_members(self.session_id, signal)
+        else:
+            session.schedule_signal_to_members(self.session_id, signal, reactor)
 
     def set_wait_list(self):
         """
-        Wait until all players have signaled it is OK to advance.
+        Wait until all players have signaled it is OK to advance, or until
+        the phase deadline.
         """
         session_entry = session.get_entry(self.session_id)
         members = session_entry.members
-        self.wait_list = set(members)
+        if self.compact_state:
+            self.wait_list = PlayerSet.make_instance(self._player_index, members)
+        else:
+            self.wait_list = set(members)
+        self.schedule_deadline()
 
     def signal_advance(self, player):
         """
@@ -226,36 +356,147 @@ class HandledWerewolfGame(WerewolfGame):
         wait_list.discard(player)
         if len(wait_list) == 0:
             if self.phase != self.PHASE_DAYBREAK:
-                self.advance_phase()
+                self.advance_to_next_phase()
             else:
                 self.count_votes()
 
+    def record_reveal(self, player, power, **details):
+        """
+        Journal what `player` learned or did with a night power.  Only
+        `player` may see the event.
+        """
+        details['power'] = power
+        session.record_event(self.session_id, 'reveal', details, audience=player)
+
+    # ---------
+    # Deadlines
+    # ---------
+
+    def query_timeout(self):
+        """
+        Return the seconds allowed for the current phase, or None.
+        """
+        phase = self.phase
+        if phase is None or phase == self.PHASE_ENDGAME:
+            return None
+        if phase == self.PHASE_TWILIGHT:
+            tag = self.TAG_TWILIGHT
+        else:
+            tag = self.query_phase_tag()
+        return self.phase_timeouts.get(tag, self.phase_timeout)
+
+    def query_panel(self, key, assemble):
+        """
+        Return the rendering of a phase panel that every player who sees
+        the same thing shares.  `key` identifies what is visible, and
+        `assemble()` renders the panel if it isn't cached for the current
+        state version.
+        """
+        cache = self.panel_cache
+        if cache is None or self._panel_version != self.state_version:
+            cache = self.panel_cache = {}
+            self._panel_version = self.state_version
+        panel = cache.get(key)
+        if panel is None:
+            panel = cache[key] = assemble()
+            self.panel_renders += 1
+        else:
+            self.panel_shared += 1
+        return panel
+
+    def query_time_remaining(self):
+        """
+        Return the seconds left before the phase deadline, or None if the
+        phase has no deadline.
+        """
+        deadline = self.deadline
+        if deadline is None:
+            return None
+        return max(0, deadline - self.reactor.seconds())
+
+    def schedule_deadline(self):
+        """
+        Start the deadline for the current phase.
+        """
+        self.cancel_deadline()
+        reactor = self.reactor
+        timeout = self.query_timeout()
+        if reactor is None or timeout is None:
+            return
+        self.deadline = reactor.seconds() + timeout
+        self._deadline_call = reactor.callLater(timeout, self._expire_deadline)
+
+    def cancel_deadline(self):
+        call = self._deadline_call
+        if call is not None and call.active():
+            call.cancel()
+        self._deadline_call = None
+        self.deadline = None
+
+    def _expire_deadline(self):
+        """
+        Advance the players who haven't signaled yet.
+        """
+        self._deadline_call = None
+        self.deadline = None
+        if session.get_entry(self.session_id) is None:
+            return
+        log.msg("Phase deadline expired for session {}.".format(self.session_id))
+        # The last player out of the wait list advances the game, which
+        # replaces the wait list.
+        for player in list(self.wait_list):
+            self.signal_advance(player)
+
+    def start_lifetime(self):
+        """
+        Tear the game down after `game_lifetime` seconds.
+        """
+        reactor = self.reactor
+        lifetime = self.game_lifetime
+        if reactor is None or lifetime is None:
+            return
+        self._lifetime_call = reactor.callLater(lifetime, self._expire_lifetime)
+
+    def cancel_timers(self):
+        """
+        Cancel the phase deadline and the game lifetime.
+        """
+        self.cancel_deadline()
+        call = self._lifetime_call
+        if call is not None and call.active():
+            call.cancel()
+        self._lifetime_call = None
+
+    def _expire_lifetime(self):
+        """
+        Shut down the session's members and forget the session.
+        """
+        self._lifetime_call = None
+        self.cancel_deadline()
+        session_id = self.session_id
+        session_entry = session.get_entry(session_id)
+        if session_entry is None or session_entry.appstate is not self:
+            return
+        log.msg("Game lifetime expired for session {}.".format(session_id))
+        signal = ('shutdown', {
+            'initiator': None,
+            'message': "The game has run out of time."})
+        session.send_signal_to_members(session_id, signal)
+        session.destroy_entry(session_id)
+
+    def cast_vote(self, voter, player):
+        """
+        Record `voter`'s vote to eliminate `player` and update the running
+        tally.
+        """
+        self.votes[voter] = player
+        self.vote_tally.cast(voter, player)
+
     def count_votes(self):
         """
         Count the votes, determine who won and who lost.
         """
-        vote_map = self.votes
-        votes = collections.Counter()
-        hunter = self.query_hunter()
-        hunter_victim = None
-        for voter, player in vote_map.items():
-            votes[player] += 1
-            if voter == hunter:
-                hunter_victim = player
-        rank = votes.most_common()
-        most_votes = []
-        top_score = 0
-        for player, count in rank:
-            if count == 1:
-                break
-            if count < top_score:
-                break
-            top_score = count
-            most_votes.append(player)
-        if hunter in most_votes:
-            most_votes.append(hunter_victim)
-            most_votes = list(set(most_votes))
-            most_votes.sort()
+        most_votes = self.vote_tally.eliminated()
         self.eliminated = list(most_votes)
         self.eliminate_players(most_votes)
             
@@ -267,6 +508,7 @@ class SSHGameProtocol(TerminalAppBase):
     game = None
     input_buf = None
     new_chat_flag = False
+    _countdown_call = None
     _ready_to_advance = False
     _shutting_down = False
 
@@ -294,6 +536,7 @@ class SSHGameProtocol(TerminalAppBase):
         log.msg("entered produce_compatible_application().")
         if iface.providedBy(self):
             log.msg("iface is provided.  Returning self ...")
+            self._catch_up()
             return self
         if iface == IWebApplication:
             log.msg("iface is IWebApplication.")
@@ -356,7 +599,7 @@ class SSHGameProtocol(TerminalAppBase):
         self._draw_game_info_area()
         self._draw_phase_area()
         if not self.dialog is None:
-            self.dialog.draw()
+            self.dialog.paint()
         dialog = self.dialog
         if dialog is not None:
             handled = dialog.set_cursor_pos()
@@ -364,6 +607,30 @@ class SSHGameProtocol(TerminalAppBase):
             handled = False
         if not handled:
             self.set_cursor_end_pos()
+        self._acknowledge_events()
+
+    def _catch_up(self):
+        """
+        Look at the journal events the client missed.  The screen is
+        redrawn in full when a terminal connects, so only missed chat needs
+        to be flagged.
+        """
+        journal = session.get_entry(self.game.session_id).journal
+        user_id = self.user_id
+        for event in journal.events_since(journal.query_offset(user_id), user_id):
+            if event.kind == 'chat' and event.payload['sender'] != user_id:
+                self.new_chat_flag = True
+
+    def _acknowledge_events(self):
+        """
+        Record that the client has seen every journal event so far.
+        """
+        parent = self.parent()
+        if parent is None or not parent.connected:
+            return
+        session_entry = session.get_entry(self.game.session_id)
+        if session_entry is not None:
+            session_entry.journal.acknowledge(self.user_id)
 
     def set_cursor_end_pos(self):
         tw, th = self.term_size
@@ -378,60 +645,11 @@ class SSHGameProtocol(TerminalAppBase):
         """
         Draw a border around the display area.
         """
-        terminal = self.terminal
         tw, th = self.term_size
-        terminal.cursorHome()
-        terminal.write(gchars.DBORDER_UP_LEFT)
-        terminal.write(gchars.DBORDER_HORIZONTAL * (tw - 2))
-        terminal.write(gchars.DBORDER_UP_RIGHT)
-        for n in range(1, th):
-            terminal.cursorPosition(0, n)
-            terminal.write(gchars.DBORDER_VERTICAL)
-            terminal.cursorPosition(tw-1, n)
-            terminal.write(gchars.DBORDER_VERTICAL)
-        terminal.cursorPosition(0, th - 1)
-        terminal.write(gchars.DBORDER_DOWN_LEFT)
-        terminal.write(gchars.DBORDER_HORIZONTAL * (tw - 2))
-        terminal.write(gchars.DBORDER_DOWN_RIGHT)
-        title = u"{} Werewolves! {}".format(
-            gchars.DHBORDER_UP_RIGHT,
-            gchars.DHBORDER_UP_LEFT)
-        pos = (tw - len(title)) // 2
-        terminal.cursorPosition(pos, 0)
-        emca48 = A.bold[
-            -A.bold[term_attrib_str(gchars.DHBORDER_UP_RIGHT)],
-            " Werewolves! ", 
-            -A.bold[term_attrib_str(gchars.DHBORDER_UP_LEFT)]]
-        text = assembleFormattedText(emca48)
-        terminal.write(text)
-        underline = u"{}{}{}".format(
-            gchars.DOWN_LEFT_CORNER,
-            gchars.HORIZONTAL * (len(title) - 2),
-            gchars.DOWN_RIGHT_CORNER)
-        terminal.cursorPosition(pos, 1)
-        terminal.write(underline)
-        pos = tw // 2
-        terminal.cursorPosition(pos, 1)
-        terminal.write(gchars.T_UP)
-        maxrow = max(th // 2, 7)
-        terminal.cursorPosition(0, maxrow)
-        terminal.write(gchars.DVERT_T_LEFT)
-        terminal.write(gchars.HORIZONTAL * (tw - 2))
-        terminal.write(gchars.DVERT_T_RIGHT)
-        midway = tw // 2
-        terminal.cursorPosition(midway, 0)
-        terminal.cursorPosition(midway, maxrow)
-        terminal.write(gchars.CROSS) 
-        for n in range(2, maxrow):
-            terminal.cursorPosition(midway, n)
-            terminal.write(gchars.VERTICAL)
-        for n in range(maxrow + 1, th):
-            terminal.cursorPosition(midway, n)
-            terminal.write(gchars.VERTICAL)
-        terminal.cursorPosition(midway, th)
-        terminal.write(gchars.DHORIZ_T_DOWN) 
-        self._equator = maxrow
-        self._midway = midway
+        frame = frames.get_frame('game', self.term_size, assemble_game_border)
+        self.terminal.blit(frame)
+        self._equator = max(th // 2, 7)
+        self._midway = tw // 2
         
     def _draw_player_area(self):
         """
@@ -444,8 +662,7 @@ class SSHGameProtocol(TerminalAppBase):
         row = 3
         terminal.cursorPosition(pos, row)
         truncated_player = player[:10]
-        emca48 = A.bold["Player: ", -A.bold[term_attrib_str(truncated_player)]]
-        text = assembleFormattedText(emca48)
+        text = formatting.bold_label("Player: ", term_attrib_str(truncated_player))
         terminal.write(text)
         row += 1
         terminal.cursorPosition(pos, row)
@@ -453,13 +670,11 @@ class SSHGameProtocol(TerminalAppBase):
         player_cards = game.player_cards
         card = player_cards[player]
         card_name = WerewolfGame.get_card_name(card)
-        emca48 = A.bold["Dealt role: ", -A.bold[card_name]]
-        text = assembleFormattedText(emca48)
+        text = formatting.bold_label("Dealt role: ", card_name)
         terminal.write(text)
         if self.new_chat_flag:
             row += 1
-            emca48 = A.bold["New chat message", -A.bold[""]]
-            text = assembleFormattedText(emca48)
+            text = formatting.bold("New chat message")
             terminal.cursorPosition(pos, row)
             terminal.write(text)
 
@@ -485,8 +700,7 @@ class SSHGameProtocol(TerminalAppBase):
         # heading
         row = 1
         heading = "Cards Used in the Game"
-        emca48 = A.bold[heading, -A.bold[""]]
-        text = assembleFormattedText(emca48)
+        text = formatting.bold(heading)
         midway = tw // 2
         frame_length = tw - midway
         frame_midway = (frame_length // 2) + midway
@@ -496,15 +710,14 @@ class SSHGameProtocol(TerminalAppBase):
         # table
         row += 1
         pos = midway + 2
-        lit = lambda s: A.reverseVideo[s, -A.reverseVideo[""]]
-        unlit = lambda s: -A.reverseVideo[s]
+        lit = lambda s: ('reverseVideo', s, ('-reverseVideo', ""))
+        unlit = lambda s: ('-reverseVideo', s)
         attribs = itertools.cycle([lit, unlit])
         table_width = col_width + 1 + 5
         pos = midway + ((frame_length - table_width) // 2)
         row += 1
         headers = "{} {}".format("Card".ljust(col_width), "Count")
-        emca48 = A.underline[headers, -A.underline[""]]
-        text = assembleFormattedText(emca48)
+        text = formatting.underline(headers)
         terminal.cursorPosition(pos, row)
         terminal.write(text)
         g = peek_ahead(zip(card_counts, attribs))
@@ -517,13 +730,11 @@ class SSHGameProtocol(TerminalAppBase):
             if more:
                 u = lambda x: x
             else:
-                u = lambda x: A.underline[x, -A.underline[""]] 
-            emca48 = u(highlight(card_name.rjust(col_width)))
-            text = assembleFormattedText(emca48)
+                u = lambda x: ('underline', x, ('-underline', ""))
+            text = formatting.format_text(u(highlight(card_name.rjust(col_width))))
             terminal.write(text)
             terminal.write(" ")
-            emca48 = u(highlight(str(count).rjust(5)))
-            text = assembleFormattedText(emca48)
+            text = formatting.format_text(u(highlight(str(count).rjust(5))))
             terminal.write(text)
 
     def _draw_phase_area(self):
@@ -562,37 +773,16 @@ class SSHGameProtocol(TerminalAppBase):
     def _draw_phase_info(self, title, desc, key_help=None):
         if key_help is None:
             key_help = "Press ENTER to continue ..."
-        terminal = self.terminal
-        tw, th = self.term_size
-        midway = tw // 2
-        equator = th // 2
-        frame_w = tw - midway
-        row = equator + 1
-        pos = (frame_w - len(title)) // 2
-        emca48 = A.bold[title, -A.bold[""]]
-        text = assembleFormattedText(emca48)
-        terminal.cursorPosition(pos, row)
-        terminal.write(text)
-        lines = wrap_paras(desc, frame_w - 4) 
-        maxlen = max(len(line) for line in lines)
-        pos = (frame_w - maxlen) // 2
-        row += 1
-        for line in lines:
-            row += 1
-            terminal.cursorPosition(pos, row)
-            if row == (th - 4):
-                terminal.write("...")
-                break
-            terminal.write(line)
-        last_row = row
-        row = th - 2
-        if self._ready_to_advance:
-            heading = "Waiting for other players ..."
-        else:
-            heading = key_help
-        pos = (frame_w - len(heading)) // 2
-        terminal.cursorPosition(pos, row)
-        terminal.write(heading)
+        game = self.game
+        term_size = self.term_size
+        ready = self._ready_to_advance
+        key = (
+            'phase-info', game.phase, game.power_activated, term_size,
+            ready, title, desc, key_help)
+        text, last_row = game.query_panel(
+            key,
+            lambda: assemble_phase_info(term_size, title, desc, key_help, ready))
+        self.terminal.write(text)
         return last_row
 
     def _draw_twilight(self):
@@ -750,15 +940,19 @@ class SSHGameProtocol(TerminalAppBase):
     def _seer_examine_table_cards(self):
         game = self.game
         all_positions = [0, 1, 2]
+        # Not `game.rng`: the positions are recorded as the input, and a
+        # replay doesn't repeat this draw.
         positions = random.sample(all_positions, 2)
         game.seer_viewed_table_cards = game.seer_view_table_cards(*positions)
         game.power_activated = True
+        game.record_reveal(self.user_id, 'seer', cards=list(game.seer_viewed_table_cards))
 
     def _seer_examine_player(self, player):
         game = self.game
         card = game.seer_view_player_card(player)
         game.seer_viewed_player_card = (player, card)
         game.power_activated = True
+        game.record_reveal(self.user_id, 'seer', player=player, card=card)
 
     def _draw_robber(self):
         """
@@ -854,6 +1048,7 @@ class SSHGameProtocol(TerminalAppBase):
         game.power_activated = True
         card = game.robber_steal_card(player)
         game.robber_stolen_card = (player, card)
+        game.record_reveal(self.user_id, 'robber', player=player, card=card)
 
     def _draw_troublemaker(self):
         """
@@ -961,6 +1156,7 @@ class SSHGameProtocol(TerminalAppBase):
             player1 = game.troublemaker_swapped_players
             game.troublemaker_swapped_players = (player1, player)
             game.troublemaker_switch_cards(player1, player)
+            game.record_reveal(self.user_id, 'troublemaker', players=[player1, player])
             game.power_activated = True
         
     def _draw_insomniac(self):
@@ -1049,9 +1245,8 @@ class SSHGameProtocol(TerminalAppBase):
 
     def _daybreak_vote_for_player(self, player):
         game = self.game
-        votes = game.votes
         user_id = self.user_id
-        votes[user_id] = player
+        game.cast_vote(user_id, player)
         log.msg("{} voted to eliminate {}".format(user_id, player))
         self._signal_advance()
     
@@ -1062,126 +1257,14 @@ class SSHGameProtocol(TerminalAppBase):
             "Post Game Results",
             msg,
             "")
-        terminal = self.terminal
-        tw, th = self.term_size
-        midway = tw // 2
-        equator = th // 2
-        frame_w = tw - midway
         game = self.game
-        eliminated = set(game.eliminated)
-        row = last_row + 2
-        pos = 2
-        col_w = (frame_w - 3) // 3 
-        pos_col0 = 2
-        pos_col1 = pos_col0 + col_w
-        pos_col2 = pos_col1 + col_w
-        emca48 = A.underline["Player", -A.underline[""]]
-        text = assembleFormattedText(emca48)
-        terminal.cursorPosition(pos_col0, row)
-        terminal.write(text)
-        emca48 = A.underline["Eliminated?", -A.underline[""]]
-        text = assembleFormattedText(emca48)
-        terminal.cursorPosition(pos_col1, row)
-        terminal.write(text)
-        emca48 = A.underline["Voted For", -A.underline[""]]
-        text = assembleFormattedText(emca48)
-        terminal.cursorPosition(pos_col2, row)
-        terminal.write(text)
-        pgi = game.post_game_results
-        winner = pgi.winner
-        player_cards = pgi.player_cards
-        orig_player_cards = pgi.orig_player_cards
-        table_cards = pgi.table_cards
-        orig_table_cards = pgi.orig_table_cards
-        players = list(player_cards.keys())
-        players.sort()
-        votes = game.votes
-        row += 1
-        for player in players:
-            terminal.cursorPosition(pos_col0, row)
-            if row == th - 2:
-                terminal.write("...")
-                break
-            terminal.write(player)
-            terminal.cursorPosition(pos_col1, row)
-            elim_flag = " "
-            if player in eliminated:
-                elim_flag = "Y"
-            terminal.write(elim_flag)
-            terminal.cursorPosition(pos_col2, row)
-            terminal.write(votes.get(player, "N/A"))
-            row += 1
-        wg = WerewolfGame
-        if winner == wg.WINNER_VILLAGE:
-            msg = "A Village Victory!"
-        elif winner == wg.WINNER_WEREWOLVES:
-            msg = "A Werewolf Victory!"
-        elif winner == wg.WINNER_TANNER:
-            msg = "A Tanner Victory!"
-        elif winner == wg.WINNER_TANNER_AND_VILLAGE:
-            msg = "A Tanner and Village Victory!"
-        elif winner == wg.WINNER_NO_ONE:
-            msg = "No One Wins!"
-        pos = midway + (frame_w - len(msg)) // 2
-        row = equator + 2
-        emca48 = A.bold[msg, -A.bold[""]]
-        msg = assembleFormattedText(emca48)
-        terminal.cursorPosition(pos, row)
-        terminal.write(msg)
-        player_result_matrix = []
-        for player in players:
-            entry = (
-                player,
-                WerewolfGame.get_card_name(orig_player_cards[player]),
-                WerewolfGame.get_card_name(player_cards[player]))
-            player_result_matrix.append(entry)
-        table_result_matrix = zip(
-            [WerewolfGame.get_card_name(c) for c in orig_table_cards],
-            [WerewolfGame.get_card_name(c) for c in table_cards])
-        lines = []
-        col_space = 2
-        col_w = (frame_w - 3) // 3 
-        pos_col0 = midway + 2
-        pos_col1 = pos_col0 + col_w
-        pos_col2 = pos_col1 + col_w
-        row += 2
-        emca48 = A.underline["Player", -A.underline[""]]
-        text = assembleFormattedText(emca48)
-        terminal.cursorPosition(pos_col0, row)
-        terminal.write(text)
-        emca48 = A.underline["Dealt Card", -A.underline[""]]
-        text = assembleFormattedText(emca48)
-        terminal.cursorPosition(pos_col1, row)
-        terminal.write(text)
-        emca48 = A.underline["Final Card", -A.underline[""]]
-        text = assembleFormattedText(emca48)
-        terminal.cursorPosition(pos_col2, row)
-        terminal.write(text)
-        row += 1
-        for player, dealt, final in player_result_matrix:
-            terminal.cursorPosition(pos_col0, row)
-            if row == th - 2:
-                terminal.write("...")
-                break
-            terminal.write(player)
-            terminal.cursorPosition(pos_col1, row)
-            terminal.write(dealt)
-            terminal.cursorPosition(pos_col2, row)
-            terminal.write(final)
-            row += 1
-        row += 1
-        for n, (dealt, final) in enumerate(table_result_matrix):
-            terminal.cursorPosition(pos_col0, row)
-            if row >= th - 2:
-                terminal.write("...")
-                break
-            terminal.write("Table {}".format(n + 1))
-            terminal.cursorPosition(pos_col1, row)
-            terminal.write(dealt)
-            terminal.cursorPosition(pos_col2, row)
-            terminal.write(final)
-            row += 1
-        
+        term_size = self.term_size
+        key = ('endgame', game.phase, term_size, last_row)
+        text = game.query_panel(
+            key,
+            lambda: assemble_endgame_results(game, term_size, last_row))
+        self.terminal.write(text)
+
     def _display_sleeping(self):
         """
         Display output that player is sleeping during this phase.
@@ -1198,7 +1281,44 @@ class SSHGameProtocol(TerminalAppBase):
         terminal.write(msg)
 
     def _display_time_remaining(self):
-        log.msg("TODO: display_time_remaining()")
+        """
+        Show the time left in the phase on the bottom border.  The game
+        knows when the phase ends, so the countdown is redrawn from a local
+        timer rather than by asking the game again.
+        """
+        self._cancel_countdown()
+        remaining = self.game.query_time_remaining()
+        if remaining is None:
+            return
+        terminal = self.terminal
+        tw, th = self.term_size
+        seconds = int(math.ceil(remaining))
+        label = u" Time remaining: {}:{:02d} ".format(seconds // 60, seconds % 60)
+        pos = tw - len(label) - 2
+        if pos < 1:
+            return
+        terminal.cursorPosition(pos, th - 1)
+        terminal.write(label)
+        if seconds > 0:
+            # Wake up when the displayed second changes.
+            delay = remaining - (seconds - 1)
+            self._countdown_call = self.reactor.callLater(delay, self._tick_countdown)
+
+    def _tick_countdown(self):
+        self._countdown_call = None
+        parent = self.parent()
+        if parent is None or parent.app_protocol is not self:
+            return
+        self._display_time_remaining()
+        dialog = self.dialog
+        if dialog is None or not dialog.set_cursor_pos():
+            self.set_cursor_end_pos()
+
+    def _cancel_countdown(self):
+        call = self._countdown_call
+        if call is not None and call.active():
+            call.cancel()
+        self._countdown_call = None
 
     def _signal_advance(self):
         """
@@ -1213,7 +1333,7 @@ class SSHGameProtocol(TerminalAppBase):
     def _show_help(self):
         dialog = HelpDialog()
         self.install_dialog(dialog)
-        dialog.draw()
+        dialog.paint()
 
     def _show_chat(self):
         input_buf = self.input_buf
@@ -1232,8 +1352,9 @@ class SSHGameProtocol(TerminalAppBase):
             self._draw_player_area()
             self.set_cursor_end_pos()
         else:
-            dialog.draw()
+            dialog.paint()
             self.set_cursor_end_pos()
+        self._acknowledge_events()
 
     def _show_session_admin(self):
         # Check permission
@@ -1257,7 +1378,7 @@ class SSHGameProtocol(TerminalAppBase):
             dialog = BriefMessageDialog()
             dialog.brief_message = "Only the session administrator can modify game settings."
             self.install_dialog(dialog)
-        dialog.draw()
+        dialog.paint()
 
     def receive_signal(self, signal):
         signame, sigvalue = signal
@@ -1267,11 +1388,12 @@ class SSHGameProtocol(TerminalAppBase):
             self._handle_new_chat_message() 
         elif signame == 'shutdown':
             initiator = sigvalue['initiator']
-            self._start_shutdown(initiator)
+            self._start_shutdown(initiator, sigvalue.get('message'))
         elif signame == 'reset':
             self._reset()
 
     def _reset(self):
+        self._cancel_countdown()
         new_app = self.__class__.make_protocol(
             user_id=self.user_id,
             terminal=self.terminal,
@@ -1281,7 +1403,8 @@ class SSHGameProtocol(TerminalAppBase):
         avatar = self.avatar
         avatar.install_application(new_app)
 
-    def _start_shutdown(self, initiator):
+    def _start_shutdown(self, initiator, msg=None):
+        self._cancel_countdown()
         parent = self.parent()
         entry = users.get_user_entry(self.user_id)
         entry.app_protocol = None
@@ -1298,7 +1421,8 @@ class SSHGameProtocol(TerminalAppBase):
                 return _handler
 
             user_id = self.user_id
-            msg = "{} has left the game.".format(initiator)
+            if msg is None:
+                msg = "{} has left the game.".format(initiator)
             dialog = SystemMessageDialog.make_dialog(
                 msg,
                 on_close=_make_handler(avatar))
@@ -1313,13 +1437,17 @@ class SSHGameProtocol(TerminalAppBase):
         user_entry = users.get_user_entry(user_id)
         user_entry.joined_id = None
         user_entry.invited_id = None
-        session_id = self.game.session_id
+        game = self.game
+        session_id = game.session_id
         session_entry = session.get_entry(session_id)
-        members = session_entry.members
-        members.discard(user_id)
-        if len(members) == 0:
-            session.destroy_entry(session_id)
-            log.msg("Destroyed session {}.".format(session_id))
+        # The session is already gone if the game ran out of time.
+        if session_entry is not None:
+            members = session_entry.members
+            members.discard(user_id)
+            if len(members) == 0:
+                game.cancel_timers()
+                session.destroy_entry(session_id)
+                log.msg("Destroyed session {}.".format(session_id))
         avatar = user_entry.avatar
         avatar.init_app_protocol()
 
@@ -1368,9 +1496,10 @@ class WebGameProtocol(WebAppBase):
             app = SSHGameProtocol.make_protocol(
                 reactor=self.reactor,
                 user_id=self.user_id,
-                parent=parent,
+                parent=weakref.ref(parent),
                 terminal=parent.terminal,
                 term_size=parent.term_size)
+            app._catch_up()
             signal = ('next-phase', None)
             app.receive_signal(signal) 
             log.msg("Created new app.")
@@ -1402,6 +1531,8 @@ class WebGameProtocol(WebAppBase):
             self._update_client_output()
         elif key == 'request-all':
             self._update_client()
+        elif key == 'catch-up':
+            self._catch_up()
 
     def _update_client(self):
             self._update_client_player_info()
@@ -1415,6 +1546,49 @@ class WebGameProtocol(WebAppBase):
             session_info = session.get_entry(game.session_id)
             if self.user_id == session_info.owner:
                 self._update_client_settings()
+            self._acknowledge_events()
+
+    def _catch_up(self):
+        """
+        Send the client only what it missed since the last journal event it
+        acknowledged, in place of the events buffered while it was away.
+        """
+        session_entry = session.get_entry(self.game.session_id)
+        if session_entry is None:
+            return
+        journal = session_entry.journal
+        user_id = self.user_id
+        offset = journal.query_offset(user_id)
+        avatar = self.avatar
+        buffered = avatar.discard_buffered_events()
+        if offset == 0:
+            self._update_client()
+            return
+        events = journal.events_since(offset, user_id)
+        # Only chat is sent from the journal.  Anything else the client
+        # missed, journaled or not, is covered by sending every panel.
+        missed_panels = (
+            not journal.has_events_since(offset)
+            or len(buffered) >= avatar.event_buffer_size
+            or any(event.kind != 'chat' for event in events)
+            or any('chat' not in json.loads(data) for data in buffered))
+        if missed_panels:
+            self._update_client()
+        for event in events:
+            if event.kind == 'chat':
+                payload = event.payload
+                self._send_chat(payload['sender'], payload['message'])
+        self._acknowledge_events()
+
+    def _acknowledge_events(self):
+        """
+        Record that the client has seen every journal event so far.
+        """
+        if not self.avatar.connected:
+            return
+        session_entry = session.get_entry(self.game.session_id)
+        if session_entry is not None:
+            session_entry.journal.acknowledge(self.user_id)
 
     def _update_client_post_game(self):
         game = self.game
@@ -1493,7 +1667,11 @@ class WebGameProtocol(WebAppBase):
     def _update_client_phase_info(self):
         avatar = self.avatar
         phase_info = self.phase_info
-        command = {'phase-info': phase_info}
+        # The client counts down from the time remaining on its own.
+        command = {
+            'phase-info': phase_info,
+            'time-remaining': self.game.query_time_remaining(),
+        }
         command_str = json.dumps(command)
         avatar.send_event_to_client(command_str)
 
@@ -1550,6 +1728,7 @@ class WebGameProtocol(WebAppBase):
         self._update_client_actions()
         self._update_client_output()
         self._update_client_phase_info()
+        self._acknowledge_events()
 
     def _init_phase_elements(self):
         game = self.game
@@ -1680,15 +1859,20 @@ class WebGameProtocol(WebAppBase):
     def _seer_view_table_cards(self):
         game = self.game
         all_positions = [0, 1, 2]
+        # Not `game.rng`: the positions are recorded as the input, and a
+        # replay doesn't repeat this draw.
         positions = random.sample(all_positions, 2)
         game.seer_viewed_table_cards = game.seer_view_table_cards(*positions)
         game.power_activated = True
+        game.record_reveal(self.user_id, 'seer', cards=list(game.seer_viewed_table_cards))
         self._seer_show_power_activated()
 
     def _seer_view_player(self, player):
         game = self.game
-        game.seer_viewed_player_card = (player, game.seer_view_player_card(player))
+        card = game.seer_view_player_card(player)
+        game.seer_viewed_player_card = (player, card)
         game.power_activated = True
+        game.record_reveal(self.user_id, 'seer', player=player, card=card)
         self._seer_show_power_activated()
 
     def _init_robber_phase(self):
@@ -1747,6 +1931,7 @@ class WebGameProtocol(WebAppBase):
         game.power_activated = True
         card = game.robber_steal_card(player)
         game.robber_stolen_card = (player, card)
+        game.record_reveal(self.user_id, 'robber', player=player, card=card)
         self._robber_show_power_activated()
 
     def _init_troublemaker_phase(self):
@@ -1827,6 +2012,7 @@ class WebGameProtocol(WebAppBase):
                 self.user_id, first_player, player))
             game.troublemaker_switch_cards(first_player, player)
             game.troublemaker_swapped_players = (first_player, player) 
+            game.record_reveal(self.user_id, 'troublemaker', players=[first_player, player])
             self._troublemaker_show_power_activated()
 
     def _init_insomniac_phase(self):
@@ -1869,9 +2055,8 @@ class WebGameProtocol(WebAppBase):
 
     def _daybreak_vote(self, player):
         game = self.game
-        votes = game.votes
         user_id = self.user_id
-        votes[user_id] = player
+        game.cast_vote(user_id, player)
         log.msg("{} voted to eliminate {}.".format(user_id, player))
         self._signal_advance()
 
@@ -1913,7 +2098,7 @@ class WebGameProtocol(WebAppBase):
             return
         elif signame == 'shutdown':
             initiator = value['initiator']
-            self._shutdown(initiator)
+            self._shutdown(initiator, value.get('message'))
         elif signame == 'reset':
             self._reset()
         elif signame == 'new-settings':
@@ -1969,12 +2154,15 @@ class WebGameProtocol(WebAppBase):
         session_entry = session.get_entry(session_id)
         output_buf = session_entry.chat_buf
         sender, msg = output_buf[-1]
-        avatar = user_entry.avatar
+        self._send_chat(sender, msg)
+        self._acknowledge_events()
+
+    def _send_chat(self, sender, msg):
         event = {'chat': {'sender': sender, 'message': msg}}
         event_str = json.dumps(event)
-        avatar.send_event_to_client(event_str)
+        self.avatar.send_event_to_client(event_str)
 
-    def _shutdown(self, initiator):
+    def _shutdown(self, initiator, msg=None):
         """
         Allow the app to shutdown gracefully.
         """
@@ -1983,17 +2171,22 @@ class WebGameProtocol(WebAppBase):
         user_entry.joined_id = None
         user_entry.invited_id = None
         log.msg("Cleared user_entry session info for {}.".format(user_id))
-        session_id = self.game.session_id
+        game = self.game
+        session_id = game.session_id
         session_entry = session.get_entry(session_id)
-        members = session_entry.members
-        members.discard(user_id)
-        log.msg("Removed session_entry member {}.".format(user_id))
-        if len(members) == 0:
-            session.destroy_entry(session_id)
-            log.msg("Destroyed session {}.".format(session_id))
+        # The session is already gone if the game ran out of time.
+        if session_entry is not None:
+            members = session_entry.members
+            members.discard(user_id)
+            log.msg("Removed session_entry member {}.".format(user_id))
+            if len(members) == 0:
+                game.cancel_timers()
+                session.destroy_entry(session_id)
+                log.msg("Destroyed session {}.".format(session_id))
         if user_id == initiator:
             return
-        msg = "{} has left the game.".format(initiator)
+        if msg is None:
+            msg = "{} has left the game.".format(initiator)
         payload = {}
         if initiator != user_id:
             payload['message'] = msg
@@ -2004,3 +2197,217 @@ class WebGameProtocol(WebAppBase):
         user_entry.app_protocol = None
         avatar.init_app_protocol()
 
+def assemble_game_border(term_size):
+    """
+    Assemble the border, title, and dividers of the game display area.
+    """
+    tw, th = term_size
+    parts = [
+        frames.move(0, 0),
+        gchars.DBORDER_UP_LEFT,
+        gchars.DBORDER_HORIZONTAL * (tw - 2),
+        gchars.DBORDER_UP_RIGHT]
+    for n in range(1, th):
+        parts.append(frames.move(0, n))
+        parts.append(gchars.DBORDER_VERTICAL)
+        parts.append(frames.move(tw - 1, n))
+        parts.append(gchars.DBORDER_VERTICAL)
+    parts.append(frames.move(0, th - 1))
+    parts.append(gchars.DBORDER_DOWN_LEFT)
+    parts.append(gchars.DBORDER_HORIZONTAL * (tw - 2))
+    parts.append(gchars.DBORDER_DOWN_RIGHT)
+    title = u"{} Werewolves! {}".format(
+        gchars.DHBORDER_UP_RIGHT,
+        gchars.DHBORDER_UP_LEFT)
+    pos = (tw - len(title)) // 2
+    parts.append(frames.move(pos, 0))
+    emca48 = A.bold[
+        -A.bold[term_attrib_str(gchars.DHBORDER_UP_RIGHT)],
+        " Werewolves! ",
+        -A.bold[term_attrib_str(gchars.DHBORDER_UP_LEFT)]]
+    text = assembleFormattedText(emca48)
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+    parts.append(text)
+    underline = u"{}{}{}".format(
+        gchars.DOWN_LEFT_CORNER,
+        gchars.HORIZONTAL * (len(title) - 2),
+        gchars.DOWN_RIGHT_CORNER)
+    parts.append(frames.move(pos, 1))
+    parts.append(underline)
+    midway = tw // 2
+    parts.append(frames.move(midway, 1))
+    parts.append(gchars.T_UP)
+    maxrow = max(th // 2, 7)
+    parts.append(frames.move(0, maxrow))
+    parts.append(gchars.DVERT_T_LEFT)
+    parts.append(gchars.HORIZONTAL * (tw - 2))
+    parts.append(gchars.DVERT_T_RIGHT)
+    parts.append(frames.move(midway, maxrow))
+    parts.append(gchars.CROSS)
+    for n in range(2, maxrow):
+        parts.append(frames.move(midway, n))
+        parts.append(gchars.VERTICAL)
+    for n in range(maxrow + 1, th):
+        parts.append(frames.move(midway, n))
+        parts.append(gchars.VERTICAL)
+    parts.append(frames.move(midway, th))
+    parts.append(gchars.DHORIZ_T_DOWN)
+    return u"".join(parts)
+
+def assemble_endgame_results(game, term_size, last_row):
+    """
+    Assemble the post game results shown below the phase info.
+    """
+    tw, th = term_size
+    midway = tw // 2
+    equator = th // 2
+    frame_w = tw - midway
+    parts = []
+    eliminated = set(game.eliminated)
+    row = last_row + 2
+    col_w = (frame_w - 3) // 3
+    pos_col0 = 2
+    pos_col1 = pos_col0 + col_w
+    pos_col2 = pos_col1 + col_w
+    emca48 = A.underline["Player", -A.underline[""]]
+    text = assembleFormattedText(emca48)
+    parts.append(frames.move(pos_col0, row))
+    parts.append(text)
+    emca48 = A.underline["Eliminated?", -A.underline[""]]
+    text = assembleFormattedText(emca48)
+    parts.append(frames.move(pos_col1, row))
+    parts.append(text)
+    emca48 = A.underline["Voted For", -A.underline[""]]
+    text = assembleFormattedText(emca48)
+    parts.append(frames.move(pos_col2, row))
+    parts.append(text)
+    pgi = game.post_game_results
+    winner = pgi.winner
+    player_cards = pgi.player_cards
+    orig_player_cards = pgi.orig_player_cards
+    table_cards = pgi.table_cards
+    orig_table_cards = pgi.orig_table_cards
+    players = list(player_cards.keys())
+    players.sort()
+    votes = game.votes
+    row += 1
+    for player in players:
+        parts.append(frames.move(pos_col0, row))
+        if row == th - 2:
+            parts.append("...")
+            break
+        parts.append(player)
+        parts.append(frames.move(pos_col1, row))
+        elim_flag = " "
+        if player in eliminated:
+            elim_flag = "Y"
+        parts.append(elim_flag)
+        parts.append(frames.move(pos_col2, row))
+        parts.append(votes.get(player, "N/A"))
+        row += 1
+    wg = WerewolfGame
+    if winner == wg.WINNER_VILLAGE:
+        msg = "A Village Victory!"
+    elif winner == wg.WINNER_WEREWOLVES:
+        msg = "A Werewolf Victory!"
+    elif winner == wg.WINNER_TANNER:
+        msg = "A Tanner Victory!"
+    elif winner == wg.WINNER_TANNER_AND_VILLAGE:
+        msg = "A Tanner and Village Victory!"
+    elif winner == wg.WINNER_NO_ONE:
+        msg = "No One Wins!"
+    pos = midway + (frame_w - len(msg)) // 2
+    row = equator + 2
+    emca48 = A.bold[msg, -A.bold[""]]
+    msg = assembleFormattedText(emca48)
+    parts.append(frames.move(pos, row))
+    parts.append(msg)
+    player_result_matrix = []
+    for player in players:
+        entry = (
+            player,
+            WerewolfGame.get_card_name(orig_player_cards[player]),
+            WerewolfGame.get_card_name(player_cards[player]))
+        player_result_matrix.append(entry)
+    table_result_matrix = zip(
+        [WerewolfGame.get_card_name(c) for c in orig_table_cards],
+        [WerewolfGame.get_card_name(c) for c in table_cards])
+    col_w = (frame_w - 3) // 3
+    pos_col0 = midway + 2
+    pos_col1 = pos_col0 + col_w
+    pos_col2 = pos_col1 + col_w
+    row += 2
+    emca48 = A.underline["Player", -A.underline[""]]
+    text = assembleFormattedText(emca48)
+    parts.append(frames.move(pos_col0, row))
+    parts.append(text)
+    emca48 = A.underline["Dealt Card", -A.underline[""]]
+    text = assembleFormattedText(emca48)
+    parts.append(frames.move(pos_col1, row))
+    parts.append(text)
+    emca48 = A.underline["Final Card", -A.underline[""]]
+    text = assembleFormattedText(emca48)
+    parts.append(frames.move(pos_col2, row))
+    parts.append(text)
+    row += 1
+    for player, dealt, final in player_result_matrix:
+        parts.append(frames.move(pos_col0, row))
+        if row == th - 2:
+            parts.append("...")
+            break
+        parts.append(player)
+        parts.append(frames.move(pos_col1, row))
+        parts.append(dealt)
+        parts.append(frames.move(pos_col2, row))
+        parts.append(final)
+        row += 1
+    row += 1
+    for n, (dealt, final) in enumerate(table_result_matrix):
+        parts.append(frames.move(pos_col0, row))
+        if row >= th - 2:
+            parts.append("...")
+            break
+        parts.append("Table {}".format(n + 1))
+        parts.append(frames.move(pos_col1, row))
+        parts.append(dealt)
+        parts.append(frames.move(pos_col2, row))
+        parts.append(final)
+        row += 1
+    return u"".join(parts)
+
+def assemble_phase_info(term_size, title, desc, key_help, ready_to_advance):
+    """
+    Assemble the phase title, description, and key help.  Return the text
+    and the last row of the description.
+    """
+    tw, th = term_size
+    midway = tw // 2
+    equator = th // 2
+    frame_w = tw - midway
+    row = equator + 1
+    pos = (frame_w - len(title)) // 2
+    emca48 = A.bold[title, -A.bold[""]]
+    text = assembleFormattedText(emca48)
+    parts = [frames.move(pos, row), text]
+    lines = wrap_paras(desc, frame_w - 4)
+    maxlen = max(len(line) for line in lines)
+    pos = (frame_w - maxlen) // 2
+    row += 1
+    for line in lines:
+        row += 1
+        parts.append(frames.move(pos, row))
+        if row == (th - 4):
+            parts.append("...")
+            break
+        parts.append(line)
+    last_row = row
+    row = th - 2
+    if ready_to_advance:
+        heading = "Waiting for other players ..."
+    else:
+        heading = key_help
+    pos = (frame_w - len(heading)) // 2
+    parts.append(frames.move(pos, row))
+    parts.append(heading)
+    return u"".join(parts), last_row
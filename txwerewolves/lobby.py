@@ -9,6 +9,9 @@ import json
 import textwrap
 import weakref
 from txwerewolves import (
+    bots,
+    formatting,
+    frames,
     session,
     users,
     utils,
@@ -21,6 +24,7 @@ from txwerewolves.apps import (
 from txwerewolves.dialogs import (
     ChatDialog,
     ChoosePlayerDialog, 
+    ChooseSessionDialog,
 )
 from txwerewolves.game import (
     SSHGameProtocol,
@@ -30,11 +34,13 @@ from txwerewolves.interfaces import (
     ITerminalApplication,
     IWebApplication,
 )
-from automat import MethodicalMachine
-from twisted.conch.insults.text import (
-    attributes as A,
-    assembleFormattedText,
+from txwerewolves.spectate import (
+    SSHSpectatorProtocol,
+    WebSpectatorProtocol,
+    attach_spectator,
+    generate_watchable_sessions,
 )
+from automat import MethodicalMachine
 from twisted.internet import defer
 from twisted.python import log
 from zope import interface
@@ -400,21 +406,8 @@ class SSHLobbyProtocol(TerminalAppBase):
         """
         Draw a border around the display area.
         """
-        terminal = self.terminal
-        tw, th = self.term_size
-        terminal.cursorHome()
-        terminal.write(gchars.DBORDER_UP_LEFT)
-        terminal.write(gchars.DBORDER_HORIZONTAL * (tw - 2))
-        terminal.write(gchars.DBORDER_UP_RIGHT)
-        for n in range(1, th):
-            terminal.cursorPosition(0, n)
-            terminal.write(gchars.DBORDER_VERTICAL)
-            terminal.cursorPosition(tw-1, n)
-            terminal.write(gchars.DBORDER_VERTICAL)
-        terminal.cursorPosition(0, th - 1)
-        terminal.write(gchars.DBORDER_DOWN_LEFT)
-        terminal.write(gchars.DBORDER_HORIZONTAL * (tw - 2))
-        terminal.write(gchars.DBORDER_DOWN_RIGHT)
+        frame = frames.get_frame('lobby', self.term_size, assemble_lobby_border)
+        self.terminal.blit(frame)
         
     def _update_player_area(self):
         """
@@ -431,7 +424,7 @@ class SSHLobbyProtocol(TerminalAppBase):
         terminal.saveCursor()
         #reverseVideo, underline, bold
         title = " {} ".format(player)
-        player_text = assembleFormattedText(A.bold[A.fg.blue[title]])
+        player_text = formatting.format_text(('bold', ('fg.blue', title)))
         terminal.write(player_text)
         terminal.restoreCursor()
 
@@ -496,8 +489,7 @@ class SSHLobbyProtocol(TerminalAppBase):
             msg = "New Chat Message"
             pos = (tw - len(msg)) // 2
             row = 14
-            emca48 = A.bold[msg, -A.bold[""]]
-            text = assembleFormattedText(emca48)
+            text = formatting.bold(msg)
             terminal.cursorPosition(pos, row)
             terminal.write(text)
 
@@ -536,8 +528,11 @@ class SSHLobbyProtocol(TerminalAppBase):
         """
         dialog = self.dialog
         if self.dialog is None:
-            return        
-        dialog.schedule_redraw()
+            return
+        # The screen was just reset, so draw the dialog in the same flush
+        # rather than uncovering the lobby for a turn.
+        dialog.cancel_redraw()
+        dialog.paint()
 
     def handle_unjoined(self):
         if not self.dialog is None:
@@ -546,11 +541,15 @@ class SSHLobbyProtocol(TerminalAppBase):
         self.instructions = textwrap.dedent("""\
         Valid commands are:
         * (i)nvite players            - Invite players to join a session.
+        * (b)ot                       - Start a session with a bot player.
         * (l)ist                      - List players in the lobby.
+        * (w)atch                     - Watch a game in progress.
         """)
         self.commands = {
             'l': self._list_players,
             'i': self._invite,
+            'b': self._add_bot,
+            'w': self._watch,
         }
         self.update_display()
     
@@ -563,12 +562,14 @@ class SSHLobbyProtocol(TerminalAppBase):
         Valid commands are:
         * (s)tart                     - Start the session with the current members.
         * (i)nvite                    - Invite another player.
+        * (b)ot                       - Add a bot player.
         * (j)oined                    - Show players that have joined the session.
         * (c)ancel                    - Cancel the session.
         """)
         self.commands = {
             's': self._start_session,
             'i': self._invite,
+            'b': self._add_bot,
             'j': self._show_joined,
             'c': self._cancel_session,
         }
@@ -616,7 +617,7 @@ class SSHLobbyProtocol(TerminalAppBase):
         """
         List players.
         """
-        fltr = lambda e: (e.invited_id is None) and (e.joined_id is None) and (not e.app_protocol is None)
+        fltr = lambda e: (e.invited_id is None) and (e.joined_id is None) and (e.spectating_id is None) and (not e.app_protocol is None)
         user_ids = [e.user_id for e in users.generate_user_entries(fltr=fltr)]
         log.msg("_list_players() user_ids: {}".format(user_ids))
         self.output.append("Available Players:\n{}".format('\n'.join(user_ids)))
@@ -628,7 +629,7 @@ class SSHLobbyProtocol(TerminalAppBase):
         """
         this_player = self.user_id
         my_entry = users.get_user_entry(this_player)
-        fltr = lambda e: (e.invited_id is None) and (e.joined_id is None) and (not e.app_protocol is None)
+        fltr = lambda e: (e.invited_id is None) and (e.joined_id is None) and (e.spectating_id is None) and (not e.app_protocol is None)
         players = set([e.user_id for e in users.generate_user_entries(fltr=fltr)])
         players.discard(this_player)
         if len(players) == 0:
@@ -647,6 +648,47 @@ class SSHLobbyProtocol(TerminalAppBase):
         dialog = ChoosePlayerDialog.make_dialog(players)
         self.install_dialog(dialog)
 
+    def _add_bot(self):
+        """
+        Add a bot player to the session, creating one if needed.
+        """
+        this_player = self.user_id
+        my_entry = users.get_user_entry(this_player)
+        if my_entry.joined_id is None:
+            session_entry = session.create_session()
+            my_entry.joined_id = session_entry.session_id
+            session_entry.owner = this_player
+            session_entry.members.add(this_player)
+            self.lobby.create_session()
+        add_bot_player(session.get_entry(my_entry.joined_id), self.reactor)
+
+    def _watch(self):
+        """
+        Choose a game in progress to watch.
+        """
+        session_ids = sorted(generate_watchable_sessions())
+        if len(session_ids) == 0:
+            self.output.append("There are no games to watch at this time.")
+            self.update_display()
+            return
+        dialog = ChooseSessionDialog.make_dialog(session_ids)
+        self.install_dialog(dialog)
+
+    def _watch_session(self, session_id):
+        if not attach_spectator(session_id, self.user_id):
+            self.output.append("Session {} has ended.".format(session_id))
+            self.update_display()
+            return
+        parent = self.parent()
+        proto = SSHSpectatorProtocol.make_instance(
+            self.reactor,
+            self.terminal,
+            self.user_id,
+            parent,
+            session_id)
+        proto.term_size = self.term_size
+        parent.install_application(proto)
+
     def _show_joined(self):
         """
         List the players that have joined the session.
@@ -865,12 +907,16 @@ class WebLobbyProtocol(WebAppBase):
         actions = [
             ('Invite players to join a session.', 0, 'Selecting a player ...'),
             ('List players in the lobby.', 1, 'Players listed.'),
+            ('Watch a game in progress.', 2, 'Selecting a game ...'),
+            ('Start a session with a bot player.', 3, 'Bot added.'),
         ]
         self.actions = actions
         self._update_client_actions()
         self.handlers = {
             1: self._list_players,
             0: self._invite,
+            2: self._watch,
+            3: self._add_bot,
         }
     
     def handle_waiting_for_accepts(self):
@@ -885,6 +931,7 @@ class WebLobbyProtocol(WebAppBase):
             ('Invite another player', 1, 'Selecting a player ...'),
             ('Show players that have joined the session.', 2, 'Members listed.'),
             ('Cancel the session.', 3, 'Session cancelled.'),
+            ('Add a bot player.', 4, 'Bot added.'),
         ]
         self.actions = actions
         self._update_client_actions()
@@ -893,6 +940,7 @@ class WebLobbyProtocol(WebAppBase):
             1 : self._invite,
             2 : self._show_joined,
             3 : self._cancel_session,
+            4 : self._add_bot,
         }
     
     def handle_session_started(self):
@@ -958,7 +1006,7 @@ class WebLobbyProtocol(WebAppBase):
         """
         List players.
         """
-        fltr = lambda e: (e.invited_id is None) and (e.joined_id is None) and (not e.app_protocol is None)
+        fltr = lambda e: (e.invited_id is None) and (e.joined_id is None) and (e.spectating_id is None) and (not e.app_protocol is None)
         user_ids = [e.user_id for e in users.generate_user_entries(fltr=fltr)]
         msg = "Available Players:\n{}".format('\n'.join(user_ids))
         self._send_output_to_client(msg)
@@ -970,7 +1018,7 @@ class WebLobbyProtocol(WebAppBase):
         this_player = self.user_id
         my_entry = users.get_user_entry(this_player)
         my_avatar = my_entry.avatar
-        fltr = lambda e: (e.invited_id is None) and (e.joined_id is None)
+        fltr = lambda e: (e.invited_id is None) and (e.joined_id is None) and (e.spectating_id is None)
         players = set([e.user_id for e in users.generate_user_entries(fltr=fltr)])
         players.discard(this_player)
         if len(players) == 0:
@@ -1011,6 +1059,68 @@ class WebLobbyProtocol(WebAppBase):
         command_str = json.dumps(command)
         my_avatar.send_event_to_client(command_str)
 
+    def _add_bot(self):
+        """
+        Add a bot player to the session, creating one if needed.
+        """
+        this_player = self.user_id
+        my_entry = users.get_user_entry(this_player)
+        if my_entry.joined_id is None:
+            session_entry = session.create_session()
+            my_entry.joined_id = session_entry.session_id
+            session_entry.owner = this_player
+            session_entry.members.add(this_player)
+            self.lobby.create_session()
+        add_bot_player(session.get_entry(my_entry.joined_id), self.reactor)
+
+    def _watch(self):
+        """
+        Choose a game in progress to watch.
+        """
+        session_ids = sorted(generate_watchable_sessions())
+        if len(session_ids) == 0:
+            self.avatar.send_message("There are no games to watch at this time.")
+            self._update_client_actions()
+            return
+        dialog_handlers = {}
+        actions = []
+
+        def _make_handler(session_id):
+
+            def _watch():
+                self._watch_session(session_id)
+
+            return _watch
+
+        for n, session_id in enumerate(session_ids):
+            actions.append((session_id, n, ''))
+            dialog_handlers[n] = _make_handler(session_id)
+        quit_action = len(actions)
+        actions.append(("Stop choosing a game", quit_action, ''))
+        dialog_handlers[quit_action] = self._uninstall_dialog
+        self.dialog_handlers = dialog_handlers
+        command = {
+            'show-dialog': {
+                'dialog-type': 'choose-players',
+                'actions': actions,
+            }
+        }
+        command_str = json.dumps(command)
+        self.avatar.send_event_to_client(command_str)
+
+    def _watch_session(self, session_id):
+        self._uninstall_dialog()
+        if not attach_spectator(session_id, self.user_id):
+            self.avatar.send_message("Session {} has ended.".format(session_id))
+            return
+        avatar = self.avatar
+        proto = WebSpectatorProtocol.make_instance(
+            self.reactor,
+            self.user_id,
+            avatar,
+            session_id)
+        avatar.install_application(proto)
+
     def _send_invite(self, player):
         my_avatar = self.avatar
         my_entry = users.get_user_entry(self.user_id)
@@ -1144,4 +1254,36 @@ class WebLobbyProtocol(WebAppBase):
         command_str = json.dumps(command)
         self.avatar.send_event_to_client(command_str)
 
-
+def add_bot_player(session_entry, reactor):
+    """
+    Add a bot player to a session that has not started and tell the other
+    members.
+    """
+    avatar = bots.add_bot_to_session(session_entry, reactor, bots.PEOPLE_PACE)
+    msg = "{} joined session {}.".format(avatar.user_id, session_entry.session_id)
+    for player in session_entry.members:
+        if player == avatar.user_id:
+            continue
+        user_entry = users.get_user_entry(player)
+        user_entry.avatar.send_message(msg)
+
+def assemble_lobby_border(term_size):
+    """
+    Assemble the border around the lobby display area.
+    """
+    tw, th = term_size
+    parts = [
+        frames.move(0, 0),
+        gchars.DBORDER_UP_LEFT,
+        gchars.DBORDER_HORIZONTAL * (tw - 2),
+        gchars.DBORDER_UP_RIGHT]
+    for n in range(1, th):
+        parts.append(frames.move(0, n))
+        parts.append(gchars.DBORDER_VERTICAL)
+        parts.append(frames.move(tw - 1, n))
+        parts.append(gchars.DBORDER_VERTICAL)
+    parts.append(frames.move(0, th - 1))
+    parts.append(gchars.DBORDER_DOWN_LEFT)
+    parts.append(gchars.DBORDER_HORIZONTAL * (tw - 2))
+    parts.append(gchars.DBORDER_DOWN_RIGHT)
+    return u"".join(parts)
@@ -0,0 +1,134 @@
+"""
+Rendering profiles for terminal connections.
+
+* `unicode` draws everything, box drawing characters and attributes.
+* `ascii` draws box drawing characters as plain ASCII.
+* `minimal` draws plain ASCII without any attributes.
+
+A :py:class:`LinkMonitor` measures each SSH connection's round trip time
+(with cursor position reports) and the bytes queued on its SSH channel, and
+picks a profile to match.  Players can override the choice from the help
+dialog.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+from txwerewolves import graphics_chars as gchars
+
+PROFILE_UNICODE = "unicode"
+PROFILE_ASCII = "ascii"
+PROFILE_MINIMAL = "minimal"
+PROFILES = (PROFILE_UNICODE, PROFILE_ASCII, PROFILE_MINIMAL)
+# Round trip seconds and queued bytes at or above which a connection is
+# drawn with a lighter profile.
+ASCII_RTT = 0.3
+ASCII_QUEUED = 8 * 1024
+MINIMAL_RTT = 1.0
+MINIMAL_QUEUED = 64 * 1024
+
+
+def _make_ascii_map():
+    ascii_map = {}
+    for name in dir(gchars):
+        char = getattr(gchars, name)
+        if name.startswith('_') or not isinstance(char, type(u"")):
+            continue
+        if name.endswith('_ARROW'):
+            replacement = u"^" if name.startswith('UP') else u"v"
+        elif 'HORIZONTAL' in name and '_T_' not in name:
+            replacement = u"=" if name.startswith('D') else u"-"
+        elif 'VERTICAL' in name and '_T_' not in name:
+            replacement = u"|"
+        else:
+            replacement = u"+"
+        ascii_map[char] = replacement
+    return ascii_map
+
+ASCII_MAP = _make_ascii_map()
+
+def choose_profile(rtt, queued):
+    """
+    Choose a profile for a connection with round trip time `rtt` (None if
+    unknown) and `queued` bytes waiting to be sent.
+    """
+    rtt = rtt or 0
+    if rtt >= MINIMAL_RTT or queued >= MINIMAL_QUEUED:
+        return PROFILE_MINIMAL
+    if rtt >= ASCII_RTT or queued >= ASCII_QUEUED:
+        return PROFILE_ASCII
+    return PROFILE_UNICODE
+
+def query_queued_bytes(protocol):
+    """
+    Return the number of bytes queued on the SSH channel under the
+    `insults` protocol `protocol`.
+    """
+    channel = getattr(protocol.transport, 'session', None)
+    buf = getattr(channel, 'buf', None)
+    if buf is None:
+        return 0
+    return len(buf)
+
+
+class LinkMonitor(object):
+    """
+    Measures a connection and reports the profile it should use.
+    """
+    # Seconds between measurements.
+    interval = 10
+    reactor = None
+    protocol = None
+    on_change = None
+    rtt = None
+    queued = 0
+    profile = PROFILE_UNICODE
+    _call = None
+    _probe_sent = None
+    # Clients that never answer a probe are only judged by queued bytes.
+    _answered = False
+
+    @classmethod
+    def make_instance(klass, reactor, protocol, on_change):
+        instance = klass()
+        instance.reactor = reactor
+        instance.protocol = protocol
+        instance.on_change = on_change
+        return instance
+
+    def start(self):
+        self._call = self.reactor.callLater(0, self.measure)
+
+    def stop(self):
+        call = self._call
+        if call is not None and call.active():
+            call.cancel()
+        self._call = None
+
+    def measure(self):
+        self._call = None
+        now = self.reactor.seconds()
+        if self._probe_sent is None:
+            self._probe_sent = now
+            d = self.protocol.reportCursorPosition()
+            d.addCallback(self._probe_answered, now)
+        elif self._answered:
+            # The last probe is overdue, so the round trip is at least this long.
+            self.rtt = max(self.rtt, now - self._probe_sent)
+        self.queued = query_queued_bytes(self.protocol)
+        self._update()
+        self._call = self.reactor.callLater(self.interval, self.measure)
+
+    def _probe_answered(self, position, sent):
+        self._probe_sent = None
+        self._answered = True
+        self.rtt = self.reactor.seconds() - sent
+        self._update()
+
+    def _update(self):
+        profile = choose_profile(self.rtt, self.queued)
+        if profile != self.profile:
+            self.profile = profile
+            self.on_change(profile)
@@ -0,0 +1,81 @@
+"""
+Deterministic replay of Werewolves! games.
+
+Every game records its random number generator seed and the machine inputs
+that changed its state in a :py:class:`txwerewolves.werewolf.ReplayLog`.
+Replaying the log against a fresh game rebuilds the game, card for card,
+without any of the UI layers.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+import json
+from txwerewolves.werewolf import (
+    ReplayLog,
+    WerewolfGame,
+)
+
+_input_names = {
+    ReplayLog.ADD_PLAYERS: 'add_players',
+    ReplayLog.DEAL_CARDS: 'deal_cards',
+    ReplayLog.QUERY_CARDS: 'query_cards',
+    ReplayLog.ENTER_PHASE: 'enter_phase',
+    ReplayLog.SEER_VIEW_PLAYER_CARD: 'seer_view_player_card',
+    ReplayLog.SEER_VIEW_TABLE_CARDS: 'seer_view_table_cards',
+    ReplayLog.ROBBER_STEAL_CARD: 'robber_steal_card',
+    ReplayLog.TROUBLEMAKER_SWITCH_CARDS: 'troublemaker_switch_cards',
+    ReplayLog.ELIMINATE_PLAYERS: 'eliminate_players',
+}
+
+def dumps(replay_log):
+    """
+    Serialize a replay log as compact JSON.
+    """
+    data = [replay_log.seed]
+    data.extend(list(entry) for entry in replay_log.entries)
+    return json.dumps(data, separators=(',', ':'))
+
+def loads(s):
+    """
+    Deserialize a replay log produced by :py:func:`dumps`.
+    """
+    data = json.loads(s)
+    seed = data[0]
+    entries = [tuple(entry) for entry in data[1:]]
+    return ReplayLog(seed=seed, entries=entries)
+
+def replay_game(replay_log, until=None, steps=None, factory=WerewolfGame):
+    """
+    Create a game with `factory` and send it the inputs in `replay_log`.
+
+    If `until` is a state token (e.g. `WerewolfGame.TOKEN_DAYBREAK`), the
+    replay stops as soon as the game enters that state.  If `steps` is set,
+    at most that many log entries are replayed.
+
+    The game's event handlers are not called during the replay.  Call
+    `fire_state_handler()` on the game afterwards to bring the rest of the
+    application up to date.
+    """
+    game = factory()
+    game.seed = replay_log.seed
+    game.replaying = True
+    entries = replay_log.entries
+    if steps is not None:
+        entries = entries[:steps]
+    try:
+        for entry in entries:
+            opcode = entry[0]
+            args = entry[1:]
+            if opcode == ReplayLog.DEAL_CARDS:
+                werewolf_count, roles = args
+                args = (werewolf_count, frozenset(roles))
+            f = getattr(game, _input_names[opcode])
+            f(*args)
+            if until is not None and game.savestate() == until:
+                break
+    finally:
+        game.replaying = False
+    return game
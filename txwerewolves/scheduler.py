@@ -0,0 +1,125 @@
+"""
+Frame scheduling for terminal connections.
+
+Each SSH connection has a :py:class:`FrameScheduler`.  Redraws are requested
+from it rather than scheduled with `reactor.callLater(0, ...)`, so requests
+made back to back for the same connection are collected and run together
+as one frame, and a connection renders no more than `max_fps` frames each
+second.  Requests are keyed, so asking for the same redraw twice before the
+frame runs only runs it once.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+import collections
+import weakref
+
+# Every live scheduler, for a process-wide view of pending frames.
+_schedulers = weakref.WeakSet()
+
+
+class FrameScheduler(object):
+    """
+    Collects the redraw requests for a connection and runs them once per
+    frame.
+    """
+    # Frames per second a connection may render, or None for no limit.
+    max_fps = 30
+    reactor = None
+    frames = 0
+    # Called at the end of each frame, after the requests have run.
+    on_frame_end = None
+    _frame_call = None
+    _last_frame = None
+    _pending = None
+
+    @classmethod
+    def make_instance(klass, reactor, on_frame_end=None):
+        global _schedulers
+        instance = klass()
+        instance.reactor = reactor
+        instance.on_frame_end = on_frame_end
+        instance._pending = collections.OrderedDict()
+        _schedulers.add(instance)
+        return instance
+
+    def request(self, key, f, *args):
+        """
+        Ask for `f(*args)` to run in the next frame.  A later request with
+        the same `key` replaces an earlier one.
+        """
+        self._pending[key] = (f, args)
+        self.request_frame()
+
+    def cancel(self, key):
+        """
+        Withdraw the request made with `key`, if it hasn't run.
+        """
+        self._pending.pop(key, None)
+
+    def is_pending(self, key):
+        return key in self._pending
+
+    def request_frame(self):
+        """
+        Make sure a frame runs, even if nothing was requested.
+        """
+        if self._frame_call is not None:
+            return
+        delay = 0
+        max_fps = self.max_fps
+        last_frame = self._last_frame
+        if max_fps and last_frame is not None:
+            delay = max(0, last_frame + 1.0 / max_fps - self.reactor.seconds())
+        self._frame_call = self.reactor.callLater(delay, self.run_frame)
+
+    def run_frame(self):
+        """
+        Run the pending requests, then end the frame.  Requests made while
+        the frame runs are run in the same frame.
+        """
+        frame_call = self._frame_call
+        if frame_call is not None and frame_call.active():
+            frame_call.cancel()
+        self._frame_call = None
+        self._last_frame = self.reactor.seconds()
+        pending = self._pending
+        while len(pending) > 0:
+            key, (f, args) = pending.popitem(last=False)
+            f(*args)
+        self.frames += 1
+        on_frame_end = self.on_frame_end
+        if on_frame_end is not None:
+            on_frame_end()
+        # Ending the frame may have asked for another one.
+        frame_call = self._frame_call
+        if frame_call is not None and len(pending) == 0:
+            frame_call.cancel()
+            self._frame_call = None
+
+    def stop(self):
+        """
+        Drop the pending requests and the scheduled frame.
+        """
+        frame_call = self._frame_call
+        if frame_call is not None and frame_call.active():
+            frame_call.cancel()
+        self._frame_call = None
+        self._pending.clear()
+
+
+def query_pending_frames():
+    """
+    Return (connections with a frame scheduled, redraw requests pending)
+    over every connection.
+    """
+    connections = 0
+    requests = 0
+    for scheduler in list(_schedulers):
+        if scheduler._frame_call is not None:
+            connections += 1
+        requests += len(scheduler._pending)
+    return connections, requests
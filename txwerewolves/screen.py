@@ -0,0 +1,453 @@
+"""
+Double-buffered terminal screens.
+
+A :py:class:`ScreenBuffer` stands in for the client terminal of an SSH
+connection.  Applications draw into it with the usual `reset()`,
+`cursorPosition()`, and `write()` calls, but nothing is sent right away.
+At the end of the reactor turn the buffer compares what was drawn with
+what the client is already showing, and only the cells that changed are
+sent, with as few cursor moves and attribute changes as possible.
+
+Dialogs draw on *layers* above the base screen.  A layer holds only the
+cells drawn on it, so a dialog can be drawn again, or closed, without
+touching what lies beneath it.  The buffer keeps track of the rows that
+were drawn on, and only those rows are compared when it is flushed.
+
+What is sent also depends on the connection's rendering profile (see
+:py:mod:`txwerewolves.profiles`).
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+import re
+import attr
+from txwerewolves.profiles import (
+    ASCII_MAP,
+    PROFILE_MINIMAL,
+    PROFILE_UNICODE,
+)
+from txwerewolves.scheduler import FrameScheduler
+
+BLANK = (u" ", ())
+_CSI = re.compile(u"\x1b\\[([0-9;?]*)([@-~])")
+# SGR codes that turn off other codes.
+_SGR_OFF = {
+    u"22": (u"1", u"2"),
+    u"24": (u"4",),
+    u"25": (u"5",),
+    u"27": (u"7",),
+}
+
+
+def _apply_sgr(attrs, params):
+    """
+    Return the attributes `attrs` (a sorted tuple of SGR codes) after
+    applying the SGR parameter string `params`.
+    """
+    codes = set(attrs)
+    for code in params.split(u";"):
+        if code in (u"", u"0"):
+            codes.clear()
+        elif code in _SGR_OFF:
+            codes.difference_update(_SGR_OFF[code])
+        elif len(code) == 2 and code[0] in u"34":
+            # A new foreground or background color replaces the old one.
+            codes = set(c for c in codes if not (len(c) == 2 and c[0] == code[0]))
+            if code[1] != u"9":
+                codes.add(code)
+        else:
+            codes.add(code)
+    return tuple(sorted(codes))
+
+
+@attr.attrs
+class Frame(object):
+    """
+    Text already parsed into cells, so it can be drawn again and again
+    without being parsed.  `runs` are (row, column, cells) for each run of
+    cells drawn, and `cursor` and `attrs` are where the text leaves the
+    cursor and the attributes.
+    """
+    runs = attr.attrib()
+    cursor = attr.attrib()
+    attrs = attr.attrib()
+
+
+def parse_frame(data, size):
+    """
+    Parse the text `data`, as drawn on an empty screen of `size` with plain
+    attributes, into a :py:class:`Frame`.
+    """
+    screen = ScreenBuffer.make_instance(None, size=size)
+    screen.open_layer(None)
+    screen.write(data)
+    runs = []
+    for row, cells in sorted(screen._layer.items()):
+        run_start = None
+        run = None
+        for col in sorted(cells):
+            if run is not None and col == run_start + len(run):
+                run.append(cells[col])
+                continue
+            if run is not None:
+                runs.append((row, run_start, tuple(run)))
+            run_start = col
+            run = [cells[col]]
+        if run is not None:
+            runs.append((row, run_start, tuple(run)))
+    return Frame(
+        runs=tuple(runs),
+        cursor=(screen._col, screen._row),
+        attrs=screen._attrs)
+
+
+class ScreenBuffer(object):
+    """
+    A virtual screen in front of an `insults` terminal.
+    """
+    terminal = None
+    reactor = None
+    width = 80
+    height = 24
+    bytes_sent = 0
+    flushes = 0
+    _back = None
+    # What the client shows, or None if it is unknown.
+    _front = None
+    _col = 0
+    _row = 0
+    _attrs = ()
+    _saved = None
+    # Flushes happen at the end of each of the connection's frames.
+    scheduler = None
+    # The profile in use, the one chosen for the connection, and the one
+    # the player chose, if any.
+    profile = PROFILE_UNICODE
+    auto_profile = PROFILE_UNICODE
+    profile_override = None
+    # Layers above the base screen, bottom first, as (key, {row: {col: cell}}).
+    _layers = ()
+    # The cells of the layer being drawn on, or None for the base screen.
+    _layer = None
+    # Rows drawn on since the last flush, or None for all of them.
+    _damage = None
+    # Where the client's cursor was left by the last flush.
+    _cursor = None
+    # Runs of unchanged cells no longer than this are rewritten rather than
+    # skipped with a cursor move.
+    GAP = 4
+
+    @classmethod
+    def make_instance(klass, terminal, reactor=None, size=(80, 24)):
+        instance = klass()
+        instance.terminal = terminal
+        instance.reactor = reactor
+        if reactor is not None:
+            instance.scheduler = FrameScheduler.make_instance(reactor, instance.flush)
+        instance.resize(*size)
+        return instance
+
+    def __getattr__(self, name):
+        # Anything not drawn through the buffer goes to the real terminal.
+        return getattr(self.terminal, name)
+
+    def resize(self, width, height):
+        """
+        Change the size of the screen.  The next flush repaints everything.
+        """
+        self.width = width
+        self.height = height
+        self._back = [[BLANK] * width for n in range(height)]
+        self._front = None
+        self._cursor = None
+        self._layers = []
+        self._layer = None
+        self._damage = None
+        self._col = min(self._col, width - 1)
+        self._row = min(self._row, height - 1)
+
+    def set_auto_profile(self, profile):
+        self.auto_profile = profile
+        self._apply_profile()
+
+    def set_profile_override(self, profile):
+        """
+        Use `profile` whatever the connection is like, or choose the profile
+        automatically again if `profile` is None.
+        """
+        self.profile_override = profile
+        self._apply_profile()
+
+    def _apply_profile(self):
+        profile = self.profile_override or self.auto_profile
+        if profile != self.profile:
+            self.profile = profile
+            self.invalidate()
+
+    def invalidate(self):
+        """
+        Forget what the client shows, so the next flush repaints everything.
+        """
+        self._front = None
+        self._damage = None
+        self._schedule_flush()
+
+    # ------
+    # Layers
+    # ------
+
+    def open_layer(self, key, clear=True):
+        """
+        Direct drawing to the layer identified by `key`, clearing it first
+        if `clear` is set.  A new layer is placed above the others.
+        """
+        for layer_key, cells in self._layers:
+            if layer_key == key:
+                if clear:
+                    self._damage_rows(cells)
+                    cells.clear()
+                break
+        else:
+            cells = {}
+            self._layers.append((key, cells))
+        self._layer = cells
+
+    def end_layer(self):
+        """
+        Direct drawing back to the base screen.
+        """
+        self._layer = None
+
+    def close_layer(self, key):
+        """
+        Remove the layer identified by `key`, uncovering what lies beneath.
+        """
+        layers = self._layers
+        for n, (layer_key, cells) in enumerate(layers):
+            if layer_key == key:
+                del layers[n]
+                self._damage_rows(cells)
+                if self._layer is cells:
+                    self._layer = None
+                self._schedule_flush()
+                return
+
+    def has_layer(self, key):
+        return any(layer_key == key for layer_key, cells in self._layers)
+
+    def _damage_rows(self, rows):
+        damage = self._damage
+        if damage is not None:
+            damage.update(rows)
+
+    # -------
+    # Drawing
+    # -------
+
+    def reset(self):
+        """
+        Clear the base screen and remove every layer.
+        """
+        self._back = [[BLANK] * self.width for n in range(self.height)]
+        self._layers = []
+        self._layer = None
+        self._damage = None
+        self._col = self._row = 0
+        self._attrs = ()
+        self._saved = None
+        self._schedule_flush()
+
+    def cursorHome(self):
+        self.cursorPosition(0, 0)
+
+    def cursorPosition(self, column, line):
+        self._col = max(0, min(column, self.width - 1))
+        self._row = max(0, min(line, self.height - 1))
+        self._schedule_flush()
+
+    def saveCursor(self):
+        self._saved = (self._col, self._row, self._attrs)
+
+    def restoreCursor(self):
+        if self._saved is not None:
+            self._col, self._row, self._attrs = self._saved
+
+    def write(self, data):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        pos = 0
+        for match in _CSI.finditer(data):
+            self._put_text(data[pos:match.start()])
+            params, command = match.groups()
+            if command == u"m":
+                self._attrs = _apply_sgr(self._attrs, params)
+            elif command in (u"H", u"f"):
+                parts = (params.split(u";") + [u"", u""])[:2]
+                line, column = [int(p) if p else 1 for p in parts]
+                self.cursorPosition(column - 1, line - 1)
+            pos = match.end()
+        self._put_text(data[pos:])
+        self._schedule_flush()
+
+    def blit(self, frame):
+        """
+        Draw a :py:class:`Frame`.  This is the same as writing the text it
+        was parsed from, starting with plain attributes.
+        """
+        width = self.width
+        height = self.height
+        layer = self._layer
+        back = self._back
+        damage = self._damage
+        for row, col, cells in frame.runs:
+            if row >= height or col >= width:
+                continue
+            cells = cells[:width - col]
+            if damage is not None:
+                damage.add(row)
+            if layer is None:
+                back[row][col:col + len(cells)] = cells
+            else:
+                layer_row = layer.setdefault(row, {})
+                for offset, cell in enumerate(cells):
+                    layer_row[col + offset] = cell
+        col, row = frame.cursor
+        self._col = min(col, width)
+        self._row = min(row, height - 1)
+        self._attrs = frame.attrs
+        self._schedule_flush()
+
+    def _put_text(self, text):
+        if not text:
+            return
+        width = self.width
+        height = self.height
+        layer = self._layer
+        attrs = self._attrs
+        col = self._col
+        row = self._row
+        damage = self._damage
+        if damage is not None:
+            damage.add(row)
+        if layer is None:
+            cells = self._back[row]
+        else:
+            cells = layer.setdefault(row, {})
+        for char in text:
+            if char == u"\r":
+                col = 0
+                continue
+            if char == u"\n" or col >= width:
+                col = 0
+                row += 1
+                if row >= height:
+                    break
+                if damage is not None:
+                    damage.add(row)
+                if layer is None:
+                    cells = self._back[row]
+                else:
+                    cells = layer.setdefault(row, {})
+                if char == u"\n":
+                    continue
+            cells[col] = (char, attrs)
+            col += 1
+        self._col = col
+        self._row = min(row, height - 1)
+
+    # --------
+    # Flushing
+    # --------
+
+    def _schedule_flush(self):
+        scheduler = self.scheduler
+        if scheduler is not None:
+            scheduler.request_frame()
+
+    def _compose_row(self, row):
+        """
+        Return the cells of `row` as the client should show them.
+        """
+        cells = list(self._back[row])
+        for key, layer in self._layers:
+            layer_row = layer.get(row)
+            if layer_row:
+                for col, cell in layer_row.items():
+                    cells[col] = cell
+        profile = self.profile
+        if profile != PROFILE_UNICODE:
+            plain = (profile == PROFILE_MINIMAL)
+            cells = [
+                (ASCII_MAP.get(char, char), () if plain else attrs)
+                for char, attrs in cells]
+        return cells
+
+    def flush(self):
+        """
+        Send the cells that differ from what the client shows.
+        """
+        front = self._front
+        width = self.width
+        height = self.height
+        damage = self._damage
+        if front is None or damage is None:
+            rows = range(height)
+        else:
+            rows = sorted(damage)
+        self._damage = set()
+        gap = self.GAP
+        out = []
+        # Where the client's cursor is, or None if unknown.  Every flush
+        # leaves the client drawing with plain attributes.
+        cursor = self._cursor
+        attrs = ()
+        if front is None:
+            out.append(u"\x1b[0m\x1b[H\x1b[2J")
+            front = [[BLANK] * width for n in range(height)]
+            cursor = (0, 0)
+        for row in rows:
+            back_row = self._compose_row(row)
+            front_row = front[row]
+            if back_row == front_row:
+                continue
+            front[row] = back_row
+            for col in range(width):
+                cell = back_row[col]
+                if cell == front_row[col]:
+                    continue
+                if cursor != (col, row):
+                    skipped = back_row[cursor[0]:col] if cursor is not None else None
+                    if (cursor is not None and cursor[1] == row
+                            and 0 < len(skipped) <= gap
+                            and all(a == attrs for c, a in skipped)):
+                        out.extend(c for c, a in skipped)
+                    else:
+                        out.append(u"\x1b[{};{}H".format(row + 1, col + 1))
+                char, cell_attrs = cell
+                if cell_attrs != attrs:
+                    out.append(u"\x1b[{}m".format(u";".join((u"0",) + cell_attrs)))
+                    attrs = cell_attrs
+                out.append(char)
+                cursor = (col + 1, row) if col + 1 < width else None
+        if attrs:
+            out.append(u"\x1b[0m")
+        if cursor != (self._col, self._row):
+            out.append(u"\x1b[{};{}H".format(self._row + 1, self._col + 1))
+        self._cursor = (self._col, self._row)
+        self._front = front
+        self.flushes += 1
+        if len(out) == 0:
+            return
+        data = u"".join(out).encode('utf-8')
+        self.bytes_sent += len(data)
+        self.terminal.write(data)
+
+    def loseConnection(self):
+        scheduler = self.scheduler
+        if scheduler is not None:
+            scheduler.stop()
+        self.flush()
+        self.terminal.loseConnection()
@@ -6,6 +6,12 @@ import attr
 from txwerewolves import users
 
 _session_registry = {}
+# Signals waiting to be broadcast at the end of the reactor turn, by session.
+_pending_broadcasts = collections.OrderedDict()
+_flush_call = None
+_broadcast_stats = collections.Counter()
+# Signals that are also forwarded to a session's spectators.
+_SPECTATOR_SIGNALS = frozenset(['next-phase', 'chat-message', 'reset', 'shutdown'])
 _SESSION_TAGS = [
     'green',
     'blue',
@@ -27,6 +33,86 @@ class SessionRegistryInfo(object):
     appstate = attr.attrib(default=None)
     chat_buf = attr.attrib(default=None)
     settings = attr.attrib(default=None)
+    journal = attr.attrib(default=None)
+    # Users watching the session.  They are not members.
+    spectators = attr.attrib(default=attr.Factory(set))
+
+
+@attr.attrs
+class JournalEvent(object):
+    seq = attr.attrib()
+    kind = attr.attrib()
+    payload = attr.attrib(default=None)
+    # The only member who may see the event, or None for all members.
+    audience = attr.attrib(default=None)
+
+
+class EventJournal(object):
+    """
+    Record of a session's events (phase changes, private reveals, and chat),
+    numbered from 1.  Each member's offset is the last event their client is
+    known to have shown, so a client that comes back only needs the events
+    after it.  Only the last `limit` events are kept.
+    """
+    limit = 500
+    events = None
+    offsets = None
+    # The number of events dropped from the front of `events`.
+    trimmed = 0
+
+    @classmethod
+    def make_instance(klass):
+        instance = klass()
+        instance.events = []
+        instance.offsets = {}
+        return instance
+
+    @property
+    def last_seq(self):
+        return self.trimmed + len(self.events)
+
+    def append(self, kind, payload=None, audience=None):
+        """
+        Add an event and return its sequence number.
+        """
+        events = self.events
+        seq = self.last_seq + 1
+        events.append(JournalEvent(seq, kind, payload, audience))
+        if len(events) > self.limit:
+            del events[0]
+            self.trimmed += 1
+        return seq
+
+    def has_events_since(self, offset):
+        """
+        True if every event after `offset` is still kept.
+        """
+        return offset >= self.trimmed
+
+    def events_since(self, offset, user_id=None):
+        """
+        Return the kept events after `offset` that `user_id` may see.
+        """
+        # Sequence numbers follow list positions, so no search is needed.
+        start = max(offset - self.trimmed, 0)
+        return [
+            event for event in self.events[start:]
+            if event.audience is None or event.audience == user_id]
+
+    def query_offset(self, user_id):
+        """
+        Return the last event acknowledged by `user_id`'s client, or 0.
+        """
+        return self.offsets.get(user_id, 0)
+
+    def acknowledge(self, user_id, seq=None):
+        """
+        Record that `user_id`'s client has shown the events up to `seq`
+        (by default, all of them).
+        """
+        if seq is None:
+            seq = self.last_seq
+        self.offsets[user_id] = max(seq, self.offsets.get(user_id, 0))
 
 
 def create_session():
@@ -47,6 +133,7 @@ def create_session():
         raise Exception("Could not create session ID.")
     _session_registry[session_id] = entry
     entry.chat_buf = collections.deque([], 50)
+    entry.journal = EventJournal.make_instance()
     return entry
 
 def get_entry(session_id):
@@ -57,6 +144,15 @@ def get_entry(session_id):
     entry = _session_registry.get(session_id, None)
     return entry
     
+def generate_entries(fltr=None):
+    """
+    Generate session entries, optionally filtered by `fltr`.
+    """
+    global _session_registry
+    for entry in list(_session_registry.values()):
+        if fltr is None or fltr(entry):
+            yield entry
+
 def destroy_entry(session_id):
     """
     Remove a session entry.
@@ -65,6 +161,25 @@ def destroy_entry(session_id):
     if session_id in _session_registry:
         del _session_registry[session_id]
     
+def record_event(session_id, kind, payload=None, audience=None):
+    """
+    Add an event to the session journal.  Returns the sequence number, or
+    None if the session is gone.
+    """
+    entry = get_entry(session_id)
+    if entry is None or entry.journal is None:
+        return None
+    return entry.journal.append(kind, payload, audience)
+
+def post_chat_message(session_id, sender, message):
+    """
+    Add a chat message to the session's chat buffer and journal.
+    """
+    entry = get_entry(session_id)
+    entry.chat_buf.append((sender, message))
+    if entry.journal is not None:
+        entry.journal.append('chat', {'sender': sender, 'message': message})
+
 def send_signal_to_members(session_id, signal, include_invited=False, exclude=None):
     """
     Send `signal` to the session members.
@@ -84,5 +199,55 @@ def send_signal_to_members(session_id, signal, include_invited=False, exclude=No
         entry = users.get_user_entry(member)
         avatar = entry.avatar
         avatar.send_app_signal(signal)
+    if signal[0] in _SPECTATOR_SIGNALS:
+        for spectator in list(session_entry.spectators):
+            entry = users.get_user_entry(spectator)
+            avatar = entry.avatar
+            if avatar is not None:
+                avatar.send_app_signal(signal)
 
+def schedule_signal_to_members(session_id, signal, reactor):
+    """
+    Like `send_signal_to_members()`, but the signal is sent on the next
+    reactor iteration.  If the same signal is scheduled for a session more
+    than once before then, the members only receive it once.
+    """
+    global _pending_broadcasts
+    global _flush_call
+    global _broadcast_stats
+    _broadcast_stats['scheduled'] += 1
+    signals = _pending_broadcasts.setdefault(session_id, [])
+    if signal in signals:
+        _broadcast_stats['merged'] += 1
+        return
+    signals.append(signal)
+    if _flush_call is None:
+        _flush_call = reactor.callLater(0, flush_broadcasts)
 
+def flush_broadcasts():
+    """
+    Send all scheduled signals now.
+    """
+    global _pending_broadcasts
+    global _flush_call
+    global _broadcast_stats
+    _flush_call = None
+    while len(_pending_broadcasts) > 0:
+        session_id, signals = _pending_broadcasts.popitem(last=False)
+        if get_entry(session_id) is None:
+            _broadcast_stats['dropped'] += len(signals)
+            continue
+        for signal in signals:
+            _broadcast_stats['sent'] += 1
+            send_signal_to_members(session_id, signal)
+
+def get_broadcast_stats():
+    """
+    Return counts of the scheduled broadcasts: how many were `scheduled`,
+    how many were `merged` into a broadcast already pending, how many were
+    `sent`, and how many were `dropped` because the session went away.
+    """
+    global _broadcast_stats
+    stats = dict.fromkeys(['scheduled', 'merged', 'sent', 'dropped'], 0)
+    stats.update(_broadcast_stats)
+    return stats
@@ -0,0 +1,315 @@
+"""
+Vectorized Monte Carlo simulation of Werewolves! games.
+
+Games are dealt and resolved in batches using NumPy arrays of card codes
+(the `WerewolfGame.CARD_*` constants).  The rules mirror those of
+:py:class:`txwerewolves.werewolf.WerewolfGame`:
+
+* The deck is built, trimmed, and shuffled the same way `_map_cards` does it.
+* The robber acts before the troublemaker, and both act on the current cards.
+* Votes are tallied the same way `HandledWerewolfGame.count_votes` does it,
+  including the hunter rule.
+* The winner is decided the same way `_query_post_game_results` does it.
+
+Night actions and votes are chosen uniformly at random.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+import attr
+import numpy as np
+from txwerewolves.werewolf import (
+    VoteTally,
+    WerewolfGame,
+    generate_role_sets,
+)
+
+WINNERS = (
+    WerewolfGame.WINNER_VILLAGE,
+    WerewolfGame.WINNER_WEREWOLVES,
+    WerewolfGame.WINNER_NO_ONE,
+    WerewolfGame.WINNER_TANNER,
+    WerewolfGame.WINNER_TANNER_AND_VILLAGE,
+)
+_winner_names = {
+    WerewolfGame.WINNER_VILLAGE: "village",
+    WerewolfGame.WINNER_WEREWOLVES: "werewolves",
+    WerewolfGame.WINNER_NO_ONE: "no one",
+    WerewolfGame.WINNER_TANNER: "tanner",
+    WerewolfGame.WINNER_TANNER_AND_VILLAGE: "tanner and village",
+}
+CARD_DTYPE = np.int8
+
+
+@attr.attrs
+class SimulationResult(object):
+    player_count = attr.attrib()
+    roles = attr.attrib()
+    werewolves = attr.attrib()
+    games = attr.attrib()
+    winner_counts = attr.attrib()
+
+    @property
+    def win_rates(self):
+        """
+        Mapping of `WINNER_*` codes to the fraction of games won.
+        """
+        games = self.games
+        return dict((w, c / games) for w, c in self.winner_counts.items())
+
+
+def deal_games(games, player_count, werewolf_count, roles, rng):
+    """
+    Deal `games` decks of `player_count` + 3 cards.
+    Returns (player_cards, table_cards) as arrays of shape
+    (games, player_count) and (games, 3).
+    """
+    total_cards = player_count + 3
+    role_list = np.array(sorted(roles), dtype=CARD_DTYPE)
+    role_count = len(role_list)
+    parts = [np.full((games, werewolf_count), WerewolfGame.CARD_WEREWOLF, dtype=CARD_DTYPE)]
+    if role_count > 0:
+        order = np.argsort(rng.random((games, role_count)), axis=1)
+        parts.append(role_list[order])
+    deck_size = werewolf_count + role_count
+    if deck_size < total_cards:
+        parts.append(np.full(
+            (games, total_cards - deck_size),
+            WerewolfGame.CARD_VILLAGER,
+            dtype=CARD_DTYPE))
+    deck = np.concatenate(parts, axis=1)[:, :total_cards]
+    order = np.argsort(rng.random((games, total_cards)), axis=1)
+    deck = np.take_along_axis(deck, order, axis=1)
+    return deck[:, :player_count], deck[:, player_count:]
+
+def _random_other_seats(seats, player_count, count, rng):
+    """
+    For each game, choose `count` (1 or 2) distinct seats other than
+    `seats`.  Returns a list of `count` arrays.
+    """
+    games = len(seats)
+    first = rng.integers(0, player_count - 1, games)
+    chosen = [first]
+    if count == 2:
+        second = rng.integers(0, player_count - 2, games)
+        second = second + (second >= first)
+        chosen.append(second)
+    return [c + (c >= seats) for c in chosen]
+
+def resolve_night(player_cards, rng, robber_steal_rate=1.0, troublemaker_swap_rate=1.0):
+    """
+    Apply the robber and troublemaker powers.
+    Returns (final_cards, robber_targets, troublemaker_targets).  Targets
+    are -1 where no power was used.
+    """
+    games, player_count = player_cards.shape
+    rows = np.arange(games)
+    final_cards = player_cards.copy()
+    robber_targets = np.full(games, -1, dtype=np.int64)
+    troublemaker_targets = np.full((games, 2), -1, dtype=np.int64)
+    robber_mask = (player_cards == WerewolfGame.CARD_ROBBER)
+    robber_seat = robber_mask.argmax(axis=1)
+    steal = robber_mask.any(axis=1) & (rng.random(games) < robber_steal_rate)
+    victim, = _random_other_seats(robber_seat, player_count, 1, rng)
+    g, r, v = rows[steal], robber_seat[steal], victim[steal]
+    final_cards[g, r] = final_cards[g, v]
+    final_cards[g, v] = WerewolfGame.CARD_ROBBER
+    robber_targets[steal] = v
+    if player_count >= 3:
+        tm_mask = (player_cards == WerewolfGame.CARD_TROUBLEMAKER)
+        tm_seat = tm_mask.argmax(axis=1)
+        swap = tm_mask.any(axis=1) & (rng.random(games) < troublemaker_swap_rate)
+        seat_a, seat_b = _random_other_seats(tm_seat, player_count, 2, rng)
+        g, a, b = rows[swap], seat_a[swap], seat_b[swap]
+        card_a = final_cards[g, a]
+        final_cards[g, a] = final_cards[g, b]
+        final_cards[g, b] = card_a
+        troublemaker_targets[swap, 0] = a
+        troublemaker_targets[swap, 1] = b
+    return final_cards, robber_targets, troublemaker_targets
+
+def random_votes(games, player_count, rng):
+    """
+    Each player votes for any player (including herself).
+    """
+    return rng.integers(0, player_count, (games, player_count))
+
+def tally_votes(final_cards, votes):
+    """
+    Determine which seats are eliminated.
+    Returns a boolean array of shape (games, player_count).
+    """
+    games, player_count = final_cards.shape
+    rows = np.arange(games)
+    flat = (votes + (rows * player_count)[:, None]).ravel()
+    counts = np.bincount(flat, minlength=games * player_count)
+    counts = counts.reshape(games, player_count)
+    top_score = counts.max(axis=1)
+    eliminated = (counts == top_score[:, None]) & (top_score[:, None] > 1)
+    hunter_mask = (final_cards == WerewolfGame.CARD_HUNTER)
+    hunter_seat = hunter_mask.argmax(axis=1)
+    hunter_shot = hunter_mask.any(axis=1) & eliminated[rows, hunter_seat]
+    victims = votes[rows, hunter_seat]
+    eliminated[rows[hunter_shot], victims[hunter_shot]] = True
+    return eliminated
+
+def determine_winners(final_cards, eliminated):
+    """
+    Return an array of `WINNER_*` codes, one per game.
+    """
+    wg = WerewolfGame
+
+    def eliminated_card(card):
+        return (eliminated & (final_cards == card)).any(axis=1)
+
+    elimination_count = eliminated.sum(axis=1)
+    werewolf_player = (final_cards == wg.CARD_WEREWOLF).any(axis=1)
+    minion_player = (final_cards == wg.CARD_MINION).any(axis=1)
+    werewolf_eliminated = eliminated_card(wg.CARD_WEREWOLF)
+    minion_eliminated = eliminated_card(wg.CARD_MINION)
+    tanner_win = eliminated_card(wg.CARD_TANNER)
+    village_win = (
+        werewolf_eliminated
+        | ((elimination_count == 0) & ~werewolf_player))
+    werewolf_win = (
+        (werewolf_player & ~werewolf_eliminated)
+        |
+        (~werewolf_player & minion_player & ~minion_eliminated & (elimination_count > 0))
+    ) & ~tanner_win
+    return np.select(
+        [village_win & tanner_win, village_win, tanner_win, werewolf_win],
+        [wg.WINNER_TANNER_AND_VILLAGE, wg.WINNER_VILLAGE, wg.WINNER_TANNER, wg.WINNER_WEREWOLVES],
+        default=wg.WINNER_NO_ONE)
+
+def simulate(player_count, roles, werewolves=2, games=100000, seed=None,
+        batch_size=100000, robber_steal_rate=1.0, troublemaker_swap_rate=1.0):
+    """
+    Simulate `games` games and return a :py:class:`SimulationResult`.
+    """
+    if player_count < 3:
+        raise ValueError("At least 3 players are required.")
+    rng = np.random.default_rng(seed)
+    winner_counts = dict((w, 0) for w in WINNERS)
+    remaining = games
+    while remaining > 0:
+        batch = min(batch_size, remaining)
+        remaining -= batch
+        player_cards, table_cards = deal_games(
+            batch, player_count, werewolves, roles, rng)
+        final_cards, _, _ = resolve_night(
+            player_cards,
+            rng,
+            robber_steal_rate=robber_steal_rate,
+            troublemaker_swap_rate=troublemaker_swap_rate)
+        votes = random_votes(batch, player_count, rng)
+        eliminated = tally_votes(final_cards, votes)
+        winners = determine_winners(final_cards, eliminated)
+        counts = np.bincount(winners, minlength=max(WINNERS) + 1)
+        for w in WINNERS:
+            winner_counts[w] += int(counts[w])
+    return SimulationResult(
+        player_count=player_count,
+        roles=frozenset(roles),
+        werewolves=werewolves,
+        games=games,
+        winner_counts=winner_counts)
+
+def win_rate_table(player_counts=range(3, 21), role_sets=None, werewolves=(1, 2), games=100000, seed=None):
+    """
+    Simulate every combination of player count, role set, and werewolf
+    count.  Returns a list of :py:class:`SimulationResult`.
+    """
+    if role_sets is None:
+        role_sets = list(generate_role_sets())
+    rng = np.random.default_rng(seed)
+    results = []
+    for player_count in player_counts:
+        for roles in role_sets:
+            for werewolf_count in werewolves:
+                result = simulate(
+                    player_count,
+                    roles,
+                    werewolves=werewolf_count,
+                    games=games,
+                    seed=rng.integers(0, 2**63 - 1))
+                results.append(result)
+    return results
+
+def format_win_rate_table(results):
+    """
+    Format simulation results as tab-separated text.
+    """
+    lines = []
+    header = ["players", "werewolves", "roles"]
+    header.extend(_winner_names[w] for w in WINNERS)
+    lines.append('\t'.join(header))
+    for result in results:
+        role_names = sorted(WerewolfGame.get_card_name(c) for c in result.roles)
+        row = [str(result.player_count), str(result.werewolves), ','.join(role_names)]
+        win_rates = result.win_rates
+        row.extend("{:.4f}".format(win_rates[w]) for w in WINNERS)
+        lines.append('\t'.join(row))
+    return '\n'.join(lines)
+
+def scalar_winners(player_cards, table_cards, robber_targets, troublemaker_targets, votes):
+    """
+    Resolve the same deals, night actions, and votes with the scalar
+    :py:class:`WerewolfGame` engine.  Returns an array of `WINNER_*` codes.
+    """
+    from txwerewolves.game import HandledWerewolfGame
+
+    class ScalarGame(WerewolfGame):
+        votes = None
+        vote_tally = None
+        cast_vote = HandledWerewolfGame.cast_vote
+        count_votes = HandledWerewolfGame.count_votes
+
+    games, player_count = player_cards.shape
+    players = ["player{:02d}".format(n) for n in range(player_count)]
+    winners = np.empty(games, dtype=np.int64)
+    for n in range(games):
+        dealt = [int(c) for c in player_cards[n]]
+        game = ScalarGame()
+        game.add_players(players)
+        game.deal_cards(0, frozenset())
+        game._player_cards = dict(zip(players, dealt))
+        game._new_player_cards = dict(game._player_cards)
+        game._table_cards = [int(c) for c in table_cards[n]]
+        game._new_table_cards = list(game._table_cards)
+        game._active_roles = frozenset(dealt + game._table_cards)
+        game._card_players = game._build_card_index(game._player_cards)
+        game._new_card_players = game._build_card_index(game._new_player_cards)
+        phase = None
+        while phase != "Daybreak":
+            game.advance_phase()
+            phase = game.query_phase()
+            if phase == "Robber Phase" and robber_targets[n] >= 0:
+                game.robber_steal_card(players[robber_targets[n]])
+            elif phase == "Troublemaker Phase" and troublemaker_targets[n, 0] >= 0:
+                seat_a, seat_b = troublemaker_targets[n]
+                game.troublemaker_switch_cards(players[seat_a], players[seat_b])
+        game.votes = {}
+        game.vote_tally = VoteTally.make_instance(game.query_hunter())
+        for voter, target in zip(players, votes[n]):
+            game.cast_vote(voter, players[target])
+        game.count_votes()
+        winners[n] = game.query_post_game_results().winner
+    return winners
+
+def verify_against_scalar(player_count, roles, werewolves=2, games=1000, seed=None):
+    """
+    Simulate `games` games with both engines and return the number of
+    games whose winners disagree.
+    """
+    rng = np.random.default_rng(seed)
+    player_cards, table_cards = deal_games(games, player_count, werewolves, roles, rng)
+    final_cards, robber_targets, troublemaker_targets = resolve_night(player_cards, rng)
+    votes = random_votes(games, player_count, rng)
+    eliminated = tally_votes(final_cards, votes)
+    winners = determine_winners(final_cards, eliminated)
+    expected = scalar_winners(
+        player_cards, table_cards, robber_targets, troublemaker_targets, votes)
+    return int((winners != expected).sum())
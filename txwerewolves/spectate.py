@@ -0,0 +1,404 @@
+"""
+Read-only spectators for running games.
+
+Spectators are kept in `session_entry.spectators`, not in the session
+members, so they never hold up the game's wait list.  They see the public
+state of the game (the phase, the players, the cards used, and the results
+once the game is over) and the chat buffer.
+
+Views are rendered once per session and journal sequence number and shared:
+every terminal spectator of a session with the same terminal size is drawn
+the same parsed frame, and every web spectator is sent the same serialized
+event.
+"""
+
+from __future__ import (
+    absolute_import,
+    division,
+    print_function,
+)
+import collections
+import json
+import weakref
+from txwerewolves.apps import (
+    TerminalAppBase,
+    WebAppBase,
+)
+from txwerewolves.game import HandledWerewolfGame
+from txwerewolves import graphics_chars as gchars
+from txwerewolves.interfaces import (
+    ITerminalApplication,
+    IWebApplication,
+)
+from txwerewolves.screen import parse_frame
+from txwerewolves import (
+    session,
+    users,
+)
+from txwerewolves.utils import wrap_paras
+from txwerewolves.werewolf import WerewolfGame
+from zope.interface.declarations import implementer
+
+# (session ID, view) -> (journal sequence number, rendered view)
+_view_cache = {}
+_render_stats = collections.Counter()
+
+_PHASE_TITLES = {
+    HandledWerewolfGame.PHASE_TWILIGHT: "Twilight",
+    HandledWerewolfGame.PHASE_WEREWOLVES: "Werewolf Phase",
+    HandledWerewolfGame.PHASE_MINION: "Minion Phase",
+    HandledWerewolfGame.PHASE_SEER: "Seer Phase",
+    HandledWerewolfGame.PHASE_ROBBER: "Robber Phase",
+    HandledWerewolfGame.PHASE_TROUBLEMAKER: "Troublemaker Phase",
+    HandledWerewolfGame.PHASE_INSOMNIAC: "Insomniac Phase",
+    HandledWerewolfGame.PHASE_DAYBREAK: "Daybreak",
+    HandledWerewolfGame.PHASE_ENDGAME: "Endgame",
+}
+_WINNER_TEXT = {
+    WerewolfGame.WINNER_VILLAGE: "A Village Victory!",
+    WerewolfGame.WINNER_WEREWOLVES: "A Werewolf Victory!",
+    WerewolfGame.WINNER_TANNER: "A Tanner Victory!",
+    WerewolfGame.WINNER_TANNER_AND_VILLAGE: "A Tanner and Village Victory!",
+    WerewolfGame.WINNER_NO_ONE: "No One Wins!",
+}
+
+
+def generate_watchable_sessions():
+    """
+    Generate the IDs of the sessions whose games have started.
+    """
+    fltr = lambda e: e.appstate is not None
+    for entry in session.generate_entries(fltr):
+        yield entry.session_id
+
+def attach_spectator(session_id, user_id):
+    """
+    Add `user_id` to the spectators of a session.  Returns False if the
+    session has no game to watch.
+    """
+    entry = session.get_entry(session_id)
+    if entry is None or entry.appstate is None:
+        return False
+    entry.spectators.add(user_id)
+    users.get_user_entry(user_id).spectating_id = session_id
+    return True
+
+def detach_spectator(user_id):
+    """
+    Stop `user_id` watching a session.
+    """
+    user_entry = users.get_user_entry(user_id)
+    session_id = user_entry.spectating_id
+    user_entry.spectating_id = None
+    entry = session.get_entry(session_id)
+    if entry is not None:
+        entry.spectators.discard(user_id)
+        if len(entry.spectators) > 0:
+            return
+    forget_session(session_id)
+
+def forget_session(session_id):
+    """
+    Drop the cached views of a session.
+    """
+    global _view_cache
+    for key in list(_view_cache.keys()):
+        if key[0] == session_id:
+            del _view_cache[key]
+
+def get_render_stats():
+    """
+    Return how many views were `rendered` and how many were served from the
+    cache (`shared`).
+    """
+    global _render_stats
+    stats = dict.fromkeys(['rendered', 'shared'], 0)
+    stats.update(_render_stats)
+    return stats
+
+def _get_view(session_id, view, render):
+    """
+    Return the view of a session, rendering it only if the session journal
+    has changed since it was last rendered.  Returns None if there is no
+    game to watch.
+    """
+    global _view_cache
+    global _render_stats
+    entry = session.get_entry(session_id)
+    if entry is None or entry.appstate is None:
+        return None
+    version = entry.journal.last_seq
+    key = (session_id, view)
+    cached = _view_cache.get(key)
+    if cached is not None and cached[0] == version:
+        _render_stats['shared'] += 1
+        return cached[1]
+    _render_stats['rendered'] += 1
+    rendered = render(entry)
+    _view_cache[key] = (version, rendered)
+    return rendered
+
+def get_terminal_frame(session_id, term_size):
+    """
+    Return the :py:class:`~txwerewolves.screen.Frame` for terminals of
+    `term_size`.  It is parsed once and blitted to every spectator.
+    """
+    tw, th = term_size
+    return _get_view(
+        session_id,
+        ('terminal', tw, th),
+        lambda entry: parse_frame(render_terminal_frame(entry, term_size), term_size))
+
+def get_web_event(session_id):
+    """
+    Return the serialized event for web spectators.
+    """
+    return _get_view(session_id, ('web',), render_web_event)
+
+def _public_state(entry):
+    """
+    Return the public state of a session's game as a dictionary.
+    """
+    game = entry.appstate
+    card_counts = collections.Counter()
+    for card in game.card_list or []:
+        card_counts[WerewolfGame.get_card_name(card)] += 1
+    results = None
+    if game.phase == game.PHASE_ENDGAME:
+        eliminated = set(game.eliminated)
+        votes = game.votes
+        results = {
+            'winner-text': _WINNER_TEXT.get(game.post_game_results.winner, ""),
+            'voting-table': [
+                (player, player in eliminated, votes.get(player, "N/A"))
+                for player in sorted(entry.members)],
+        }
+    return {
+        'session': entry.session_id,
+        'phase': _PHASE_TITLES.get(game.phase, "Waiting for the deal"),
+        'players': sorted(entry.members),
+        'cards': sorted(card_counts.items()),
+        'chat': list(entry.chat_buf),
+        'results': results,
+    }
+
+def render_web_event(entry):
+    """
+    Serialize the web spectator view of a session.
+    """
+    return json.dumps({'spectate': _public_state(entry)})
+
+
+class _Canvas(object):
+    """
+    A grid of characters a frame is drawn on before it is sent.
+    """
+    width = 0
+    height = 0
+    rows = None
+
+    @classmethod
+    def make_instance(klass, width, height):
+        instance = klass()
+        instance.width = width
+        instance.height = height
+        instance.rows = [[u" "] * width for n in range(height)]
+        return instance
+
+    def put(self, col, row, text):
+        if row < 0 or row >= self.height:
+            return
+        cells = self.rows[row]
+        for n, char in enumerate(text):
+            pos = col + n
+            if 0 <= pos < self.width:
+                cells[pos] = char
+
+    def center(self, row, text):
+        self.put((self.width - len(text)) // 2, row, text)
+
+    def to_bytes(self):
+        parts = []
+        for n, cells in enumerate(self.rows):
+            line = u"".join(cells).rstrip()
+            parts.append(b"\x1b[%d;1H" % (n + 1))
+            parts.append(line.encode('utf-8'))
+        return b"".join(parts)
+
+
+def render_terminal_frame(entry, term_size):
+    """
+    Draw the terminal spectator view of a session.  Returns bytes that
+    position the cursor for each line, ready to be written to a reset
+    terminal.
+    """
+    tw, th = term_size
+    state = _public_state(entry)
+    canvas = _Canvas.make_instance(tw, th)
+    canvas.put(0, 0, gchars.DBORDER_UP_LEFT + gchars.DBORDER_HORIZONTAL * (tw - 2) + gchars.DBORDER_UP_RIGHT)
+    for row in range(1, th - 1):
+        canvas.put(0, row, gchars.DBORDER_VERTICAL)
+        canvas.put(tw - 1, row, gchars.DBORDER_VERTICAL)
+    canvas.put(0, th - 1, gchars.DBORDER_DOWN_LEFT + gchars.DBORDER_HORIZONTAL * (tw - 2) + gchars.DBORDER_DOWN_RIGHT)
+    canvas.center(0, u" Werewolves! ")
+    canvas.center(1, u"Watching session {}".format(state['session']))
+    width = tw - 4
+    lines = [u"Phase: {}".format(state['phase'])]
+    lines.extend(wrap_paras(u"Players: {}".format(u", ".join(state['players'])), width))
+    cards = [u"{} x{}".format(name, count) for name, count in state['cards']]
+    lines.extend(wrap_paras(u"Cards: {}".format(u", ".join(cards)), width))
+    results = state['results']
+    if results is not None:
+        lines.append(u"")
+        lines.append(results['winner-text'])
+        for player, eliminated, voted_for in results['voting-table']:
+            mark = u" (eliminated)" if eliminated else u""
+            lines.append(u"{}{} voted for {}".format(player, mark, voted_for))
+    row = 3
+    for line in lines:
+        canvas.put(2, row, line[:width])
+        row += 1
+    # Chat fills the space left above the key help, newest message last.
+    bottom = th - 3
+    chat_lines = []
+    for sender, msg in state['chat']:
+        chat_lines.extend(wrap_paras(u"{}: {}".format(sender, msg), width))
+    room = bottom - row - 1
+    if room > 0 and len(chat_lines) > 0:
+        chat_lines = chat_lines[-room:]
+        canvas.put(2, bottom - len(chat_lines), gchars.HORIZONTAL * 2 + u" Chat " + gchars.HORIZONTAL * 2)
+        for n, line in enumerate(chat_lines):
+            canvas.put(2, bottom - len(chat_lines) + 1 + n, line[:width])
+    canvas.center(th - 2, u"Press q to stop watching.")
+    return canvas.to_bytes()
+
+
+@implementer(ITerminalApplication)
+class SSHSpectatorProtocol(TerminalAppBase):
+    session_id = None
+
+    @classmethod
+    def make_instance(klass, reactor, terminal, user_id, parent, session_id):
+        instance = klass()
+        instance.reactor = reactor
+        instance.terminal = terminal
+        instance.user_id = user_id
+        instance.parent = weakref.ref(parent)
+        instance.session_id = session_id
+        return instance
+
+    def produce_compatible_application(self, iface, parent):
+        """
+        Produce an application with state similar to this one, but compatible
+        with interface `iface`.
+        """
+        if iface.providedBy(self):
+            return self
+        if iface == IWebApplication:
+            return WebSpectatorProtocol.make_instance(
+                self.reactor, self.user_id, parent, self.session_id)
+        raise Exception("Unable to produce compatible application with interface {}.".format(iface))
+
+    @property
+    def appstate(self):
+        entry = session.get_entry(self.session_id)
+        if entry is None:
+            return None
+        return entry.appstate
+
+    def handle_input(self, key_id, modifier):
+        if key_id == 'q':
+            self._stop_watching()
+
+    def receive_signal(self, signal):
+        signame, value = signal
+        if signame in ('next-phase', 'chat-message', 'reset'):
+            self.update_display()
+        elif signame == 'shutdown':
+            self._stop_watching()
+
+    def update_display(self):
+        frame = get_terminal_frame(self.session_id, self.term_size)
+        if frame is None:
+            self._stop_watching()
+            return
+        terminal = self.terminal
+        terminal.reset()
+        terminal.blit(frame)
+        tw, th = self.term_size
+        terminal.cursorPosition(0, th - 1)
+
+    def _stop_watching(self):
+        user_id = self.user_id
+        detach_spectator(user_id)
+        user_entry = users.get_user_entry(user_id)
+        user_entry.app_protocol = None
+        user_entry.avatar.init_app_protocol()
+
+
+@implementer(IWebApplication)
+class WebSpectatorProtocol(WebAppBase):
+    resource = "/spectate"
+    session_id = None
+
+    @classmethod
+    def make_instance(klass, reactor, user_id, parent, session_id):
+        instance = klass()
+        instance.reactor = reactor
+        instance.user_id = user_id
+        instance.parent = weakref.ref(parent)
+        instance.session_id = session_id
+        instance.handlers = {0: instance._stop_watching}
+        return instance
+
+    def produce_compatible_application(self, iface, parent):
+        """
+        Produce an application with state similar to this one, but compatible
+        with interface `iface`.
+        """
+        if iface.providedBy(self):
+            return self
+        if iface == ITerminalApplication:
+            app = SSHSpectatorProtocol.make_instance(
+                self.reactor, parent.terminal, self.user_id, parent, self.session_id)
+            app.term_size = parent.term_size
+            return app
+        raise Exception("Unable to produce compatible application with interface {}.".format(iface))
+
+    @property
+    def appstate(self):
+        entry = session.get_entry(self.session_id)
+        if entry is None:
+            return None
+        return entry.appstate
+
+    def request_update(self, key):
+        """
+        Part of web application interface.
+        Update the client based on the key provided.
+        """
+        if key == 'request-all':
+            self._update_client()
+
+    def receive_signal(self, signal):
+        signame, value = signal
+        if signame in ('next-phase', 'chat-message', 'reset'):
+            self._update_client()
+        elif signame == 'shutdown':
+            self._stop_watching()
+
+    def _update_client(self):
+        event = get_web_event(self.session_id)
+        if event is None:
+            self._stop_watching()
+            return
+        self.avatar.send_event_to_client(event)
+
+    def _stop_watching(self):
+        user_id = self.user_id
+        detach_spectator(user_id)
+        user_entry = users.get_user_entry(user_id)
+        user_entry.app_protocol = None
+        avatar = user_entry.avatar
+        avatar.init_app_protocol()
+        avatar.install_application(user_entry.app_protocol)
@@ -0,0 +1,85 @@
+$(document).ready(function() {
+    var source = new EventSource('/subscribe');
+    source.onmessage = function(event) {
+        var o = $.parseJSON(event.data);
+        if('spectate' in o)
+        {
+            var view = o['spectate'];
+            $("#session-id").text(view['session']);
+            $("#phase").text(view['phase']);
+            $("#players").text("Players: " + view['players'].join(", "));
+            var tbl = $("#cards-table");
+            tbl.find("tr:gt(0)").remove();
+            for(var i=0; i < view['cards'].length; i++)
+            {
+                var row = view['cards'][i];
+                $("<tr>")
+                    .append($("<td>").text(row[0]))
+                    .append($("<td>").text("" + row[1]))
+                    .appendTo(tbl)
+                ;
+            }
+            var chat = $("#chat-output");
+            chat.empty();
+            for(var i=0; i < view['chat'].length; i++)
+            {
+                var entry = view['chat'][i];
+                var li = $("<li>");
+                $("<span>")
+                    .addClass("badge")
+                    .addClass("badge-primary")
+                    .text(entry[0] + ": ")
+                    .appendTo(li)
+                ;
+                $("<span>")
+                    .text(entry[1])
+                    .appendTo(li)
+                ;
+                li.prependTo(chat);
+            }
+            var results = view['results'];
+            if(results === null)
+            {
+                $("#results").hide();
+            }
+            else
+            {
+                $("#winner-heading").text(results['winner-text']);
+                var vote_tbl = $("#voting-results");
+                vote_tbl.find("tr:gt(0)").remove();
+                for(var i=0; i < results['voting-table'].length; i++)
+                {
+                    var row = results['voting-table'][i];
+                    $("<tr>")
+                        .append($("<td>").text(row[0]))
+                        .append($("<td>").text(row[1] ? "Y": ""))
+                        .append($("<td>").text(row[2]))
+                        .appendTo(vote_tbl)
+                    ;
+                }
+                $("#results").show();
+            }
+        }
+        if('install-app' in o)
+        {
+            var resource = o['install-app'];
+            var pathname = window.location.pathname;
+            var new_pathname = pathname.substr(0, pathname.lastIndexOf('/')) + resource;
+            window.location.replace(new_pathname);
+        }
+        if('shut-down' in o)
+        {
+            var pathname = window.location.pathname;
+            var new_pathname = pathname.substr(0, pathname.lastIndexOf('/')) + 'expire';
+            window.location.replace(new_pathname);
+        }
+    };
+
+    setTimeout(function(){$.get("./spectate/request-all");}, 0);
+
+    $("#stop-watching").click(function(e){
+        e.preventDefault();
+        $.post("./action", {'command': 0});
+    })
+    ;
+});
@@ -1,5 +1,38 @@
 
 $(document).ready(function() {
+    var countdown = null;
+
+    function start_countdown(seconds)
+    {
+        // Count down locally from the time remaining sent with the phase.
+        if(countdown !== null)
+        {
+            clearInterval(countdown);
+            countdown = null;
+        }
+        var elm = $("#time-remaining");
+        if(seconds === null)
+        {
+            elm.hide();
+            return;
+        }
+        var deadline = Date.now() + seconds * 1000;
+        function tick()
+        {
+            var left = Math.max(0, Math.ceil((deadline - Date.now()) / 1000));
+            var secs = left % 60;
+            elm.text("Time remaining: " + Math.floor(left / 60) + ":" + (secs < 10 ? "0" : "") + secs);
+            if(left == 0 && countdown !== null)
+            {
+                clearInterval(countdown);
+                countdown = null;
+            }
+        }
+        tick();
+        elm.show();
+        countdown = setInterval(tick, 1000);
+    }
+
     var source = new EventSource('/subscribe');
     source.onmessage = function(event) {
         console.log(event.data);
@@ -73,6 +106,10 @@ $(document).ready(function() {
                 .appendTo(info_block)
             ; 
         }
+        if('time-remaining' in o)
+        {
+            start_countdown(o['time-remaining']);
+        }
         if('actions' in o)
         {
             $("#actions").empty();
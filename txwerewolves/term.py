@@ -8,10 +8,13 @@ from txwerewolves.interfaces import (
     ITerminalApplication,
 )
 from txwerewolves import (
+    frames,
     lobby,
     session,
     users,
 )
+from txwerewolves.profiles import LinkMonitor
+from txwerewolves.screen import ScreenBuffer
 from twisted.conch.recvline import HistoricRecvLine
 from twisted.conch.insults.insults import TerminalProtocol
 from twisted.python import log
@@ -31,12 +34,46 @@ def make_terminal_adapter(reactor, user_id):
 class TerminalAdapterProtocol(TerminalProtocol):
     CTRL_D = '\x04'
     CTRL_X = '\x18'
+    connected = False
+    link_monitor = None
     reactor = None
-    term_size = (80, 24)
+    terminal = None
     user_id = None
+    _term_size = (80, 24)
+
+    @property
+    def term_size(self):
+        return self._term_size
+
+    @term_size.setter
+    def term_size(self, size):
+        old_size = self._term_size
+        self._term_size = size
+        terminal = self.terminal
+        if terminal is not None and size != old_size:
+            terminal.resize(*size)
+            frames.release_size(old_size)
+            frames.acquire_size(size)
+
+    def makeConnection(self, terminal):
+        """
+        Applications draw into a screen buffer that sends the client only
+        what changed.
+        """
+        screen = ScreenBuffer.make_instance(terminal, self.reactor, self.term_size)
+        frames.acquire_size(self.term_size)
+        TerminalProtocol.makeConnection(self, screen)
 
     def connectionMade(self):
         TerminalProtocol.connectionMade(self)
+        self.connected = True
+        screen = self.terminal
+        user_entry = users.get_user_entry(self.user_id)
+        if user_entry is not None:
+            screen.set_profile_override(user_entry.render_profile)
+        self.link_monitor = LinkMonitor.make_instance(
+            self.reactor, screen.terminal, screen.set_auto_profile)
+        self.link_monitor.start()
         self.init_app_protocol()
 
     def keystrokeReceived(self, key_id, modifier):
@@ -95,15 +132,14 @@ class TerminalAdapterProtocol(TerminalProtocol):
         app_protocol.term_size = self.term_size
         self.app_protocol = app_protocol
         app_protocol.parent = weakref.ref(self)
-
-        def _request_refresh(terminal, app_protocol):
-            terminal.reset()
-            app_protocol.update_display()
-
-        self.reactor.callLater(0, _request_refresh, self.terminal, app_protocol)
+        self.terminal.scheduler.request('display', app_protocol.update_display)
 
     def connectionLost(self, reason):
-        pass
+        self.connected = False
+        frames.release_size(self.term_size)
+        self.terminal.scheduler.stop()
+        if self.link_monitor is not None:
+            self.link_monitor.stop()
 
     def install_application(self, proto):
         if not ITerminalApplication.providedBy(proto):
@@ -111,7 +147,7 @@ class TerminalAdapterProtocol(TerminalProtocol):
                 ITerminalApplication, parent=self)
         self.app_protocol = proto
         self.terminal.reset()
-        self.reactor.callLater(0, proto.update_display)
+        self.terminal.scheduler.request('display', proto.update_display)
         user_entry = users.get_user_entry(self.user_id)
         user_entry.app_protocol = proto
 
@@ -11,6 +11,9 @@ class UserRegistryEntry(object):
     app_protocol = attr.attrib(default=None)
     invited_id = attr.attrib(default=None)
     joined_id = attr.attrib(default=None)
+    spectating_id = attr.attrib(default=None)
+    # The terminal rendering profile the user chose, or None for automatic.
+    render_profile = attr.attrib(default=None)
 
 
 def get_user_ids():
@@ -48,6 +51,13 @@ def register_user(user_id):
     _user_registry[user_id] = entry
     return entry
 
+def unregister_user(user_id):
+    """
+    Remove a user record, if there is one.
+    """
+    global _user_registry
+    _user_registry.pop(user_id, None)
+
 def get_user_entry(user_id):
     """
     Get a registered user entry.
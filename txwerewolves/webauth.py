@@ -73,6 +73,8 @@ class WerewolfWebCredChecker(object):
 class WebAvatar(object):
     user_id = None
     reactor = None
+    # Events kept while no client is connected.
+    event_buffer_size = 20
     _event_buffer = None
     _event_source = None
 
@@ -81,10 +83,17 @@ class WebAvatar(object):
         instance = klass()
         instance.user_id = user_id 
         instance.reactor = reactor
-        instance._event_buffer = collections.deque([], 20)
+        instance._event_buffer = collections.deque([], klass.event_buffer_size)
         instance.init_app_protocol()
         return instance
 
+    @property
+    def connected(self):
+        """
+        True if a client is listening for events.
+        """
+        return self._event_source is not None
+
     @property
     def application(self):
         user_id = self.user_id
@@ -135,14 +144,29 @@ class WebAvatar(object):
         event_source.setHeader(b'content-type', b'text/event-stream')
         self._event_source = event_source
         log.msg("Connected event source to avatar.")
+        app_protocol = self.application
+        if IWebApplication.providedBy(app_protocol):
+            # Applications that keep a journal replace the buffered events
+            # with just the ones the client missed.
+            app_protocol.request_update('catch-up')
         event_buffer = self._event_buffer
         while len(event_buffer) > 0:
             event = event_buffer.pop()
             self.send_event_to_client(event)
 
+    def discard_buffered_events(self):
+        """
+        Forget the events buffered while no client was connected.  Returns
+        them, oldest first.
+        """
+        event_buffer = self._event_buffer
+        events = list(reversed(event_buffer))
+        event_buffer.clear()
+        return events
+
     def _reset_event_source(self, data=None):
         self._event_source = None
-        self._event_buffer = collections.deque([], 20)
+        self._event_buffer = collections.deque([], self.event_buffer_size)
         if data is not None:
             self._event_buffer.appendleft(data)
 
@@ -64,7 +64,7 @@ class WebResources(object):
         instance.reactor = reactor
         instance.portal = portal
         instance._html_files = {}
-        html_keys = ['login', 'lobby', 'werewolves']
+        html_keys = ['login', 'lobby', 'werewolves', 'spectate']
         for key in html_keys:
             instance._load_html(key)
         return instance
@@ -115,9 +115,7 @@ class WebResources(object):
         session_id = user_entry.joined_id or user_entry.invited_id
         if session_id is None:
             return
-        session_entry = session.get_entry(session_id)
-        chat_buf = session_entry.chat_buf
-        chat_buf.append((user_id, message))
+        session.post_chat_message(session_id, user_id, message)
         signal = ('chat-message', {'sender': user_id}) 
         session.send_signal_to_members(session_id, signal, include_invited=True)
 
@@ -136,6 +134,21 @@ class WebResources(object):
         avatar = get_avatar(request)
         avatar.request_update_from_app(update)
 
+    @app.route('/spectate')
+    def spectate(self, request):
+        if not check_authenticated(request):
+            return
+        return self._html_files['spectate']
+
+    @app.route('/spectate/<update>')
+    def spectate_update_requests(self, request, update):
+        if not check_authenticated(request):
+            return
+        if update != 'request-all':
+            return NoResource()
+        avatar = get_avatar(request)
+        avatar.request_update_from_app(update)
+
     @app.route('/lobby')
     def lobby(self, request):
         if not check_authenticated(request):
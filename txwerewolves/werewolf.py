@@ -1,9 +1,14 @@
 
 from __future__ import print_function
+import collections
 import itertools
 import random
 import attr
 from automat import MethodicalMachine
+from txwerewolves.compact import (
+    CardMap,
+    PlayerIndex,
+)
 
 
 @attr.attrs
@@ -21,6 +26,27 @@ class PhaseInfo(object):
     desc = attr.attrib()
 
 
+@attr.attrs
+class ReplayLog(object):
+    """
+    The seed of a game's random number generator followed by the machine
+    inputs that changed the game state, in order.  Each entry is a tuple of
+    an opcode and the input arguments.
+    """
+    ADD_PLAYERS = "P"
+    DEAL_CARDS = "D"
+    QUERY_CARDS = "Q"
+    ENTER_PHASE = "A"
+    SEER_VIEW_PLAYER_CARD = "S"
+    SEER_VIEW_TABLE_CARDS = "T"
+    ROBBER_STEAL_CARD = "R"
+    TROUBLEMAKER_SWITCH_CARDS = "M"
+    ELIMINATE_PLAYERS = "E"
+
+    seed = attr.attrib()
+    entries = attr.attrib(default=attr.Factory(list))
+
+
 @attr.attrs
 class PostGameInfo(object):
     winner = attr.attrib()
@@ -30,6 +56,106 @@ class PostGameInfo(object):
     orig_table_cards = attr.attrib()
 
 
+class VoteTally(object):
+    """
+    A running tally of the daybreak vote.  Each vote updates the counts,
+    the current leaders, and the hunter's target, so the result of the vote
+    is known as soon as the last vote is cast.
+    """
+    hunter = None
+    votes = None
+    counts = None
+    top_score = 0
+    _by_count = None
+
+    @classmethod
+    def make_instance(klass, hunter=None):
+        instance = klass()
+        instance.hunter = hunter
+        instance.votes = {}
+        instance.counts = {}
+        # Players with each vote count.
+        instance._by_count = {}
+        return instance
+
+    def cast(self, voter, player):
+        """
+        Record that `voter` votes for `player`, replacing any earlier vote.
+        """
+        votes = self.votes
+        previous = votes.get(voter)
+        if previous == player and voter in votes:
+            return
+        if voter in votes:
+            self._move(previous, -1)
+        votes[voter] = player
+        self._move(player, 1)
+
+    def _move(self, player, delta):
+        counts = self.counts
+        by_count = self._by_count
+        count = counts.get(player, 0)
+        if count > 0:
+            holders = by_count[count]
+            holders.discard(player)
+            if len(holders) == 0:
+                del by_count[count]
+        count += delta
+        if count > 0:
+            counts[player] = count
+            by_count.setdefault(count, set()).add(player)
+        else:
+            del counts[player]
+        if count > self.top_score:
+            self.top_score = count
+        elif self.top_score not in by_count:
+            self.top_score = max(count, 0)
+
+    @property
+    def hunter_target(self):
+        """
+        The player the hunter voted for, or None.
+        """
+        return self.votes.get(self.hunter)
+
+    def leaders(self):
+        """
+        Return the sorted list of players who would be voted out now, not
+        counting the hunter's target.  Players need more than one vote.
+        """
+        if self.top_score < 2:
+            return []
+        return sorted(self._by_count[self.top_score])
+
+    def eliminated(self):
+        """
+        Return the sorted list of players eliminated if voting ended now.
+        This is the same set of players `WerewolfGame.tally_votes()` would
+        return for the same votes.
+        """
+        leaders = self.leaders()
+        hunter = self.hunter
+        if hunter in leaders:
+            target = self.hunter_target
+            if target is not None and target not in leaders:
+                leaders.append(target)
+                leaders.sort()
+        return leaders
+
+
+@attr.attrs
+class PhasePipeline(object):
+    """
+    The night phases compiled for one set of cards in play.  `schedule` is
+    the tags of the phases that will be played, ending with daybreak.
+    `next_tags` maps the tag of any phase (or None, before the night) to the
+    tag of the next phase that will be played.
+    """
+    roles = attr.attrib()
+    schedule = attr.attrib()
+    next_tags = attr.attrib()
+
+
 class WerewolfGame(object):
 
     CARD_WEREWOLF = 0
@@ -64,6 +190,110 @@ class WerewolfGame(object):
     WINNER_TANNER = 3
     WINNER_TANNER_AND_VILLAGE = 4
 
+    # -----
+    # Rules
+    # -----
+
+    @classmethod
+    def deal_deck(klass, rng, player_count, werewolf_count, roles):
+        """
+        Build and shuffle the deck for a game using `rng`.  The first
+        `player_count` cards are dealt to the players in order, and the
+        last 3 cards go to the table.
+        """
+        role_list = sorted(roles)
+        total_cards = player_count + 3
+        deck = []
+        deck.extend([klass.CARD_WEREWOLF] * werewolf_count)
+        rng.shuffle(role_list)
+        deck.extend(role_list)
+        additional_cards = total_cards - len(deck)
+        if additional_cards > 0:
+            deck.extend([klass.CARD_VILLAGER] * additional_cards)
+        deck = deck[:total_cards]
+        rng.shuffle(deck)
+        return deck
+
+    @classmethod
+    def tally_votes(klass, votes, hunter=None):
+        """
+        Given a mapping of voters to the players they voted for, return the
+        list of players eliminated.  Players with the most votes are
+        eliminated if they have more than one vote.  If the `hunter` is
+        eliminated, the player the hunter voted for is eliminated, too.
+        """
+        tally = collections.Counter()
+        hunter_victim = None
+        for voter, player in votes.items():
+            tally[player] += 1
+            if voter == hunter:
+                hunter_victim = player
+        most_votes = []
+        top_score = 0
+        for player, count in tally.most_common():
+            if count == 1:
+                break
+            if count < top_score:
+                break
+            top_score = count
+            most_votes.append(player)
+        if hunter in most_votes and hunter_victim is not None:
+            most_votes.append(hunter_victim)
+            most_votes = list(set(most_votes))
+            most_votes.sort()
+        return most_votes
+
+    @classmethod
+    def decide_winner(klass, eliminated_cards, player_cards):
+        """
+        Return the `WINNER_*` constant for a game where the players holding
+        `eliminated_cards` were eliminated and `player_cards` are the cards
+        the players held at the end of the night.
+        """
+        eliminated = set(eliminated_cards)
+        player_cards = frozenset(player_cards)
+        werewolf_player = klass.CARD_WEREWOLF in player_cards
+        minion_player = klass.CARD_MINION in player_cards
+        tanner_win = klass.CARD_TANNER in eliminated
+        village_win = (
+            (klass.CARD_WEREWOLF in eliminated)
+            or
+            ((len(eliminated) == 0) and (not werewolf_player))
+        )
+        werewolf_win = (
+            (werewolf_player and (not klass.CARD_WEREWOLF in eliminated))
+            or 
+            ((not werewolf_player) and minion_player and (not klass.CARD_MINION in eliminated) and len(eliminated) > 0)
+        ) and (not tanner_win)
+        if village_win and tanner_win:
+            return klass.WINNER_TANNER_AND_VILLAGE
+        elif village_win:
+            return klass.WINNER_VILLAGE
+        elif tanner_win:
+            return klass.WINNER_TANNER
+        elif werewolf_win:
+            return klass.WINNER_WEREWOLVES
+        else:
+            return klass.WINNER_NO_ONE
+
+    # When set, the card-to-players indices are checked against the card
+    # assignments every time the cards change.
+    check_card_index = False
+    # When set, players are numbered once in `add_players` and card
+    # assignments are stored in byte buffers rather than dicts.
+    compact_state = False
+    # The seed for the game's random number generator.  A seed is chosen
+    # when the generator is first needed if one has not been set.
+    seed = None
+    # While set, the `handle_*` event handlers are not called.
+    replaying = False
+    _rng = None
+    _replay_log = None
+    _phase_tag = None
+    _pipeline = None
+    # Compiled phase pipelines, by class and set of cards in play.
+    _pipelines = {}
+
     # ====================
     # Finite state machine
     # ====================
@@ -88,6 +318,8 @@ class WerewolfGame(object):
     TOKEN_DAYBREAK = "daybreak"
     TOKEN_ENDGAME = "endgame"
 
+    TAG_DAYBREAK = "daybreak"
+
     @_machine.state(serialized=TOKEN_HAVE_PLAYERS)
     def have_players(self):
         """
@@ -179,6 +411,11 @@ class WerewolfGame(object):
     # ----------------------------------------------
     # Game-specific information for the night phases
     # ----------------------------------------------
+    # The night phases, in the order they are played.  The `enter_XXX_phase`
+    # inputs, `_set_XXX_phase` outputs, phase transitions and event handlers
+    # are generated from this table and `power_activated_phases` when the
+    # class body runs.  A role's own powers still need their inputs, outputs
+    # and transitions written out below.
     night_phases = [
         PhaseInfo(
             tag="werewolf",
@@ -221,22 +458,27 @@ class WerewolfGame(object):
         PhaseInfo(
             tag="seer_power_activated",
             phase=seer_power_activated,
-            card=None,
+            card=CARD_SEER,
             name="Seer Phase",
             desc=None),
         PhaseInfo(
             tag="robber_power_activated",
             phase=robber_power_activated,
-            card=None,
+            card=CARD_ROBBER,
             name="Robber Phase",
             desc=None),
         PhaseInfo(
             tag="troublemaker_power_activated",
             phase=troublemaker_power_activated,
-            card=None,
+            card=CARD_TROUBLEMAKER,
             name="Troublemaker Phase",
             desc=None),
     ]
+    # The night phases games of this class play.  Subclasses may drop
+    # phases, but the transitions above only run forward through
+    # `night_phases`, so they can't add or reorder them.
+    phase_table = tuple(night_phases)
+    _machine_phase_tags = tuple(info.tag for info in night_phases)
 
     # --------------
     # Machine inputs
@@ -280,6 +522,31 @@ class WerewolfGame(object):
         Advance to the next phase.
         """
 
+    # `enter_XXX_phase` inputs jump straight to a night phase, skipping any
+    # phases in between.  `enter_daybreak` jumps straight to daybreak.
+    for info in night_phases:
+
+        def make_input():
+
+            def enter_phase(self):
+                """
+                Enter a night phase directly.
+                """
+
+            return enter_phase
+
+        func = make_input()
+        func_name = 'enter_{}_phase'.format(info.tag)
+        func.__name__ = func_name
+        vars()[func_name] = _machine.input()(func)
+    del make_input
+
+    @_machine.input()
+    def enter_daybreak(self):
+        """
+        Enter daybreak directly.
+        """
+
     @_machine.input()
     def query_phase(self):
         """
@@ -364,6 +631,11 @@ class WerewolfGame(object):
         """
         The players have been added to the game.  Save them.
         """
+        players = list(players)
+        self._record_input(ReplayLog.ADD_PLAYERS, players)
+        if self.compact_state:
+            self._player_index = PlayerIndex.make_instance(players)
+            players = self._player_index.players
         self._players = players
 
     @_machine.output()
@@ -372,38 +644,39 @@ class WerewolfGame(object):
         """
         Deal a card to each player and 3 to the table.
         """
+        self._record_input(ReplayLog.DEAL_CARDS, werewolf_count, sorted(roles))
         players = self._players
         player_count = len(players)
-        total_cards = player_count + 3
-        deck = []
-        deck.extend([self.CARD_WEREWOLF] * werewolf_count)
-        role_list = list(roles)
-        random.shuffle(role_list)
-        deck.extend(role_list)
-        additional_cards = total_cards - len(deck)
-        if additional_cards > 0:
-            deck.extend([self.CARD_VILLAGER] * additional_cards)
-        deck = deck[:total_cards]
-        random.shuffle(deck)
-        player_cards = {}
-        for player, card in zip(players, deck):
-            player_cards[player] = card
+        deck = self.deal_deck(self.rng, player_count, werewolf_count, roles)
+        if self.compact_state:
+            player_cards = CardMap.make_instance(
+                self._player_index, deck[:player_count])
+        else:
+            player_cards = {}
+            for player, card in zip(players, deck):
+                player_cards[player] = card
         self._player_cards = player_cards
         self._table_cards = deck[-3:]
-        self._new_player_cards = dict(player_cards)
+        self._new_player_cards = player_cards.copy()
         self._new_table_cards = list(self._table_cards)
         self._active_roles = frozenset(deck)
+        self._card_players = self._build_card_index(player_cards)
+        self._new_card_players = self._build_card_index(player_cards)
+        if self.check_card_index:
+            self._verify_card_index()
 
     @_machine.output()
     def _handle_cards_dealt(self, werewolf_count=2, roles=frozenset([
             CARD_SEER, CARD_ROBBER, CARD_TROUBLEMAKER])):
-        self.handle_cards_dealt()
+        if not self.replaying:
+            self.handle_cards_dealt()
 
     @_machine.output()
     def _query_cards(self):
+        self._record_input(ReplayLog.QUERY_CARDS)
         cards = list(self._player_cards.values())
         cards.extend(self._table_cards)
-        random.shuffle(cards)
+        self.rng.shuffle(cards)
         return cards 
 
     @_machine.output()
@@ -429,21 +702,18 @@ class WerewolfGame(object):
 
     @_machine.output()
     def _identify_werewolves(self):
-        player_cards = self._player_cards
-        werewolves = []
-        for player, card in player_cards.items():
-            if card == self.CARD_WEREWOLF:
-                werewolves.append(player)
-        return werewolves
+        return list(self._card_players.get(self.CARD_WEREWOLF, []))
 
     @_machine.output()
     def _seer_view_player_card(self, player):
+        self._record_input(ReplayLog.SEER_VIEW_PLAYER_CARD, player)
         return self._player_cards[player]
 
     @_machine.output()
     def _seer_view_table_cards(self, pos1, pos2):
         assert pos1 in (0, 1, 2), "Position must be 0, 1, or 2."
         assert pos2 in (0, 1, 2), "Position must be 0, 1, or 2."
+        self._record_input(ReplayLog.SEER_VIEW_TABLE_CARDS, pos1, pos2)
         table_cards = self._table_cards
         card1 = table_cards[pos1]
         card2 = table_cards[pos2]
@@ -451,54 +721,49 @@ class WerewolfGame(object):
 
     @_machine.output()
     def _robber_steal_card(self, player):
-        robber_player = None
-        player_cards = self._player_cards
-        for p, card in player_cards.items():
-            if card == self.CARD_ROBBER:
-                robber_player = p
-                break
-        player_cards = self._new_player_cards
-        stolen_card = player_cards[player]
-        player_cards[player] = self.CARD_ROBBER
-        player_cards[robber_player] = stolen_card
+        self._record_input(ReplayLog.ROBBER_STEAL_CARD, player)
+        robber_player = self._card_players[self.CARD_ROBBER][0]
+        stolen_card = self._new_player_cards[player]
+        self._set_new_player_card(player, self.CARD_ROBBER)
+        self._set_new_player_card(robber_player, stolen_card)
+        if self.check_card_index:
+            self._verify_card_index()
         return stolen_card
 
     @_machine.output()
     def _troublemaker_switch_cards(self, player_a, player_b):
+        self._record_input(ReplayLog.TROUBLEMAKER_SWITCH_CARDS, player_a, player_b)
         player_cards = self._new_player_cards
         card_a = player_cards[player_a]
         card_b = player_cards[player_b]
-        player_cards[player_a] = card_b
-        player_cards[player_b] = card_a
+        self._set_new_player_card(player_a, card_b)
+        self._set_new_player_card(player_b, card_a)
+        if self.check_card_index:
+            self._verify_card_index()
 
     @_machine.output()
     def _insomniac_view_card(self):
-        player_cards = self._player_cards
-        insomniac_player = None
-        for player, card in player_cards.items():
-            if card == self.CARD_INSOMNIAC:
-                insomniac_player = player
-                break
-        if insomniac_player is None:
+        insomniac_players = self._card_players.get(self.CARD_INSOMNIAC)
+        if not insomniac_players:
             raise Exception("No player was dealt the insomniac role!")
-        new_card = self._new_player_cards[insomniac_player]
+        new_card = self._new_player_cards[insomniac_players[0]]
         return new_card
 
     @_machine.output()
     def _query_hunter(self):
-        player_cards = self._new_player_cards
-        hunter = None
-        for player, card  in player_cards.items():
-            if card == self.CARD_HUNTER:
-                hunter = player
-                break
-        return hunter
+        hunters = self._new_card_players.get(self.CARD_HUNTER)
+        if not hunters:
+            return None
+        return hunters[0]
     
     @_machine.output()
     def _eliminate_players(self, players):
         """
         Eliminate a player and end the game.
         """
+        players = list(players)
+        self._record_input(ReplayLog.ELIMINATE_PLAYERS, players)
+        self._eliminated_players = players
         eliminated_cards = []
         player_cards = self._new_player_cards
         for player in players:
@@ -508,31 +773,8 @@ class WerewolfGame(object):
 
     @_machine.output()
     def _query_post_game_results(self):
-        eliminated = set(self._eliminated_cards)
-        player_cards = self._new_player_cards.values()
-        werewolf_player = self.CARD_WEREWOLF in player_cards
-        minion_player = self.CARD_MINION in player_cards
-        tanner_win = self.CARD_TANNER in eliminated
-        village_win = (
-            (self.CARD_WEREWOLF in eliminated)
-            or
-            ((len(eliminated) == 0) and (not werewolf_player))
-        )
-        werewolf_win = (
-            (werewolf_player and (not self.CARD_WEREWOLF in eliminated))
-            or 
-            ((not werewolf_player) and minion_player and (not self.CARD_MINION in eliminated) and len(eliminated) > 0)
-        ) and (not tanner_win)
-        if village_win and tanner_win:
-            winner = self.WINNER_TANNER_AND_VILLAGE
-        elif village_win:
-            winner = self.WINNER_VILLAGE
-        elif tanner_win:
-            winner = self.WINNER_TANNER
-        elif werewolf_win:
-            winner = self.WINNER_WEREWOLVES
-        else:
-            winner = self.WINNER_NO_ONE
+        winner = self.decide_winner(
+            self._eliminated_cards, self._new_player_cards.values())
         pgi = PostGameInfo(
             winner=winner,
             player_cards=dict(self._new_player_cards),
@@ -543,11 +785,15 @@ class WerewolfGame(object):
     
     @_machine.output()
     def _handle_daybreak(self):
-        self.handle_daybreak()
+        self._record_input(ReplayLog.ENTER_PHASE, self.TAG_DAYBREAK)
+        self._phase_tag = self.TAG_DAYBREAK
+        if not self.replaying:
+            self.handle_daybreak()
 
     @_machine.output()
     def _handle_endgame(self, players):
-        self.handle_endgame()
+        if not self.replaying:
+            self.handle_endgame()
 
     # `_set_XXX_phase` output for each night phase.
     for info in night_phases:
@@ -555,9 +801,12 @@ class WerewolfGame(object):
         def make_func(card, tag): 
 
             def func(self):
+                self._record_input(ReplayLog.ENTER_PHASE, tag)
                 self._active_card = card
-                f = getattr(self, 'handle_{}_phase'.format(tag))
-                f()
+                self._phase_tag = tag
+                if not self.replaying:
+                    f = getattr(self, 'handle_{}_phase'.format(tag))
+                    f()
 
             return func 
 
@@ -594,46 +843,6 @@ class WerewolfGame(object):
         enter=cards_dealt, 
         outputs=[_query_cards],
         collector=lambda x: x[-1])
-    cards_dealt.upon(
-        advance_phase,
-        enter=werewolf_phase,
-        outputs=[_set_werewolf_phase])
-    werewolf_phase.upon(
-        advance_phase,
-        enter=minion_phase,
-        outputs=[_set_minion_phase])
-    minion_phase.upon(
-        advance_phase,
-        enter=seer_phase,
-        outputs=[_set_seer_phase])
-    seer_phase.upon(
-        advance_phase,
-        enter=robber_phase,
-        outputs=[_set_robber_phase])
-    seer_power_activated.upon(
-        advance_phase,
-        enter=robber_phase,
-        outputs=[_set_robber_phase])
-    robber_phase.upon(
-        advance_phase,
-        enter=troublemaker_phase,
-        outputs=[_set_troublemaker_phase])
-    robber_power_activated.upon(
-        advance_phase,
-        enter=troublemaker_phase,
-        outputs=[_set_troublemaker_phase])
-    troublemaker_phase.upon(
-        advance_phase,
-        enter=insomniac_phase,
-        outputs=[_set_insomniac_phase])
-    troublemaker_power_activated.upon(
-        advance_phase,
-        enter=insomniac_phase,
-        outputs=[_set_insomniac_phase])
-    insomniac_phase.upon(
-        advance_phase,
-        enter=daybreak,
-        outputs=[_handle_daybreak])
     werewolf_phase.upon(
         identify_werewolves,
         enter=werewolf_phase,
@@ -682,6 +891,35 @@ class WerewolfGame(object):
         enter=endgame,
         outputs=[_query_post_game_results],
         collector=lambda x: x[-1])
+    # Transitions for the `advance_phase` input to the next night phase (or
+    # daybreak), and for the `enter_XXX_phase` and `enter_daybreak` inputs
+    # to every later phase, from the deal and from each night phase.
+    night_cards = [info.card for info in night_phases]
+    phase_order = [(cards_dealt, 0)]
+    for info in itertools.chain(night_phases, power_activated_phases):
+        phase_order.append((info.phase, night_cards.index(info.card) + 1))
+    for source, pos in phase_order:
+        later = night_phases[pos:]
+        if len(later) > 0:
+            source.upon(
+                advance_phase,
+                enter=later[0].phase,
+                outputs=[vars()['_set_{}_phase'.format(later[0].tag)]])
+        else:
+            source.upon(
+                advance_phase,
+                enter=daybreak,
+                outputs=[_handle_daybreak])
+        for info in later:
+            source.upon(
+                vars()['enter_{}_phase'.format(info.tag)],
+                enter=info.phase,
+                outputs=[vars()['_set_{}_phase'.format(info.tag)]])
+        source.upon(
+            enter_daybreak,
+            enter=daybreak,
+            outputs=[_handle_daybreak])
+    del phase_order, night_cards, later
     # Transitions for `query_phase` input for each game phase.
     for info in night_phases:
 
@@ -722,6 +960,180 @@ class WerewolfGame(object):
             outputs=[_is_player_active],
             collector=lambda x: x[-1])
 
+    # ----------------------
+    # Card-to-player indices
+    # ----------------------
+
+    @staticmethod
+    def _build_card_index(player_cards):
+        """
+        Map each card to the list of players holding it.
+        """
+        index = {}
+        for player, card in player_cards.items():
+            index.setdefault(card, []).append(player)
+        return index
+
+    def _set_new_player_card(self, player, card):
+        """
+        Give `player` a new `card`, keeping the current card index in sync.
+        """
+        player_cards = self._new_player_cards
+        index = self._new_card_players
+        old_card = player_cards[player]
+        holders = index[old_card]
+        holders.remove(player)
+        if len(holders) == 0:
+            del index[old_card]
+        player_cards[player] = card
+        index.setdefault(card, []).append(player)
+
+    def _verify_card_index(self):
+        """
+        Check that the card indices agree with the card assignments.
+        Raises an exception if they do not.
+        """
+        pairs = [
+            ("original", self._player_cards, self._card_players),
+            ("current", self._new_player_cards, self._new_card_players),
+        ]
+        for label, player_cards, index in pairs:
+            expected = self._build_card_index(player_cards)
+            actual = dict((card, sorted(holders)) for card, holders in index.items())
+            expected = dict((card, sorted(holders)) for card, holders in expected.items())
+            if actual != expected:
+                raise Exception("The {} card index is inconsistent: {} != {}".format(
+                    label, actual, expected))
+
+    # --------------
+    # Phase pipeline
+    # --------------
+
+    @classmethod
+    def compile_phase_pipeline(klass, roles):
+        """
+        Return the :py:class:`PhasePipeline` for games with the cards in
+        `roles`.  Pipelines are compiled once per set of cards and shared.
+        """
+        roles = frozenset(roles)
+        # Subclasses may have their own phase table.
+        key = (klass, roles)
+        pipeline = klass._pipelines.get(key)
+        if pipeline is not None:
+            return pipeline
+        tags = [info.tag for info in klass.phase_table]
+        machine_tags = [tag for tag in klass._machine_phase_tags if tag in tags]
+        if tags != machine_tags:
+            raise Exception(
+                "The phase table of {} must list night phases of the state "
+                "machine in order: {}".format(klass.__name__, tags))
+        schedule = [info.tag for info in klass.phase_table if info.card in roles]
+        schedule.append(klass.TAG_DAYBREAK)
+        next_tags = {}
+        pos = 0
+        for info in klass.phase_table:
+            if schedule[pos] == info.tag:
+                pos += 1
+            next_tags[info.tag] = schedule[pos]
+        next_tags[None] = schedule[0]
+        pipeline = PhasePipeline(
+            roles=roles,
+            schedule=tuple(schedule),
+            next_tags=next_tags)
+        klass._pipelines[key] = pipeline
+        return pipeline
+
+    @property
+    def phase_pipeline(self):
+        """
+        The compiled :py:class:`PhasePipeline` for the cards dealt in this
+        game.
+        """
+        pipeline = self._pipeline
+        if pipeline is None:
+            pipeline = self.compile_phase_pipeline(self._active_roles)
+            self._pipeline = pipeline
+        return pipeline
+
+    def advance_to_next_phase(self):
+        """
+        Jump straight to the next night phase (or daybreak) for a role that
+        is in play.
+        """
+        self.enter_phase(self.phase_pipeline.next_tags[self._phase_tag])
+
+    def enter_phase(self, tag):
+        """
+        Jump straight to the night phase (or daybreak) named by `tag`.
+        """
+        if tag == self.TAG_DAYBREAK:
+            self.enter_daybreak()
+        else:
+            getattr(self, 'enter_{}_phase'.format(tag))()
+
+    def query_phase_tag(self):
+        """
+        Return the tag of the current phase, or None before the first night
+        phase.
+        """
+        return self._phase_tag
+
+    # -------------
+    # Serialization
+    # -------------
+
+    @_machine.serializer()
+    def savestate(self, state):
+        return state
+
+    # -------------------------
+    # Random numbers and replay
+    # -------------------------
+
+    @property
+    def rng(self):
+        """
+        The game's own seeded random number generator.
+        """
+        rng = self._rng
+        if rng is None:
+            if self.seed is None:
+                self.seed = random.SystemRandom().getrandbits(64)
+            rng = random.Random(self.seed)
+            self._rng = rng
+        return rng
+
+    @property
+    def replay_log(self):
+        """
+        The :py:class:`ReplayLog` of the inputs sent to this game.
+        """
+        replay_log = self._replay_log
+        if replay_log is None:
+            self.rng
+            replay_log = ReplayLog(seed=self.seed)
+            self._replay_log = replay_log
+        return replay_log
+
+    def _record_input(self, opcode, *args):
+        self.replay_log.entries.append((opcode,) + args)
+
+    def fire_state_handler(self):
+        """
+        Call the event handler for the current state.  Used to bring the
+        rest of the application up to date after a replay.
+        """
+        state = self.savestate()
+        tag = self._phase_tag
+        if state == self.TOKEN_CARDS_DEALT:
+            self.handle_cards_dealt()
+        elif state == self.TOKEN_ENDGAME:
+            self.handle_endgame()
+        elif tag == self.TAG_DAYBREAK:
+            self.handle_daybreak()
+        elif tag is not None:
+            getattr(self, 'handle_{}_phase'.format(tag))()
+
     # --------------
     # Event handlers
     # --------------
@@ -760,3 +1172,25 @@ class WerewolfGame(object):
     # ------------------------ 
     del night_phases
 
+
+
+# The optional roles that can be toggled in the session admin dialog.
+OPTIONAL_ROLES = (
+    WerewolfGame.CARD_SEER,
+    WerewolfGame.CARD_ROBBER,
+    WerewolfGame.CARD_TROUBLEMAKER,
+    WerewolfGame.CARD_MINION,
+    WerewolfGame.CARD_INSOMNIAC,
+    WerewolfGame.CARD_HUNTER,
+    WerewolfGame.CARD_TANNER,
+)
+
+def generate_role_sets(roles=OPTIONAL_ROLES):
+    """
+    Generate every subset of the optional roles the session admin dialog
+    can toggle.
+    """
+    roles = list(roles)
+    for n in range(len(roles) + 1):
+        for combo in itertools.combinations(roles, n):
+            yield frozenset(combo)